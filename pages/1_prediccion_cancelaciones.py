@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import joblib
+import io
 from datetime import datetime
 
+from src.utils.features import build_features
+from src.utils.model_registry import get_registry
+from src.utils.prediction_cache import PredictionCache, artifact_signature
+from src.utils.scoring import DEFAULT_CHUNKSIZE, RISK_LEVELS, iter_cancellation_scores
+
 # Configuración de la página
 st.set_page_config(
     page_title="Predicción de cancelaciones",
@@ -62,18 +66,116 @@ st.markdown("""
     la probabilidad de que una reserva sea cancelada, basándose en múltiples factores.
 """)
 
-# Cargar el modelo
+MODEL_PATH = 'src/models/cancelacion_model.joblib'
+
+# Caché de predicciones compartida por todas las sesiones (una por modelo: la
+# ruta forma parte de la clave de st.cache_resource)
 @st.cache_resource
-def load_model():
-    try:
-        model = joblib.load('src/models/cancelacion_model.joblib')
-        return model
-    except FileNotFoundError as e:
-        st.error(f"Error: No se encontró el modelo de predicción de cancelaciones. {str(e)}")
-        return None
+def load_prediction_cache(model_path):
+    return PredictionCache()
+
+prediction_cache = load_prediction_cache(MODEL_PATH)
+
+# Si el artefacto del modelo ha cambiado, descartar las predicciones guardadas
+prediction_cache.bind(artifact_signature(MODEL_PATH))
+
+# Modelo compilado del registro compartido (se carga en segundo plano al
+# arrancar la aplicación; solo se espera si aún no está listo)
+registry = get_registry()
+try:
+    if registry.is_ready('cancelacion'):
+        fast_model = registry.get('cancelacion')
+    else:
+        with st.spinner("Cargando el modelo..."):
+            fast_model = registry.get('cancelacion')
+except FileNotFoundError as e:
+    st.error(f"Error: No se encontró el modelo de predicción de cancelaciones. {str(e)}")
+    st.stop()
+
+# Selección del modo de análisis
+analysis_mode = st.radio(
+    "Modo de análisis",
+    options=["Reserva individual", "Archivo de reservas"],
+    horizontal=True,
+    help="Analiza una reserva introducida a mano o un archivo CSV con el formato de hotel_bookings.csv"
+)
+
+if analysis_mode == "Archivo de reservas":
+    with st.form("batch_prediction_form"):
+        st.subheader("📂 Archivo de reservas")
+
+        uploaded_file = st.file_uploader(
+            "Selecciona un archivo CSV de reservas",
+            type=['csv'],
+            help="El archivo debe tener las columnas de hotel_bookings.csv (no hace falta is_canceled)"
+        )
+
+        chunksize = st.number_input(
+            "Reservas por bloque",
+            min_value=500,
+            max_value=50000,
+            value=DEFAULT_CHUNKSIZE,
+            step=500,
+            help="Las reservas se analizan por bloques para limitar el uso de memoria"
+        )
+
+        batch_button = st.form_submit_button("🔍 Analizar archivo")
+
+    if batch_button and uploaded_file is not None:
+        progress_bar = st.progress(0.0, text="Analizando reservas...")
+        summary_placeholder = st.empty()
+
+        output = io.StringIO()
+        risk_counts = dict.fromkeys(RISK_LEVELS, 0)
+        top_risk = []
+        total_rows = 0
+
+        try:
+            for i, scored in enumerate(iter_cancellation_scores(fast_model, uploaded_file, chunksize=int(chunksize))):
+                scored.to_csv(output, index=False, header=(i == 0))
+                total_rows += len(scored)
+                for level, count in scored['risk_level'].value_counts().items():
+                    risk_counts[level] += int(count)
+                top_risk.append(scored.nlargest(20, 'cancellation_probability'))
+
+                # Mostrar resultados parciales a medida que se procesan los bloques
+                progress_bar.progress(
+                    min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0),
+                    text=f"{total_rows:,} reservas analizadas..."
+                )
+                summary_placeholder.dataframe(
+                    pd.DataFrame({'Reservas': risk_counts}).rename_axis('Nivel de riesgo'),
+                    use_container_width=True
+                )
+        except ValueError as e:
+            progress_bar.empty()
+            st.error(f"Error al procesar el archivo: {str(e)}")
+            st.stop()
+
+        progress_bar.progress(1.0, text=f"✅ {total_rows:,} reservas analizadas")
+
+        st.write("---")
+        st.subheader("🎯 Resumen del riesgo")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Reservas", f"{total_rows:,}")
+        col2.metric("Riesgo alto", f"{risk_counts['ALTO']:,}")
+        col3.metric("Riesgo medio", f"{risk_counts['MEDIO']:,}")
+        col4.metric("Riesgo bajo", f"{risk_counts['BAJO']:,}")
+
+        if top_risk:
+            st.markdown("### ⚠️ Reservas con mayor riesgo")
+            st.dataframe(
+                pd.concat(top_risk).nlargest(20, 'cancellation_probability'),
+                use_container_width=True
+            )
+
+        st.download_button(
+            "📥 Descargar resultados (CSV)",
+            data=output.getvalue(),
+            file_name="prediccion_cancelaciones.csv",
+            mime="text/csv"
+        )
 
-model = load_model()
-if model is None:
     st.stop()
 
 # Formulario principal
@@ -262,17 +364,9 @@ if predict_button:
         <p style='text-align: center; color: #666;'>Analizando riesgo de cancelación...</p>
     """, unsafe_allow_html=True)
     
-    # Calcular características derivadas
-    total_guests = adults + children + babies
+    # Calcular el reparto de noches a partir de la duración de la estancia
     stays_in_weekend_nights = int(total_nights * (0.4 if is_weekend else 0.3))
     stays_in_week_nights = total_nights - stays_in_weekend_nights
-    avg_guests_per_night = total_guests * total_nights
-    booking_flexibility = 1 if deposit_type == 'No Deposit' else 0
-    price_per_night = adr
-    total_cost = adr * total_nights
-    repeated_guest_value = previous_cancellations if is_repeated_guest else 0
-    cancellation_risk = previous_cancellations / (previous_bookings + 1)
-    lead_time_category = 'medium'  # Simplificado para la interfaz
     
     # Preparar datos para la predicción
     input_dict = {
@@ -288,7 +382,6 @@ if predict_button:
         'adults': adults,
         'children': children,
         'babies': babies,
-        'total_guests': total_guests,
         
         # Información de la reserva
         'meal': meal,
@@ -306,26 +399,17 @@ if predict_button:
         # Información del cliente
         'previous_cancellations': previous_cancellations,
         'previous_bookings_not_canceled': previous_bookings,
-        'is_repeated_guest': int(is_repeated_guest),
-        
-        # Características derivadas
-        'is_weekend_arrival': int(is_weekend),
-        'total_nights': total_nights,
-        'avg_guests_per_night': avg_guests_per_night,
-        'booking_flexibility': booking_flexibility,
-        'high_season': int(high_season),
-        'lead_time_category': lead_time_category,
-        'price_per_night': price_per_night,
-        'total_cost': total_cost,
-        'repeated_guest_value': repeated_guest_value,
-        'cancellation_risk': cancellation_risk
+        'is_repeated_guest': int(is_repeated_guest)
     }
     
-    # Convertir a DataFrame
-    input_df = pd.DataFrame([input_dict])
+    def predict_cancellation():
+        # Calcular características derivadas igual que en el entrenamiento
+        input_features = build_features(input_dict)
+        return (fast_model.predict_proba(input_features)[0][1],
+                float(input_features['total_cost'][0]))
     
-    # Realizar predicción
-    cancellation_prob = model.predict_proba(input_df)[0][1]
+    # Realizar predicción (o reutilizar la de una reserva idéntica)
+    cancellation_prob, total_cost = prediction_cache.get_or_compute(input_dict, predict_cancellation)
     
     # Después de la predicción, eliminar el spinner
     spinner_placeholder.empty()
@@ -442,4 +526,8 @@ if predict_button:
             # Mostrar precisión del modelo
             st.markdown("### 🎯 Precisión del Modelo")
             st.progress(0.8435)
-            st.caption("El modelo tiene una precisión del 84.35% en la predicción de cancelaciones")
\ No newline at end of file
+            st.caption("El modelo tiene una precisión del 84.35% en la predicción de cancelaciones")
+            
+            cache_stats = prediction_cache.stats()
+            st.caption(f"Caché de predicciones: {cache_stats['hits']} aciertos, "
+                       f"{cache_stats['misses']} fallos ({cache_stats['size']}/{cache_stats['maxsize']} entradas)")
\ No newline at end of file
@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import joblib
+import time
 from datetime import datetime
 
+from src.utils.features import build_features
+from src.utils.model_registry import get_registry
+from src.utils.prediction_cache import PredictionCache, artifact_signature
+from src.utils.sensitivity import ROOM_TYPES, sensitivity_curves, split_nights
+
 # Configuración de la página
 st.set_page_config(
     page_title="Predicción precio medio por noche",
@@ -49,18 +53,30 @@ st.markdown("""
     el precio medio por noche (ADR) para una reserva basándose en múltiples características.
 """)
 
-# Cargar el modelo
+MODEL_PATH = 'src/models/adr_gbr.joblib'
+
+# Caché de predicciones compartida por todas las sesiones (una por modelo: la
+# ruta forma parte de la clave de st.cache_resource)
 @st.cache_resource
-def load_model():
-    try:
-        model = joblib.load('src/models/adr_gbr.joblib')
-        return model
-    except FileNotFoundError as e:
-        st.error(f"Error: No se encontró el modelo de predicción de precios. {str(e)}")
-        return None
+def load_prediction_cache(model_path):
+    return PredictionCache()
+
+prediction_cache = load_prediction_cache(MODEL_PATH)
 
-model = load_model()
-if model is None:
+# Si el artefacto del modelo ha cambiado, descartar las predicciones guardadas
+prediction_cache.bind(artifact_signature(MODEL_PATH))
+
+# Modelo compilado del registro compartido (se carga en segundo plano al
+# arrancar la aplicación; solo se espera si aún no está listo)
+registry = get_registry()
+try:
+    if registry.is_ready('precio'):
+        fast_model = registry.get('precio')
+    else:
+        with st.spinner("Cargando el modelo..."):
+            fast_model = registry.get('precio')
+except FileNotFoundError as e:
+    st.error(f"Error: No se encontró el modelo de predicción de precios. {str(e)}")
     st.stop()
 
 # Formulario principal
@@ -94,9 +110,11 @@ with st.form("price_prediction_form"):
         )
         
         is_weekend = st.checkbox(
-            "¿Llegada en fin de semana?",
+            "¿Estancia centrada en el fin de semana?",
             value=False,
-            help="Indica si la llegada es en sábado o domingo"
+            help="Reparte las noches con más peso en el fin de semana (40% en lugar de 30%). "
+                 "Si la llegada cae en fin de semana lo deduce el modelo de la fecha de llegada, "
+                 "igual que en el entrenamiento"
         )
     
     with col2:
@@ -171,7 +189,7 @@ with st.form("price_prediction_form"):
         
         reserved_room_type = st.selectbox(
             "Tipo de habitación",
-            options=['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'],
+            options=ROOM_TYPES,
             index=0,
             help="""
             Categoría de la habitación reservada:
@@ -198,14 +216,7 @@ if predict_button:
     
     # Calcular predicción
     # Calcular noches de fin de semana y entre semana
-    weekend_ratio = 0.3 if not is_weekend else 0.4
-    stays_in_weekend_nights = int(total_nights * weekend_ratio)
-    stays_in_week_nights = total_nights - stays_in_weekend_nights
-    
-    # Calcular características derivadas
-    total_guests = adults + children + babies
-    avg_guests_per_night = total_guests * total_nights
-    booking_flexibility = 1 if deposit_type == 'No Deposit' else 0
+    stays_in_weekend_nights, stays_in_week_nights = (int(n) for n in split_nights(total_nights, is_weekend))
     
     # Preparar los datos para la predicción
     input_dict = {
@@ -221,27 +232,23 @@ if predict_button:
         'adults': adults,
         'children': children,
         'babies': babies,
-        'total_guests': total_guests,
         
         # Información de la reserva
         'meal': meal,
         'market_segment': market_segment,
         'deposit_type': deposit_type,
         'reserved_room_type': reserved_room_type,
-        'total_of_special_requests': total_of_special_requests,
-        
-        # Características derivadas
-        'is_weekend_arrival': int(is_weekend),  # Convertir a int como en el modelo
-        'total_nights': total_nights,
-        'avg_guests_per_night': avg_guests_per_night,
-        'booking_flexibility': booking_flexibility
+        'total_of_special_requests': total_of_special_requests
     }
     
-    # Convertir a DataFrame
-    input_df = pd.DataFrame([input_dict])
+    def predict_price():
+        # Calcular características derivadas igual que en el entrenamiento
+        input_features = build_features(input_dict)
+        return (fast_model.predict(input_features)[0],
+                int(input_features['total_guests'][0]))
     
-    # Realizar la predicción
-    predicted_price = model.predict(input_df)[0]
+    # Realizar la predicción (o reutilizar la de una reserva idéntica)
+    predicted_price, total_guests = prediction_cache.get_or_compute(input_dict, predict_price)
     
     # Ajustar valores atípicos como en el entrenamiento
     if predicted_price < 0:
@@ -287,7 +294,7 @@ if predict_button:
             price_factors = []
             
             if is_weekend:
-                price_factors.append("📅 Llegada en fin de semana")
+                price_factors.append("📅 Estancia centrada en el fin de semana")
             
             if total_nights > 7:
                 price_factors.append("📏 Estancia larga")
@@ -330,3 +337,31 @@ if predict_button:
             st.markdown("### 🎯 Precisión del modelo")
             st.progress(0.75)
             st.caption("El modelo tiene un R² score de 0.75 en la predicción de precios")
+            
+            cache_stats = prediction_cache.stats()
+            st.caption(f"Caché de predicciones: {cache_stats['hits']} aciertos, "
+                       f"{cache_stats['misses']} fallos ({cache_stats['size']}/{cache_stats['maxsize']} entradas)")
+
+    # Panel de sensibilidad: la misma reserva variando la antelación, la
+    # duración o el mes de llegada para cada tipo de habitación. Toda la
+    # rejilla se puntúa con una sola llamada al modelo
+    st.write("---")
+    st.subheader("📈 Sensibilidad del precio")
+    start = time.perf_counter()
+    curves = sensitivity_curves(fast_model, input_dict, is_weekend)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    curves['lead_time'].index.name = "Anticipación (días)"
+    curves['total_nights'].index.name = "Noches"
+    # Meses por número para que el eje respete el orden del calendario
+    curves['arrival_date_month'].index = pd.RangeIndex(1, 13, name="Mes de llegada")
+
+    tab_lead, tab_nights, tab_month = st.tabs(["Anticipación", "Duración de la estancia", "Mes de llegada"])
+    with tab_lead:
+        st.line_chart(curves['lead_time'])
+    with tab_nights:
+        st.line_chart(curves['total_nights'])
+    with tab_month:
+        st.line_chart(curves['arrival_date_month'])
+    n_points = sum(curve.size for curve in curves.values())
+    st.caption(f"Precio medio por noche previsto por tipo de habitación; el resto de datos son los del formulario. "
+               f"{n_points:,} escenarios calculados en {elapsed_ms:.0f} ms.")
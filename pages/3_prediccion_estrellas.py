@@ -1,8 +1,14 @@
 import streamlit as st
-import joblib
-from PIL import Image
 import numpy as np
+import pandas as pd
 import warnings
+import zipfile
+
+from src.utils.images import (
+    DISPLAY_SIZE, IMAGE_MODEL_PATH, classify_images, expand_uploads, open_image, preprocess_image as image_features,
+    preprocess_images
+)
+from src.utils.model_registry import get_registry
 
 # Ignorar las advertencias de versión de scikit-learn
 warnings.filterwarnings('ignore', category=UserWarning)
@@ -58,32 +64,99 @@ st.markdown("""
     la clasificación por estrellas de un hotel basándose en una imagen de sus instalaciones.
 """)
 
-# Cargar el modelo
-@st.cache_resource
-def load_model():
-    try:
-        return joblib.load('src/models/hoteles_foto.joblib')
-    except Exception as e:
-        st.error("Error al cargar el modelo. Asegúrate de que el archivo 'src/models/hoteles_foto.joblib' existe.")
-        return None
-
-model = load_model()
-if model is None:
+# Modelo del registro compartido (se carga en segundo plano al arrancar la
+# aplicación; solo se espera si aún no está listo)
+registry = get_registry()
+try:
+    if registry.is_ready('estrellas'):
+        model = registry.get('estrellas')
+    else:
+        with st.spinner("Cargando el modelo..."):
+            model = registry.get('estrellas')
+except Exception as e:
+    st.error(f"Error al cargar el modelo. Asegúrate de que el archivo '{IMAGE_MODEL_PATH}' existe.")
     st.stop()
 
-def preprocess_image(image):
+def preprocess_image(data):
     try:
-        # Redimensionar la imagen al tamaño que espera el modelo (30x90)
-        image = image.resize((90, 30))
-        # Convertir a array y normalizar
-        img_array = np.array(image) / 255.0
-        # Aplanar la imagen (convertir de 3D a 2D)
-        img_array = img_array.reshape(1, -1)
-        return img_array
+        # Decodificar a la misma resolución que el modo galería (la imagen de
+        # 800 px solo se usa para mostrarla) y redimensionar, normalizar y
+        # aplanar igual que en el entrenamiento
+        with open_image(data) as image:
+            return image_features(image)
     except Exception as e:
         st.error(f"Error al preprocesar la imagen: {str(e)}")
         return None
 
+# Selección del modo de análisis
+analysis_mode = st.radio(
+    "Modo de análisis",
+    options=["Imagen individual", "Galería de imágenes"],
+    horizontal=True,
+    help="Analiza una imagen o todas las fotos de un hotel a la vez (varias imágenes o un archivo .zip)"
+)
+
+if analysis_mode == "Galería de imágenes":
+    with st.form("gallery_prediction_form"):
+        st.subheader("🖼️ Galería del hotel")
+
+        uploaded_files = st.file_uploader(
+            "Selecciona las imágenes del hotel o un archivo .zip con ellas",
+            type=['png', 'jpg', 'jpeg', 'zip'],
+            accept_multiple_files=True,
+            help="Todas las imágenes se clasifican con una sola llamada al modelo"
+        )
+
+        gallery_button = st.form_submit_button("⭐ Clasificar galería")
+
+    if gallery_button and uploaded_files:
+        with st.spinner("Analizando imágenes..."):
+            try:
+                images = expand_uploads(uploaded_files)
+            except (ValueError, zipfile.BadZipFile) as e:
+                st.error(f"Error al abrir el archivo: {str(e)}")
+                st.stop()
+            if not images:
+                st.warning("No se ha encontrado ninguna imagen")
+                st.stop()
+
+            # Decodificar en paralelo sobre una matriz preasignada y predecir todo de una vez
+            X, errors = preprocess_images([data for _, data in images])
+            valid = np.array([i not in errors for i in range(len(images))])
+            results = pd.DataFrame({'Imagen': [name for name, _ in images]})
+            results['Estrellas'] = pd.Series(dtype='Int64')
+            results['Confianza (%)'] = np.nan
+            if valid.any():
+                stars, confidence = classify_images(model, X[valid])
+                results.loc[valid, 'Estrellas'] = stars.astype(int)
+                results.loc[valid, 'Confianza (%)'] = confidence * 100
+            results['Error'] = [errors.get(i) for i in range(len(images))]
+
+        st.write("---")
+        st.subheader("🎯 Resumen de la galería")
+        rated = results['Estrellas'].dropna()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Imágenes", f"{len(results):,}")
+        col2.metric("Clasificación más frecuente",
+                    f"{int(rated.mode().iloc[0])} ⭐" if len(rated) else "-")
+        col3.metric("Media", f"{rated.mean():.1f} ⭐" if len(rated) else "-")
+        if errors:
+            st.warning(f"No se han podido leer {len(errors):,} imágenes")
+
+        if len(rated):
+            st.markdown("### 📊 Imágenes por clasificación")
+            st.bar_chart(rated.astype(int).value_counts().sort_index().rename_axis('Estrellas'))
+
+        st.dataframe(results, use_container_width=True, hide_index=True)
+        st.download_button(
+            "📥 Descargar resultados (CSV)",
+            data=results.to_csv(index=False),
+            file_name="clasificacion_galeria.csv",
+            mime="text/csv"
+        )
+
+    st.stop()
+
 # Formulario principal
 with st.form("image_prediction_form"):
     st.subheader("📸 Subir imagen del hotel")
@@ -95,10 +168,11 @@ with st.form("image_prediction_form"):
         help="Sube una imagen clara de las instalaciones del hotel"
     )
     
-    # Mostrar imagen subida
+    # Mostrar imagen subida (decodificada a resolución reducida, solo para mostrarla)
+    image = None
     if uploaded_file is not None:
         try:
-            image = Image.open(uploaded_file)
+            image = open_image(uploaded_file.getvalue(), DISPLAY_SIZE)
             # Crear dos columnas y mostrar la imagen en una de ellas para reducir el ancho
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
@@ -108,7 +182,7 @@ with st.form("image_prediction_form"):
     
     predict_button = st.form_submit_button("⭐ Predecir clasificación")
 
-if predict_button and uploaded_file is not None:
+if predict_button and image is not None:
     # Mostrar spinner personalizado
     spinner_placeholder = st.empty()
     spinner_placeholder.markdown("""
@@ -118,13 +192,13 @@ if predict_button and uploaded_file is not None:
     
     try:
         # Preprocesar imagen y hacer predicción
-        image = Image.open(uploaded_file)
-        processed_image = preprocess_image(image)
+        processed_image = preprocess_image(uploaded_file.getvalue())
         
         if processed_image is not None:
-            prediction = model.predict(processed_image)[0]
-            predicted_stars = prediction  # Asumiendo que el modelo ya predice directamente el número de estrellas
-            confidence = model.predict_proba(processed_image)[0].max() * 100
+            # Clase y confianza con una sola llamada a predict_proba
+            stars, confidence = classify_images(model, processed_image)
+            predicted_stars = stars[0]  # Asumiendo que el modelo ya predice directamente el número de estrellas
+            confidence = confidence[0] * 100
             
             # Eliminar spinner
             spinner_placeholder.empty()
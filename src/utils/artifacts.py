@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import shutil
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.tree._tree import Tree
+
+from src.utils.data import file_hash
+from src.utils.fast_inference import CompiledPipeline, LazyEstimator, compile_pipeline
+from src.utils.features import CANCELACION_FEATURES, PRECIO_FEATURES
+from src.utils.images import IMAGE_MODEL_PATH
+from src.utils.prediction_cache import artifact_matches, artifact_signature
+
+# Se incrementa cuando cambia el formato de los artefactos rápidos
+FAST_FORMAT_VERSION = 2
+
+# Los arrays a partir de este tamaño se guardan aparte y se proyectan en memoria
+MIN_MMAP_BYTES = 1 << 12
+
+# Modelos de la aplicación y características de entrada (None: el modelo se usa tal cual)
+MODELS = {
+    'src/models/cancelacion_model.joblib': CANCELACION_FEATURES,
+    'src/models/adr_gbr.joblib': PRECIO_FEATURES,
+    IMAGE_MODEL_PATH: None,
+}
+
+_MANIFEST_FILE = 'manifest.json'
+_PICKLE_FILE = 'model.pkl'
+
+
+def fast_path(path):
+    """Carpeta del artefacto rápido de un modelo `.joblib`."""
+    return os.path.splitext(path)[0] + '.fast'
+
+
+class _ArrayPickler(pickle.Pickler):
+    # Los arrays grandes se escriben como .npy y en el pickle queda una referencia
+
+    def __init__(self, file, directory):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        self.arrays = []
+        self._saved = {}
+        self._inline = {}
+
+    def reducer_override(self, obj):
+        # Tree.__setstate__ copia los nodos en memoria propia: sus arrays no
+        # se podrían proyectar, así que van dentro del pickle
+        if not isinstance(obj, Tree):
+            return NotImplemented
+        reduced = obj.__reduce__()
+        for value in reduced[2].values():
+            if isinstance(value, np.ndarray):
+                self._inline[id(value)] = value
+        return reduced
+
+    def persistent_id(self, obj):
+        if (type(obj) is not np.ndarray and not isinstance(obj, np.memmap)) or obj.dtype.hasobject \
+                or obj.nbytes < MIN_MMAP_BYTES or id(obj) in self._inline:
+            return None
+        # Un mismo array referenciado varias veces se guarda una sola vez
+        if id(obj) in self._saved:
+            return ('npy', self._saved[id(obj)])
+        name = self._saved[id(obj)] = f"{len(self.arrays):04d}.npy"
+        path = os.path.join(self.directory, name)
+        # np.save alinea los datos a 64 bytes, así que se pueden proyectar tal cual
+        np.save(path, np.asarray(obj), allow_pickle=False)
+        self.arrays.append({'file': name, 'dtype': obj.dtype.str, 'shape': list(obj.shape),
+                            'sha256': file_hash(path)})
+        return ('npy', name)
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, directory):
+        super().__init__(file)
+        self.directory = directory
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != 'npy':
+            raise pickle.UnpicklingError(f"Referencia desconocida: {kind}")
+        return np.load(os.path.join(self.directory, name), mmap_mode='r', allow_pickle=False)
+
+
+class _ByteCounter:
+    # Destino de escritura que solo cuenta los bytes
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def _is_mapped(array):
+    # Un array está proyectado si él o el objeto del que es una vista es un mmap
+    base = array
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = getattr(base, 'base', None)
+    return False
+
+
+class _SizePickler(pickle.Pickler):
+    # Recorre el modelo como al guardarlo y suma el tamaño de sus arrays
+
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.mapped = 0
+        self.private = 0
+        self._seen = set()
+
+    def persistent_id(self, obj):
+        if (type(obj) is not np.ndarray and not isinstance(obj, np.memmap)) or obj.dtype.hasobject:
+            return None
+        if id(obj) not in self._seen:
+            self._seen.add(id(obj))
+            if _is_mapped(obj):
+                self.mapped += obj.nbytes
+            else:
+                self.private += obj.nbytes
+        return id(obj)
+
+
+def memory_footprint(model):
+    """Memoria que ocupa un modelo cargado, en MB.
+
+    Devuelve `mapped_mb` (arrays proyectados desde un artefacto rápido, que
+    el sistema comparte entre procesos y carga bajo demanda) y `private_mb`
+    (arrays en memoria del proceso más una estimación del resto de objetos),
+    incluido el estimador de scikit-learn que se carga bajo demanda.
+    """
+    counter = _ByteCounter()
+    pickler = _SizePickler(counter)
+    pickler.dump(model)
+    estimator = getattr(model, 'estimator', None)
+    if isinstance(estimator, LazyEstimator):
+        pickler.dump(estimator.load())
+    return {'mapped_mb': pickler.mapped / 2**20, 'private_mb': (pickler.private + counter.size) / 2**20}
+
+
+def save_fast(model, directory, source=None):
+    """Guarda `model` en formato rápido en `directory`.
+
+    Los arrays numéricos grandes se guardan sin comprimir en ficheros `.npy`
+    (alineados) y el resto del objeto en un pickle pequeño. `manifest.json`
+    recoge la versión del formato, el `.joblib` de origen y el hash de cada
+    fichero para comprobar su integridad. La carpeta se sustituye de forma
+    atómica.
+    """
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    buffer = io.BytesIO()
+    pickler = _ArrayPickler(buffer, tmp_dir)
+    pickler.dump(model)
+    with open(os.path.join(tmp_dir, _PICKLE_FILE), 'wb') as f:
+        f.write(buffer.getvalue())
+
+    manifest = {
+        'format': FAST_FORMAT_VERSION,
+        'source': None,
+        'pickle_sha256': hashlib.sha256(buffer.getvalue()).hexdigest(),
+        'arrays': pickler.arrays,
+    }
+    if source is not None:
+        manifest['source'] = {'path': source, 'signature': artifact_signature(source), 'sha256': file_hash(source)}
+    with open(os.path.join(tmp_dir, _MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+    return manifest
+
+
+def verify_fast(directory, full=False):
+    """Comprueba la integridad de un artefacto rápido; lanza ValueError si falla.
+
+    Siempre comprueba la versión, el hash del pickle y que cada array tenga el
+    tamaño esperado. Con `full` también calcula el hash de todos los arrays
+    (más lento: lee todos los datos).
+    """
+    with open(os.path.join(directory, _MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FAST_FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {manifest.get('format')}")
+    if file_hash(os.path.join(directory, _PICKLE_FILE)) != manifest['pickle_sha256']:
+        raise ValueError("El pickle del artefacto rápido está dañado")
+    for entry in manifest['arrays']:
+        path = os.path.join(directory, entry['file'])
+        array = np.load(path, mmap_mode='r', allow_pickle=False)
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ValueError(f"El array {entry['file']} no coincide con el manifiesto")
+        if full and file_hash(path) != entry['sha256']:
+            raise ValueError(f"El array {entry['file']} está dañado")
+    return manifest
+
+
+def load_fast(directory, source=None, verify=False):
+    """Carga un artefacto rápido con sus arrays proyectados en memoria (solo lectura).
+
+    Si se indica `source`, el artefacto debe haberse generado a partir de la
+    versión actual de ese `.joblib`.
+    """
+    manifest = verify_fast(directory, full=verify)
+    if source is not None:
+        recorded = manifest.get('source') or {}
+        if not artifact_matches(source, recorded.get('signature'), recorded.get('sha256')):
+            raise ValueError(f"El artefacto rápido no corresponde a la versión actual de {source}")
+    with open(os.path.join(directory, _PICKLE_FILE), 'rb') as f:
+        return _ArrayUnpickler(f, directory).load()
+
+
+def build_fast_artifact(path, features=None):
+    """Genera el artefacto rápido del modelo `.joblib` en `path`.
+
+    Con `features`, se guarda el modelo compilado que usan las páginas (con
+    el estimador de scikit-learn cargado bajo demanda desde `path`); si no, el
+    modelo tal cual.
+    """
+    model = joblib.load(path)
+    if features is not None:
+        model = compile_pipeline(model, features)
+        if isinstance(model, CompiledPipeline):
+            model.estimator = LazyEstimator(path, artifact_signature(path), model.classes_, file_hash(path))
+    return save_fast(model, fast_path(path), source=path)
+
+
+def load_serving_model(path, features=None, verify=False):
+    """Carga el modelo listo para predecir desde su artefacto rápido, o desde
+    el `.joblib` si el artefacto no existe, está dañado o es de otra versión.
+
+    Con `features` se devuelve la versión compilada (`compile_pipeline`).
+    """
+    directory = fast_path(path)
+    if os.path.isdir(directory):
+        try:
+            return load_fast(directory, source=path, verify=verify)
+        except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError) as e:
+            warnings.warn(f"No se puede usar el artefacto rápido de {path} ({e}); se carga el .joblib")
+    model = joblib.load(path)
+    return compile_pipeline(model, features) if features is not None else model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera o comprueba los artefactos de carga rápida de los modelos")
+    parser.add_argument('--verify', action='store_true', help="Solo comprobar los artefactos existentes (hash completo)")
+    args = parser.parse_args()
+
+    for path, features in MODELS.items():
+        if not os.path.exists(path):
+            print(f"{path}: no existe, se omite")
+            continue
+        if args.verify:
+            try:
+                load_fast(fast_path(path), source=path, verify=True)
+                print(f"{fast_path(path)}: correcto")
+            except (OSError, ValueError) as e:
+                print(f"{fast_path(path)}: {e}")
+            continue
+        start = time.perf_counter()
+        manifest = build_fast_artifact(path, features)
+        size_mb = sum(np.load(os.path.join(fast_path(path), entry['file']), mmap_mode='r').nbytes
+                      for entry in manifest['arrays']) / 2**20
+        print(f"{fast_path(path)}: {len(manifest['arrays'])} arrays ({size_mb:.1f} MB) "
+              f"en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
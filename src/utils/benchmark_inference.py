@@ -0,0 +1,294 @@
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from PIL import Image
+
+from src.utils.artifacts import load_serving_model
+from src.utils.benchmark_training import write_json
+from src.utils.data import BOOKINGS_CSV
+from src.utils.fast_inference import PipelineAdapter
+from src.utils.features import (
+    CANCELACION_FEATURES, CANCELACION_INPUTS, PRECIO_FEATURES, PRECIO_INPUTS, build_features
+)
+from src.utils.images import (
+    DISPLAY_SIZE, IMAGE_MODEL_PATH, classify_images, open_image, preprocess_image, preprocess_images
+)
+
+# Modelos que se miden: ruta, columnas de entrada y método que usa la página
+MODELS = {
+    'cancelacion': {
+        'path': 'src/models/cancelacion_model.joblib',
+        'features': CANCELACION_FEATURES,
+        'inputs': CANCELACION_INPUTS,
+        'method': 'predict_proba',
+    },
+    'precio': {
+        'path': 'src/models/adr_gbr.joblib',
+        'features': PRECIO_FEATURES,
+        'inputs': PRECIO_INPUTS,
+        'method': 'predict',
+    },
+    'estrellas': {
+        'path': IMAGE_MODEL_PATH,
+    },
+}
+
+IMAGE_DIR = 'src/img'
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000]
+DEFAULT_REQUESTS = 500
+DEFAULT_OUTPUT = 'benchmarks/inferencia.json'
+DEFAULT_BASELINE = 'benchmarks/inferencia_base.json'
+DEFAULT_THRESHOLD = 0.25
+# Tiempo mínimo de medida de cada tamaño de lote
+MIN_BATCH_SECONDS = 1.0
+# Diferencias menores que estas no cuentan como empeoramiento (ruido)
+MIN_LATENCY_DELTA_MS = 0.5
+MIN_LOAD_DELTA_SECONDS = 0.1
+
+# Se ejecuta en un intérprete nuevo para medir la carga en frío: como en las
+# páginas (artefacto rápido si existe, compilado o no) o solo con joblib
+_COLD_LOAD = """
+import json, sys, time
+start = time.perf_counter()
+import joblib
+from src.utils.artifacts import load_serving_model
+import_seconds = time.perf_counter() - start
+start = time.perf_counter()
+if sys.argv[2] == 'joblib':
+    model = joblib.load(sys.argv[1])
+else:
+    model = load_serving_model(sys.argv[1], json.loads(sys.argv[3]))
+load_seconds = time.perf_counter() - start
+print(json.dumps({'import_seconds': import_seconds, 'load_seconds': load_seconds}))
+"""
+
+
+def cold_load(path, mode='compilado', features=None):
+    """Tiempo de carga de un artefacto en un proceso nuevo (sin nada en memoria).
+
+    `mode`: 'compilado' o 'servicio' (como las páginas) o 'joblib'. Con
+    'compilado' hacen falta las `features` del modelo, por si no hay
+    artefacto rápido y hay que compilarlo desde el `.joblib`.
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', _COLD_LOAD, path, mode, json.dumps(features)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def booking_requests(inputs, n, source=BOOKINGS_CSV, seed=0):
+    """Reservas del CSV como dicts de escalares, igual que los que construyen las páginas."""
+    df = pd.read_csv(source, usecols=inputs)
+    df = df.sample(n=n, replace=n > len(df), random_state=seed)
+    return df.to_dict('records')
+
+
+def image_requests(n, image_dir=IMAGE_DIR, seed=0):
+    """Imágenes JPEG codificadas (recortes y tamaños variados de las imágenes de
+    `image_dir`, o ruido si no hay ninguna), como las que sube el usuario."""
+    rng = np.random.default_rng(seed)
+    sources = [Image.open(path).convert('RGB') for path in sorted(glob.glob(os.path.join(image_dir, '*.jpg')))]
+    if not sources:
+        sources = [Image.fromarray(rng.integers(0, 256, (768, 1024, 3), dtype=np.uint8))]
+    requests = []
+    for i in range(n):
+        image = sources[i % len(sources)]
+        width, height = image.size
+        left, top = rng.integers(0, width // 4), rng.integers(0, height // 4)
+        crop = image.crop((left, top, left + width // 2, top + height // 2))
+        scale = rng.uniform(0.5, 1.5)
+        crop = crop.resize((int(crop.width * scale), int(crop.height * scale)))
+        buffer = io.BytesIO()
+        crop.save(buffer, format='JPEG', quality=90)
+        requests.append(buffer.getvalue())
+    return requests
+
+
+def _percentiles(timings):
+    ms = np.asarray(timings) * 1000
+    return {
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'mean': float(ms.mean()),
+    }
+
+
+def _throughput(run_batch, batch_sizes, min_seconds=MIN_BATCH_SECONDS):
+    # Cada tamaño de lote se repite hasta sumar al menos `min_seconds`
+    results = []
+    for batch_size in batch_sizes:
+        run_batch(min(batch_size, 10))  # calentamiento
+        rows = 0
+        start = time.perf_counter()
+        while rows == 0 or time.perf_counter() - start < min_seconds:
+            run_batch(batch_size)
+            rows += batch_size
+        results.append({'batch_size': batch_size, 'rows_per_second': rows / (time.perf_counter() - start)})
+    return results
+
+
+def benchmark_bookings(name, n_requests, batch_sizes, compile_model=True):
+    """Latencia por reserva y filas por segundo de un modelo de reservas."""
+    config = MODELS[name]
+    model = load_serving_model(config['path'], config['features']) if compile_model else \
+        PipelineAdapter(joblib.load(config['path']), config['features'])
+    predict = getattr(model, config['method'])
+    requests = booking_requests(config['inputs'], n_requests)
+
+    for record in requests[:10]:
+        predict(build_features(record))
+    timings = []
+    for record in requests:
+        # Igual que la página: características derivadas + predicción de una fila
+        start = time.perf_counter()
+        predict(build_features(record))
+        timings.append(time.perf_counter() - start)
+
+    frame = pd.DataFrame(booking_requests(config['inputs'], max(batch_sizes), seed=1))
+    throughput = _throughput(lambda size: predict(build_features(frame.iloc[:size])), batch_sizes)
+    return {'latency_ms': _percentiles(timings), 'requests': n_requests, 'throughput': throughput}
+
+
+def benchmark_images(n_requests, batch_sizes, path=IMAGE_MODEL_PATH):
+    """Latencia por imagen (decodificar, preprocesar, predecir) y filas por segundo."""
+    model = load_serving_model(path)
+    requests = image_requests(n_requests)
+
+    def predict_one(data):
+        # Igual que la página: la imagen se decodifica para mostrarla y, a la
+        # resolución del modo galería, para calcular la clase y la confianza
+        with open_image(data, DISPLAY_SIZE):
+            pass
+        with open_image(data) as image:
+            classify_images(model, preprocess_image(image))
+
+    for data in requests[:10]:
+        predict_one(data)
+    timings = []
+    for data in requests:
+        start = time.perf_counter()
+        predict_one(data)
+        timings.append(time.perf_counter() - start)
+
+    def predict_batch(size):
+        # Igual que el modo galería: decodificación en paralelo y una sola predicción
+        X, _ = preprocess_images([requests[i % len(requests)] for i in range(size)])
+        classify_images(model, X)
+
+    throughput = _throughput(predict_batch, batch_sizes)
+    return {'latency_ms': _percentiles(timings), 'requests': n_requests, 'throughput': throughput}
+
+
+def run_benchmark(models, n_requests=DEFAULT_REQUESTS, batch_sizes=DEFAULT_BATCH_SIZES, compile_model=True,
+                  image_model=IMAGE_MODEL_PATH):
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+        'compiled': compile_model,
+        'models': {},
+    }
+    for name in models:
+        path = image_model if name == 'estrellas' else MODELS[name]['path']
+        if not os.path.exists(path):
+            print(f"{name}: no se encuentra {path}, se omite")
+            continue
+        print(f"Midiendo {name}...")
+        result = {'path': path, 'size_mb': os.path.getsize(path) / 2**20}
+        mode = 'joblib' if not compile_model else 'servicio' if name == 'estrellas' else 'compilado'
+        result.update(cold_load(path, mode, MODELS[name]['features'] if mode == 'compilado' else None))
+        if name == 'estrellas':
+            result.update(benchmark_images(n_requests, batch_sizes, path))
+        else:
+            result.update(benchmark_bookings(name, n_requests, batch_sizes, compile_model))
+        report['models'][name] = result
+        latency = result['latency_ms']
+        print(f"  Carga en frío: {result['load_seconds']:.2f} s "
+              f"({result['size_mb']:.1f} MB)")
+        print(f"  Latencia por petición: p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, "
+              f"p99 {latency['p99']:.2f} ms")
+        for entry in result['throughput']:
+            print(f"  Lotes de {entry['batch_size']:>6,}: {entry['rows_per_second']:>12,.0f} filas/s")
+    return report
+
+
+def find_regressions(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compara carga, latencias y rendimiento por lotes con la referencia."""
+    regressions = []
+    for name, result in report['models'].items():
+        base = baseline['models'].get(name)
+        if base is None:
+            continue
+        load, base_load = result['load_seconds'], base['load_seconds']
+        if load > base_load * (1 + threshold) and load - base_load > MIN_LOAD_DELTA_SECONDS:
+            regressions.append(f"{name} / carga: {base_load:.2f} s -> {load:.2f} s")
+        for key in ('p50', 'p95', 'p99'):
+            value, base_value = result['latency_ms'][key], base['latency_ms'][key]
+            if value > base_value * (1 + threshold) and value - base_value > MIN_LATENCY_DELTA_MS:
+                regressions.append(f"{name} / {key}: {base_value:.2f} ms -> {value:.2f} ms")
+        base_throughput = {entry['batch_size']: entry['rows_per_second'] for entry in base['throughput']}
+        for entry in result['throughput']:
+            base_value = base_throughput.get(entry['batch_size'])
+            if base_value and entry['rows_per_second'] < base_value / (1 + threshold):
+                regressions.append(f"{name} / lotes de {entry['batch_size']:,}: "
+                                   f"{base_value:,.0f} -> {entry['rows_per_second']:,.0f} filas/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia y rendimiento de los modelos (sin Streamlit)")
+    parser.add_argument('--models', choices=MODELS, nargs='+', default=list(MODELS), help="Modelos a medir")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help="Peticiones de una fila por modelo")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES, help="Tamaños de lote")
+    parser.add_argument('--image-model', default=IMAGE_MODEL_PATH, help="Ruta del modelo de estrellas")
+    parser.add_argument('--no-compile', action='store_true',
+                        help="Medir el pipeline de scikit-learn sin la versión precompilada")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Fichero JSON con los resultados")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Fichero JSON de referencia")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como nueva referencia")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.models, args.requests, args.batch_sizes, not args.no_compile, args.image_model)
+    write_json(report, args.output)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.save_baseline:
+        write_json(report, args.baseline)
+        print(f"Referencia guardada en {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No hay referencia en {args.baseline} (usa --save-baseline para crearla)")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('compiled') != report['compiled']:
+        print("La referencia se midió con otro modo de predicción; no se compara")
+        return
+    regressions = find_regressions(report, baseline, args.threshold)
+    if regressions:
+        print("\nMedidas que han empeorado respecto a la referencia:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print("Ninguna medida ha empeorado respecto a la referencia")
+
+
+if __name__ == '__main__':
+    main()
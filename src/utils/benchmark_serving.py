@@ -0,0 +1,229 @@
+import argparse
+import base64
+import http.client
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+from src.utils.benchmark_inference import _percentiles, booking_requests, image_requests
+from src.utils.benchmark_training import write_json
+from src.utils.model_registry import MODELS
+from src.utils.prefork_server import tree_memory
+from src.utils.scoring_server import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_QUEUE, DEFAULT_MAX_WAIT_MS
+
+DEFAULT_OUTPUT = 'benchmarks/servicio.json'
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 10.0
+DEFAULT_PORT = 8765
+# Tiempo máximo que se espera a que el servidor arranque
+STARTUP_TIMEOUT = 120
+
+
+def request_bodies(model, n):
+    """Cuerpos JSON de peticiones de una reserva o una imagen, como las de una integración."""
+    if model == 'estrellas':
+        return [json.dumps({'images': [base64.b64encode(data).decode()]}).encode() for data in image_requests(n)]
+    records = booking_requests(MODELS[model]['inputs'], n)
+    # Los NaN del CSV no son JSON válido: se envían como null
+    return [json.dumps({'bookings': [{name: None if isinstance(value, float) and math.isnan(value) else value
+                                      for name, value in record.items()}]}).encode() for record in records]
+
+
+def get_json(host, port, path, timeout=5):
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def wait_for_server(host, port, process=None, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"El servidor ha terminado con código {process.returncode}")
+        try:
+            if get_json(host, port, '/health')[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"El servidor no responde en {host}:{port}")
+
+
+def load_test(host, port, model, bodies, concurrency=DEFAULT_CONCURRENCY, duration=DEFAULT_DURATION):
+    """Lanza `concurrency` clientes (cada uno con su conexión persistente) que
+    envían peticiones sin pausa durante `duration` segundos.
+
+    Devuelve las peticiones por segundo, la latencia de las respondidas y el
+    número de respuestas por código HTTP.
+    """
+    path = f'/predict/{model}'
+    headers = {'Content-Type': 'application/json'}
+    timings = []
+    statuses = {}
+    lock = threading.Lock()
+    start_event = threading.Event()
+    deadline = None
+
+    def client(offset):
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        local_timings = []
+        local_statuses = {}
+        i = offset
+        start_event.wait()
+        while time.perf_counter() < deadline:
+            body = bodies[i % len(bodies)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except OSError:
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=60)
+                status = 'error'
+            if status == 200:
+                local_timings.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        connection.close()
+        with lock:
+            timings.extend(local_timings)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    deadline = start + duration
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_second': len(timings) / elapsed,
+        'latency_ms': _percentiles(timings) if timings else None,
+        'statuses': {str(status): count for status, count in statuses.items()},
+    }
+
+
+def run_mode(model, bodies, max_batch_size, max_wait_ms, max_queue, concurrency, duration, port, workers=None):
+    """Arranca el servidor con unos límites de micro-lotes (y, con `workers`,
+    en varios procesos) y lo somete a la prueba de carga."""
+    module = 'src.utils.scoring_server' if workers is None else 'src.utils.prefork_server'
+    command = [sys.executable, '-m', module, '--port', str(port), '--models', model,
+               '--max-batch-size', str(max_batch_size), '--max-wait-ms', str(max_wait_ms),
+               '--max-queue', str(max_queue)]
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server('127.0.0.1', port, process)
+        # Calentamiento: conexiones y primeras predicciones
+        load_test('127.0.0.1', port, model, bodies, concurrency=min(concurrency, 4), duration=1)
+        result = load_test('127.0.0.1', port, model, bodies, concurrency=concurrency, duration=duration)
+        health = get_json('127.0.0.1', port, '/health')[1]
+        result['batching'] = next(row['batching'] for row in health['models'] if row['model'] == model)
+        # Memoria del servidor y de sus procesos de trabajo después de la carga
+        result['memory'] = tree_memory(process.pid)['total']
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def print_report(results):
+    print(f"\n  {'Modo':<28}{'peticiones/s':>14}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'filas/lote':>12}{'503':>8}{'RSS (MB)':>10}{'PSS (MB)':>10}")
+    for name, result in results.items():
+        latency = result['latency_ms'] or {'p50': math.nan, 'p95': math.nan, 'p99': math.nan}
+        memory = result.get('memory') or {'rss_mb': math.nan, 'pss_mb': math.nan}
+        print(f"  {name:<28}{result['requests_per_second']:>14.0f}{latency['p50']:>10.1f}{latency['p95']:>10.1f}"
+              f"{latency['p99']:>10.1f}{result['batching']['mean_batch_rows']:>12.1f}"
+              f"{result['statuses'].get('503', 0):>8}{memory['rss_mb']:>10.0f}{memory['pss_mb']:>10.0f}")
+    print("\n  RSS suma las páginas compartidas una vez por proceso; PSS las reparte (memoria real del servidor)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de predicción: micro-lotes "
+                                                 "frente a una predicción por petición")
+    parser.add_argument('--model', choices=list(MODELS), default='cancelacion', help="Modelo que se prueba")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Clientes simultáneos")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Segundos de cada prueba")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Filas máximas por lote en el modo con micro-lotes")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Espera máxima para completar un lote en el modo con micro-lotes")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="Peticiones en cola por modelo")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Puerto del servidor de prueba")
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="Probar el servidor multiproceso con estos números de procesos en lugar de "
+                             "comparar con y sin micro-lotes")
+    parser.add_argument('--url', default=None,
+                        help="Probar un servidor ya arrancado (host:puerto) en lugar de arrancar uno en cada modo")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Fichero JSON con los resultados")
+    args = parser.parse_args()
+
+    print("Preparando peticiones...")
+    bodies = request_bodies(args.model, 1000 if args.model != 'estrellas' else 100)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'model': args.model,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'results': {},
+    }
+    if args.url:
+        host, _, port = args.url.rpartition(':')
+        wait_for_server(host, int(port))
+        load_test(host, int(port), args.model, bodies, concurrency=min(args.concurrency, 4), duration=1)
+        result = load_test(host, int(port), args.model, bodies, args.concurrency, args.duration)
+        health = get_json(host, int(port), '/health')[1]
+        result['batching'] = next(row['batching'] for row in health['models'] if row['model'] == args.model)
+        report['results'][args.url] = result
+    elif args.workers:
+        for workers in args.workers:
+            name = f"{workers} proceso{'s' if workers > 1 else ''}"
+            print(f"{name}: {args.concurrency} clientes durante {args.duration:g} s...")
+            report['results'][name] = run_mode(args.model, bodies, args.max_batch_size, args.max_wait_ms,
+                                               args.max_queue, args.concurrency, args.duration, args.port, workers)
+    else:
+        modes = {
+            "Una predicción por petición": (1, 0.0),
+            f"Micro-lotes ({args.max_batch_size} filas, {args.max_wait_ms:g} ms)": (args.max_batch_size,
+                                                                                   args.max_wait_ms),
+        }
+        for name, (max_batch_size, max_wait_ms) in modes.items():
+            print(f"{name}: {args.concurrency} clientes durante {args.duration:g} s...")
+            report['results'][name] = run_mode(args.model, bodies, max_batch_size, max_wait_ms, args.max_queue,
+                                               args.concurrency, args.duration, args.port)
+    print_report(report['results'])
+    if args.workers:
+        first = next(iter(report['results'].values()))
+        for name, result in list(report['results'].items())[1:]:
+            print(f"{name}: x{result['requests_per_second'] / max(first['requests_per_second'], 1e-9):.2f} "
+                  f"peticiones/s y x{result['memory']['pss_mb'] / max(first['memory']['pss_mb'], 1e-9):.2f} "
+                  f"memoria (PSS) respecto a {args.workers[0]}")
+    elif not args.url:
+        single, batched = report['results'].values()
+        print(f"\nMejora de rendimiento con micro-lotes: "
+              f"x{batched['requests_per_second'] / max(single['requests_per_second'], 1e-9):.2f}")
+    write_json(report, args.output)
+    print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
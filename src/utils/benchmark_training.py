@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import sklearn
+
+from src.utils.data import BOOKINGS_CSV
+
+# Scripts de entrenamiento que se miden
+SCRIPTS = {
+    'cancelacion': 'src.utils.train_cancelacion',
+    'precio': 'src.utils.train_price_model',
+}
+
+# Argumentos fijos: sin caché de preprocesado, para medir siempre el ajuste real
+SCRIPT_ARGS = {
+    'cancelacion': [],
+    'precio': ['--no-cache'],
+}
+
+DEFAULT_OUTPUT = 'benchmarks/entrenamiento.json'
+DEFAULT_BASELINE = 'benchmarks/entrenamiento_base.json'
+
+# Una etapa empeora si supera a la referencia en más de este porcentaje y,
+# además, en más de un margen absoluto (para que las etapas muy cortas no
+# fallen por ruido)
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_MEMORY_THRESHOLD = 0.25
+MIN_SECONDS_DELTA = 0.5
+MIN_MEMORY_DELTA_MB = 50
+
+
+def make_dataset(rows, path, source=BOOKINGS_CSV, seed=0):
+    """Escribe en `path` un CSV de `rows` reservas muestreadas de `source`
+    (con reemplazo si se piden más filas de las que tiene)."""
+    df = pd.read_csv(source)
+    df.sample(n=rows, replace=rows > len(df), random_state=seed).to_csv(path, index=False)
+
+
+def run_script(name, data_path, workdir, extra_args=()):
+    """Ejecuta un script de entrenamiento en un proceso aparte y devuelve sus etapas."""
+    profile_path = os.path.join(workdir, f"{name}.json")
+    command = [
+        sys.executable, '-m', SCRIPTS[name],
+        '--data', data_path,
+        '--output', os.path.join(workdir, f"{name}.joblib"),
+        '--profile-json', profile_path,
+        *SCRIPT_ARGS[name], *extra_args,
+    ]
+    start = time.perf_counter()
+    process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        print(process.stderr, file=sys.stderr)
+        raise RuntimeError(f"El script {SCRIPTS[name]} ha fallado (código {process.returncode})")
+    total_seconds = time.perf_counter() - start
+    with open(profile_path) as f:
+        stages = json.load(f)
+    return {'stages': stages, 'total_seconds': total_seconds}
+
+
+def run_benchmark(sizes, scripts, repeat=1, extra_args=()):
+    """Mide cada script con cada tamaño de datos y devuelve el informe completo.
+
+    De cada etapa se guarda la repetición más rápida (la menos afectada por
+    otros procesos) y el mayor pico de memoria.
+    """
+    results = []
+    for rows in sizes:
+        for name in scripts:
+            runs = []
+            for _ in range(repeat):
+                # Directorio nuevo en cada ejecución: la carga del CSV se mide en frío
+                with tempfile.TemporaryDirectory() as workdir:
+                    data_path = os.path.join(workdir, 'reservas.csv')
+                    make_dataset(rows, data_path)
+                    runs.append(run_script(name, data_path, workdir, extra_args))
+            stages = []
+            for i, first in enumerate(runs[0]['stages']):
+                records = [run['stages'][i] for run in runs]
+                stages.append({
+                    'stage': first['stage'],
+                    'seconds': min(record['seconds'] for record in records),
+                    'peak_rss_mb': max(record['peak_rss_mb'] for record in records),
+                })
+            result = {
+                'script': name,
+                'rows': rows,
+                'repeat': repeat,
+                'total_seconds': min(run['total_seconds'] for run in runs),
+                'stages': stages,
+            }
+            results.append(result)
+            print(f"{name} con {rows:,} filas: {result['total_seconds']:.1f} s")
+            for stage in stages:
+                print(f"  {stage['stage']:<28} {stage['seconds']:>8.2f} s {stage['peak_rss_mb']:>8.0f} MB")
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+        'extra_args': list(extra_args),
+        'results': results,
+    }
+
+
+def find_regressions(report, baseline, time_threshold=DEFAULT_TIME_THRESHOLD,
+                     memory_threshold=DEFAULT_MEMORY_THRESHOLD):
+    """Compara cada etapa con la misma etapa (script y tamaño) de la referencia.
+
+    Devuelve una lista de mensajes, vacía si nada ha empeorado. Las etapas que
+    no están en la referencia no se comparan.
+    """
+    reference = {
+        (result['script'], result['rows'], stage['stage']): stage
+        for result in baseline['results'] for stage in result['stages']
+    }
+    regressions = []
+    for result in report['results']:
+        for stage in result['stages']:
+            base = reference.get((result['script'], result['rows'], stage['stage']))
+            if base is None:
+                continue
+            label = f"{result['script']} ({result['rows']:,} filas) / {stage['stage']}"
+            if (stage['seconds'] > base['seconds'] * (1 + time_threshold)
+                    and stage['seconds'] - base['seconds'] > MIN_SECONDS_DELTA):
+                regressions.append(f"{label}: {base['seconds']:.2f} s -> {stage['seconds']:.2f} s")
+            if (stage['peak_rss_mb'] > base['peak_rss_mb'] * (1 + memory_threshold)
+                    and stage['peak_rss_mb'] - base['peak_rss_mb'] > MIN_MEMORY_DELTA_MB):
+                regressions.append(f"{label}: {base['peak_rss_mb']:.0f} MB -> {stage['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def write_json(data, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo y memoria de los scripts de entrenamiento")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000], help="Número de reservas de cada prueba")
+    parser.add_argument('--scripts', choices=SCRIPTS, nargs='+', default=list(SCRIPTS), help="Scripts a medir")
+    parser.add_argument('--repeat', type=int, default=1, help="Repeticiones de cada prueba")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Fichero JSON con los resultados")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Fichero JSON de referencia")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como nueva referencia")
+    parser.add_argument('--time-threshold', type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help="Empeoramiento de tiempo tolerado (0.25 = 25%%)")
+    parser.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help="Empeoramiento de memoria tolerado (0.25 = 25%%)")
+    parser.add_argument('script_args', nargs=argparse.REMAINDER,
+                        help="Argumentos adicionales para los scripts (tras --, p. ej. -- --engine histograma)")
+    args = parser.parse_args()
+    extra_args = [arg for arg in args.script_args if arg != '--']
+
+    report = run_benchmark(args.sizes, args.scripts, repeat=args.repeat, extra_args=extra_args)
+    write_json(report, args.output)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.save_baseline:
+        write_json(report, args.baseline)
+        print(f"Referencia guardada en {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No hay referencia en {args.baseline} (usa --save-baseline para crearla)")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('extra_args', []) != report['extra_args']:
+        print("La referencia se midió con otros argumentos de los scripts; no se compara")
+        return
+    regressions = find_regressions(report, baseline, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print("\nEtapas que han empeorado respecto a la referencia:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print("Ninguna etapa ha empeorado respecto a la referencia")
+
+
+if __name__ == '__main__':
+    main()
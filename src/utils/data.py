@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Ruta por defecto del dataset de reservas
+BOOKINGS_CSV = 'src/data/hotel_bookings.csv'
+
+# Columnas de texto que se guardan como categóricas (el resto de columnas de
+# texto también se codifican, pero estas son las que usan los modelos)
+CATEGORICAL_COLUMNS = [
+    'meal', 'market_segment', 'deposit_type', 'customer_type',
+    'reserved_room_type', 'arrival_date_month'
+]
+
+# Se incrementa cuando cambia el formato de la caché
+CACHE_VERSION = 1
+
+_META_FILE = 'meta.json'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Hash SHA-256 del contenido de un fichero."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_cache_dir(path):
+    base = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), '.cache', base)
+
+
+def compact_dtypes(df):
+    """Convierte las columnas de texto a categóricas y reduce los enteros."""
+    columns = {}
+    for name, col in df.items():
+        if col.dtype == object or name in CATEGORICAL_COLUMNS:
+            columns[name] = col.astype('category')
+        elif pd.api.types.is_integer_dtype(col):
+            columns[name] = pd.to_numeric(col, downcast='integer')
+        else:
+            columns[name] = col
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _write_cache(df, cache_dir, source_hash):
+    tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, (name, col) in enumerate(df.items()):
+        entry = {'name': name, 'file': f"{i:03d}.npy"}
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            values = col.cat.codes.to_numpy()
+            entry['categories'] = col.cat.categories.tolist()
+        else:
+            values = col.to_numpy()
+        np.save(os.path.join(tmp_dir, entry['file']), np.ascontiguousarray(values))
+        columns.append(entry)
+
+    meta = {'version': CACHE_VERSION, 'source_hash': source_hash,
+            'rows': len(df), 'columns': columns}
+    with open(os.path.join(tmp_dir, _META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+    # Sustituir la caché anterior solo cuando la nueva está completa
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, _META_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _read_cache(cache_dir, meta, mmap_mode):
+    columns = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(cache_dir, entry['file']), mmap_mode=mmap_mode)
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(values, categories=entry['categories'])
+        columns[entry['name']] = values
+    # copy=False mantiene los arrays numéricos proyectados en memoria
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_bookings(path=BOOKINGS_CSV, cache_dir=None, use_cache=True, mmap_mode='r'):
+    """Carga el CSV de reservas con tipos compactos.
+
+    La primera vez convierte el CSV a una caché columnar (un `.npy` por
+    columna) que se invalida cuando cambia el hash del contenido del CSV. Las
+    siguientes cargas proyectan las columnas en memoria en lugar de volver a
+    parsear el CSV.
+    """
+    if not use_cache:
+        return compact_dtypes(pd.read_csv(path))
+
+    cache_dir = cache_dir or default_cache_dir(path)
+    source_hash = file_hash(path)
+    meta = _read_meta(cache_dir)
+    if meta is None or meta.get('version') != CACHE_VERSION or meta.get('source_hash') != source_hash:
+        df = compact_dtypes(pd.read_csv(path))
+        _write_cache(df, cache_dir, source_hash)
+        meta = _read_meta(cache_dir)
+    return _read_cache(cache_dir, meta, mmap_mode)
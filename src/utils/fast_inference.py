@@ -0,0 +1,322 @@
+import copy
+import threading
+
+import joblib
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from src.utils.prediction_cache import artifact_matches
+from src.utils.tree_ensemble import flatten_estimator
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _scalar(value):
+    # Acepta escalares o secuencias de un elemento (como las que genera build_features)
+    if isinstance(value, (list, tuple)):
+        return value[0]
+    if isinstance(value, np.ndarray):
+        return value.flat[0]
+    return value
+
+
+# Hasta este número de filas las categorías se buscan elemento a elemento en
+# el diccionario; con más, pandas compensa su coste fijo (varios ms por lote)
+SMALL_BATCH_ROWS = 1024
+
+
+def _column_values(data, name):
+    if isinstance(data, pd.DataFrame):
+        return data[name].to_numpy()
+    return np.atleast_1d(np.asarray(data[name]))
+
+
+class _NumericBlock:
+    """Imputación por mediana + StandardScaler con los parámetros ya ajustados."""
+
+    def __init__(self, columns, transformer, out_slice):
+        steps = dict(transformer.steps)
+        imputer, scaler = steps.get('imputer'), steps.get('scaler')
+        if (not isinstance(imputer, SimpleImputer) or imputer.add_indicator
+                or not isinstance(scaler, StandardScaler)):
+            raise ValueError("Transformador numérico no soportado")
+        self.columns = list(columns)
+        self.fill = imputer.statistics_.astype(np.float64)
+        self.mean = scaler.mean_ if scaler.with_mean else np.zeros(len(self.columns))
+        self.scale = scaler.scale_ if scaler.with_std else np.ones(len(self.columns))
+        self.out_slice = out_slice
+
+    def transform_one(self, row, out):
+        values = np.array([_scalar(row[name]) for name in self.columns], dtype=np.float64)
+        np.copyto(values, self.fill, where=np.isnan(values))
+        np.subtract(values, self.mean, out=values)
+        np.divide(values, self.scale, out=out[self.out_slice])
+
+    def transform(self, data, out):
+        block = np.column_stack([_column_values(data, name).astype(np.float64) for name in self.columns])
+        block = np.where(np.isnan(block), self.fill, block)
+        out[:, self.out_slice] = (block - self.mean) / self.scale
+
+
+class _CategoricalBlock:
+    """Imputación constante + OneHotEncoder como tabla categoría -> columna."""
+
+    def __init__(self, columns, transformer, out_slice):
+        steps = dict(transformer.steps)
+        imputer, encoder = steps.get('imputer'), steps.get('onehot')
+        if (not isinstance(imputer, SimpleImputer) or imputer.strategy != 'constant'
+                or not isinstance(encoder, OneHotEncoder) or encoder._infrequent_enabled
+                or encoder.handle_unknown != 'ignore'):
+            raise ValueError("Transformador categórico no soportado")
+        self.columns = list(columns)
+        self.fill_value = imputer.fill_value
+        # Para cada columna, categoría -> posición absoluta en el vector de salida
+        # (las categorías eliminadas por `drop` y las desconocidas no activan nada)
+        self.lookup = []
+        position = out_slice.start
+        drop_idx = encoder.drop_idx_
+        for i, categories in enumerate(encoder.categories_):
+            dropped = None if drop_idx is None else drop_idx[i]
+            table = {}
+            for j, category in enumerate(categories):
+                if j == dropped:
+                    continue
+                table[category] = position
+                position += 1
+            self.lookup.append(table)
+        if position != out_slice.stop:
+            raise ValueError("La codificación one-hot no coincide con la salida del preprocesador")
+        self.out_slice = out_slice
+
+    def transform_one(self, row, out):
+        out[self.out_slice] = 0.0
+        for name, table in zip(self.columns, self.lookup):
+            value = _scalar(row[name])
+            index = table.get(self.fill_value if _is_missing(value) else value)
+            if index is not None:
+                out[index] = 1.0
+
+    def transform(self, data, out):
+        out[:, self.out_slice] = 0.0
+        if out.shape[0] <= SMALL_BATCH_ROWS:
+            for name, table in zip(self.columns, self.lookup):
+                for i, value in enumerate(_column_values(data, name)):
+                    index = table.get(self.fill_value if _is_missing(value) else value)
+                    if index is not None:
+                        out[i, index] = 1.0
+            return
+        rows = np.arange(out.shape[0])
+        for name, table in zip(self.columns, self.lookup):
+            values = pd.Series(_column_values(data, name), dtype=object).fillna(self.fill_value)
+            index = values.map(table).to_numpy(dtype=np.float64, na_value=np.nan)
+            known = ~np.isnan(index)
+            out[rows[known], index[known].astype(np.intp)] = 1.0
+
+
+class _PassthroughBlock:
+    """Columnas numéricas sin transformar (motor de histogramas, que admite NaN)."""
+
+    def __init__(self, columns, out_slice):
+        self.columns = list(columns)
+        self.out_slice = out_slice
+
+    def transform_one(self, row, out):
+        out[self.out_slice] = [_scalar(row[name]) for name in self.columns]
+
+    def transform(self, data, out):
+        for i, name in enumerate(self.columns):
+            out[:, self.out_slice.start + i] = _column_values(data, name)
+
+
+class _OrdinalBlock:
+    """OrdinalEncoder como tabla categoría -> código (desconocidas y vacías -> NaN)."""
+
+    def __init__(self, columns, encoder, out_slice):
+        if (encoder.handle_unknown != 'use_encoded_value' or not _is_missing(encoder.unknown_value)
+                or not _is_missing(encoder.encoded_missing_value) or encoder._infrequent_enabled):
+            raise ValueError("Transformador categórico no soportado")
+        self.columns = list(columns)
+        self.lookup = [
+            {category: float(code) for code, category in enumerate(categories) if not _is_missing(category)}
+            for categories in encoder.categories_
+        ]
+        self.out_slice = out_slice
+
+    def transform_one(self, row, out):
+        for i, (name, table) in enumerate(zip(self.columns, self.lookup)):
+            value = _scalar(row[name])
+            out[self.out_slice.start + i] = np.nan if _is_missing(value) else table.get(value, np.nan)
+
+    def transform(self, data, out):
+        for i, (name, table) in enumerate(zip(self.columns, self.lookup)):
+            if out.shape[0] <= SMALL_BATCH_ROWS:
+                out[:, self.out_slice.start + i] = [np.nan if _is_missing(value) else table.get(value, np.nan)
+                                                    for value in _column_values(data, name)]
+                continue
+            values = pd.Series(_column_values(data, name), dtype=object)
+            out[:, self.out_slice.start + i] = values.map(table).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class CompiledPipeline:
+    """Versión precompilada de un pipeline preprocesador + estimador.
+
+    Aplica las transformaciones con los parámetros ajustados (medianas,
+    medias, escalas y tabla de categorías) directamente sobre un diccionario
+    o un DataFrame, sin construir DataFrames ni pasar por las validaciones
+    del ColumnTransformer. Da los mismos resultados que el pipeline original.
+    """
+
+    def __init__(self, pipeline):
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise ValueError("Se esperaba un pipeline con preprocesador y estimador")
+        preprocessor = pipeline.steps[0][1]
+        if not isinstance(preprocessor, ColumnTransformer) or preprocessor.sparse_output_:
+            raise ValueError("Preprocesador no soportado")
+
+        self.blocks = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            out_slice = preprocessor.output_indices_[name]
+            if name == 'num' and transformer == 'passthrough':
+                self.blocks.append(_PassthroughBlock(columns, out_slice))
+            elif name == 'num':
+                self.blocks.append(_NumericBlock(columns, transformer, out_slice))
+            elif name == 'cat' and isinstance(transformer, OrdinalEncoder):
+                self.blocks.append(_OrdinalBlock(columns, transformer, out_slice))
+            elif name == 'cat':
+                self.blocks.append(_CategoricalBlock(columns, transformer, out_slice))
+            else:
+                raise ValueError(f"Transformador no soportado: {name}")
+        self.n_features = max(block.out_slice.stop for block in self.blocks)
+
+        # Las filas sueltas y los lotes pequeños van al evaluador de árboles
+        # aplanado; los lotes grandes, al estimador original
+        self.estimator = pipeline.steps[1][1]
+        self.small_estimator = flatten_estimator(self.estimator)
+        if self.small_estimator is not None:
+            self.max_small_rows = self.small_estimator.max_rows
+        else:
+            # Para una sola fila no compensa repartir los árboles entre hilos
+            self.small_estimator = copy.copy(self.estimator)
+            if hasattr(self.small_estimator, 'n_jobs'):
+                self.small_estimator.n_jobs = 1
+            self.max_small_rows = 1
+        self.classes_ = getattr(self.estimator, 'classes_', None)
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # El búfer por hilo no se guarda (se crea de nuevo al usarlo)
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _row_buffer(self):
+        # Vector preasignado por hilo (Streamlit atiende cada sesión en un hilo)
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, self.n_features))
+        return buffer
+
+    def transform(self, data):
+        """Matriz de entrada del estimador para un dict de escalares/arrays o un DataFrame."""
+        first = self.blocks[0].columns[0]
+        n_rows = len(data) if isinstance(data, pd.DataFrame) else np.size(data[first])
+        if n_rows == 1 and not isinstance(data, pd.DataFrame):
+            out = self._row_buffer()
+            for block in self.blocks:
+                block.transform_one(data, out[0])
+            return out
+        out = np.empty((n_rows, self.n_features))
+        for block in self.blocks:
+            block.transform(data, out)
+        return out
+
+    def _estimator_for(self, X):
+        return self.small_estimator if X.shape[0] <= self.max_small_rows else self.estimator
+
+    def predict(self, data):
+        X = self.transform(data)
+        return self._estimator_for(X).predict(X)
+
+    def predict_proba(self, data):
+        X = self.transform(data)
+        return self._estimator_for(X).predict_proba(X)
+
+
+class PipelineAdapter:
+    """Envuelve un pipeline que no se puede compilar con la misma interfaz."""
+
+    def __init__(self, pipeline, features):
+        self.pipeline = pipeline
+        self.features = list(features)
+        self.classes_ = getattr(pipeline, 'classes_', None)
+
+    def _frame(self, data):
+        if isinstance(data, pd.DataFrame):
+            return data[self.features]
+        return pd.DataFrame({name: np.atleast_1d(data[name]) for name in self.features})
+
+    def predict(self, data):
+        return self.pipeline.predict(self._frame(data))
+
+    def predict_proba(self, data):
+        return self.pipeline.predict_proba(self._frame(data))
+
+
+class LazyEstimator:
+    """Estimador final de un pipeline `.joblib` que solo se carga al usarlo.
+
+    El artefacto rápido guarda el modelo compilado (preprocesado y árboles
+    aplanados) y deja el estimador de scikit-learn, que solo se usa con los
+    lotes grandes, en el `.joblib` original.
+    """
+
+    def __init__(self, path, signature, classes=None, sha256=None):
+        self.path = path
+        self.signature = signature
+        self.sha256 = sha256
+        self.classes_ = classes
+        self._estimator = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'path': self.path, 'signature': self.signature, 'classes_': self.classes_, 'sha256': self.sha256}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['signature'], state['classes_'], state.get('sha256'))
+
+    def load(self):
+        """Carga el estimador (solo la primera vez) y lo devuelve."""
+        with self._lock:
+            if self._estimator is None:
+                if not artifact_matches(self.path, self.signature, self.sha256):
+                    raise ValueError(f"El modelo {self.path} ha cambiado desde que se generó su artefacto rápido")
+                self._estimator = joblib.load(self.path).steps[-1][1]
+            return self._estimator
+
+    def predict(self, X):
+        return self.load().predict(X)
+
+    def predict_proba(self, X):
+        return self.load().predict_proba(X)
+
+
+def compile_pipeline(pipeline, features):
+    """Devuelve un `CompiledPipeline` o, si la estructura no está soportada,
+    un `PipelineAdapter` que usa el pipeline de scikit-learn tal cual."""
+    try:
+        return CompiledPipeline(pipeline)
+    except (ValueError, AttributeError, KeyError):
+        return PipelineAdapter(pipeline, features)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+# Meses considerados temporada alta
+HIGH_SEASON_MONTHS = ['July', 'August', 'December']
+
+# Etiquetas de los quintiles de antelación
+LEAD_TIME_LABELS = np.array(['very_short', 'short', 'medium', 'long', 'very_long'], dtype=object)
+
+# Columnas que calcula este módulo a partir de los datos de la reserva
+DERIVED_FEATURES = [
+    'total_guests', 'is_weekend_arrival', 'total_nights',
+    'avg_guests_per_night', 'booking_flexibility', 'high_season',
+    'lead_time_category', 'price_per_night', 'total_cost',
+    'repeated_guest_value', 'cancellation_risk'
+]
+
+# Características del modelo de cancelaciones
+CANCELACION_FEATURES = [
+    'lead_time', 'arrival_date_year', 'arrival_date_month',
+    'arrival_date_day_of_month', 'stays_in_weekend_nights',
+    'stays_in_week_nights', 'adults', 'children', 'babies',
+    'meal', 'market_segment', 'deposit_type', 'customer_type',
+    'adr', 'required_car_parking_spaces', 'total_of_special_requests',
+    'previous_cancellations', 'previous_bookings_not_canceled',
+    'booking_changes', 'days_in_waiting_list', 'is_repeated_guest',
+    'total_guests', 'is_weekend_arrival', 'total_nights',
+    'avg_guests_per_night', 'booking_flexibility', 'high_season',
+    'lead_time_category', 'price_per_night', 'total_cost',
+    'repeated_guest_value', 'cancellation_risk'
+]
+
+# Columnas que realmente usa el preprocesador de cancelaciones. Se fijan de
+# forma explícita (antes se deducían con select_dtypes, que dejaba fuera las
+# columnas booleanas y la categoría de antelación) para que no dependan del
+# tipo de dato con el que se carguen los datos.
+CANCELACION_NUMERIC = [
+    'lead_time', 'arrival_date_year', 'arrival_date_day_of_month',
+    'stays_in_weekend_nights', 'stays_in_week_nights', 'adults',
+    'children', 'babies', 'adr', 'required_car_parking_spaces',
+    'total_of_special_requests', 'previous_cancellations',
+    'previous_bookings_not_canceled', 'booking_changes',
+    'days_in_waiting_list', 'is_repeated_guest', 'total_guests',
+    'total_nights', 'avg_guests_per_night', 'booking_flexibility',
+    'price_per_night', 'total_cost', 'repeated_guest_value',
+    'cancellation_risk'
+]
+
+CANCELACION_CATEGORICAL = [
+    'arrival_date_month', 'meal', 'market_segment', 'deposit_type',
+    'customer_type'
+]
+
+# Características del modelo de precios
+PRECIO_FEATURES = [
+    'lead_time', 'arrival_date_year', 'arrival_date_month',
+    'arrival_date_day_of_month', 'stays_in_weekend_nights',
+    'stays_in_week_nights', 'adults', 'children', 'babies',
+    'meal', 'market_segment', 'deposit_type', 'reserved_room_type',
+    'total_of_special_requests', 'total_guests', 'is_weekend_arrival',
+    'total_nights', 'avg_guests_per_night', 'booking_flexibility'
+]
+
+# Columnas del CSV de reservas que necesita cada modelo
+CANCELACION_INPUTS = [f for f in CANCELACION_FEATURES if f not in DERIVED_FEATURES]
+PRECIO_INPUTS = [f for f in PRECIO_FEATURES if f not in DERIVED_FEATURES]
+
+PRECIO_NUMERIC = [
+    'lead_time', 'arrival_date_year', 'arrival_date_day_of_month',
+    'stays_in_weekend_nights', 'stays_in_week_nights', 'adults',
+    'children', 'babies', 'total_of_special_requests', 'total_guests',
+    'total_nights', 'avg_guests_per_night', 'booking_flexibility'
+]
+
+PRECIO_CATEGORICAL = [
+    'meal', 'market_segment', 'deposit_type',
+    'reserved_room_type', 'arrival_date_month'
+]
+
+
+def _column(data, name):
+    if isinstance(data, pd.DataFrame):
+        values = data[name].to_numpy()
+    else:
+        values = np.asarray(data[name])
+    # Los enteros compactos (int8/int16) se amplían para que las sumas no desborden
+    if values.dtype.kind in 'iu' and values.dtype != np.int64:
+        values = values.astype(np.int64)
+    return values
+
+
+def lead_time_edges(lead_time):
+    """Límites de los quintiles de antelación (equivalente a pd.qcut con q=5)."""
+    return np.quantile(np.asarray(lead_time, dtype=np.float64), [0.2, 0.4, 0.6, 0.8])
+
+
+def derive_features(data, edges=None):
+    """Calcula todas las características derivadas de ambos modelos.
+
+    Acepta un DataFrame o un diccionario de arrays de NumPy y devuelve un
+    diccionario con las columnas nuevas, calculadas de forma vectorizada.
+    Solo se calculan las columnas cuyas entradas están disponibles (el modelo
+    de precios no necesita `adr` ni el historial del cliente).
+    """
+    has = (lambda name: name in data.columns) if isinstance(data, pd.DataFrame) else (lambda name: name in data)
+    out = {}
+
+    adults = _column(data, 'adults')
+    children = _column(data, 'children')
+    babies = _column(data, 'babies')
+    weekend_nights = _column(data, 'stays_in_weekend_nights')
+    week_nights = _column(data, 'stays_in_week_nights')
+    day_of_month = _column(data, 'arrival_date_day_of_month')
+    month = _column(data, 'arrival_date_month').astype(object)
+    deposit_type = _column(data, 'deposit_type').astype(object)
+
+    total_guests = adults + children + babies
+    total_nights = weekend_nights + week_nights
+    weekday = day_of_month % 7
+
+    out['total_guests'] = total_guests
+    out['is_weekend_arrival'] = (weekday == 0) | (weekday == 6)
+    out['total_nights'] = total_nights
+    out['avg_guests_per_night'] = total_guests * total_nights
+    out['booking_flexibility'] = (deposit_type == 'No Deposit').astype(np.int64)
+    out['high_season'] = np.isin(month, HIGH_SEASON_MONTHS)
+
+    if has('lead_time'):
+        lead_time = _column(data, 'lead_time')
+        if edges is None:
+            edges = lead_time_edges(lead_time)
+        out['lead_time_category'] = LEAD_TIME_LABELS[np.searchsorted(edges, lead_time, side='left')]
+
+    if has('adr'):
+        adr = _column(data, 'adr')
+        # Las estancias de cero noches no tienen precio por noche: NaN (no inf),
+        # para que el imputador las rellene igual en el pipeline y en el compilado
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_per_night = adr / total_nights
+        out['price_per_night'] = np.where(np.isinf(price_per_night), np.nan, price_per_night)
+        out['total_cost'] = adr * total_nights
+
+    if has('is_repeated_guest') and has('previous_cancellations'):
+        previous_cancellations = _column(data, 'previous_cancellations')
+        out['repeated_guest_value'] = np.where(
+            _column(data, 'is_repeated_guest') == 1, previous_cancellations, 0
+        )
+        if has('previous_bookings_not_canceled'):
+            out['cancellation_risk'] = previous_cancellations / (_column(data, 'previous_bookings_not_canceled') + 1)
+
+    return out
+
+
+def build_features(data, edges=None):
+    """Devuelve los datos de entrada junto con sus características derivadas.
+
+    Si `data` es un DataFrame se devuelve un DataFrame nuevo; si es un
+    diccionario de arrays (o de escalares/listas) se devuelve un diccionario.
+    """
+    if isinstance(data, pd.DataFrame):
+        derived = derive_features(data, edges=edges)
+        # Un único bloque nuevo evita la fragmentación de asignar columna a columna
+        return pd.concat([data.drop(columns=list(derived), errors='ignore'),
+                          pd.DataFrame(derived, index=data.index)], axis=1)
+    arrays = {name: np.atleast_1d(np.asarray(value)) for name, value in data.items()}
+    arrays.update(derive_features(arrays, edges=edges))
+    return arrays
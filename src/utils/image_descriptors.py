@@ -0,0 +1,139 @@
+import numpy as np
+from sklearn.preprocessing import FunctionTransformer
+
+from src.utils.images import IMAGE_FEATURES, IMAGE_SIZE
+
+# Intervalos de los histogramas de color (por canal RGB) y de tono
+COLOR_BINS = 8
+HUE_BINS = 12
+
+# Histogramas de orientación del gradiente: intervalos y celdas (filas, columnas)
+ORIENTATION_BINS = 9
+GRADIENT_GRID = (2, 3)
+
+# Celdas (filas, columnas) de los momentos de color (media y desviación por
+# canal); deben dividir exactamente el tamaño de la imagen
+MOMENT_GRID = (3, 3)
+
+# Longitud del vector de descriptores de una imagen
+DESCRIPTOR_FEATURES = (
+    3 * COLOR_BINS + HUE_BINS
+    + GRADIENT_GRID[0] * GRADIENT_GRID[1] * ORIENTATION_BINS
+    + MOMENT_GRID[0] * MOMENT_GRID[1] * 3 * 2
+)
+
+
+def _cell_index(grid):
+    # Celda de cada píxel de la imagen (en el orden en que se aplanan los píxeles)
+    width, height = IMAGE_SIZE
+    rows = np.arange(height) * grid[0] // height
+    cols = np.arange(width) * grid[1] // width
+    return (rows[:, None] * grid[1] + cols[None, :]).ravel()
+
+
+def _column_pooling(n_cols):
+    # Matriz que suma cada canal de los píxeles de cada columna de celdas de
+    # una fila de la imagen: (ancho * 3) -> (n_cols * 3)
+    width = IMAGE_SIZE[0]
+    pooling = np.zeros((width * 3, n_cols * 3), dtype=np.float32)
+    x = np.repeat(np.arange(width), 3)
+    channel = np.tile(np.arange(3), width)
+    pooling[np.arange(width * 3), (x * n_cols // width) * 3 + channel] = 1.0
+    return pooling
+
+
+_GRADIENT_CELLS = _cell_index(GRADIENT_GRID)
+_MOMENT_POOLING = _column_pooling(MOMENT_GRID[1])
+
+
+def _batch_histogram(index, n_bins, weights=None):
+    # Histograma de cada fila de `index` (n_imágenes, n_valores) con un único bincount
+    n_images = index.shape[0]
+    offsets = (np.arange(n_images) * n_bins).reshape((-1,) + (1,) * (index.ndim - 1))
+    counts = np.bincount((index + offsets).ravel(), weights=None if weights is None else weights.ravel(),
+                         minlength=n_images * n_bins)
+    return counts.reshape(n_images, n_bins)
+
+
+def image_descriptors(X):
+    """Descriptores compactos de un lote de imágenes.
+
+    `X` son filas de píxeles tal como las genera `preprocess_image` (30x90
+    RGB aplanado, en [0, 1]). Para cada imagen se calculan, de forma
+    vectorizada sobre todo el lote:
+
+    - histogramas de color por canal RGB y de tono (ponderado por la saturación);
+    - histogramas de orientación del gradiente en una rejilla de celdas,
+      normalizados por celda (como en HOG);
+    - momentos de color (media y desviación típica por canal) en otra rejilla.
+
+    Devuelve una matriz float32 de `DESCRIPTOR_FEATURES` columnas.
+    """
+    width, height = IMAGE_SIZE
+    images = np.asarray(X, dtype=np.float32).reshape(-1, height, width, 3)
+    n_images = images.shape[0]
+    n_pixels = height * width
+    # Canales en planos contiguos: las operaciones por canal recorren memoria seguida
+    r, g, b = np.moveaxis(images.reshape(n_images, n_pixels, 3), 2, 0).copy()
+
+    # Histogramas de color: un histograma conjunto de 8x8x8 colores (un solo
+    # índice por píxel) del que se suman los de cada canal
+    levels = [np.minimum((channel * COLOR_BINS).astype(np.uint16), COLOR_BINS - 1) for channel in (r, g, b)]
+    joint = _batch_histogram((levels[0] * COLOR_BINS + levels[1]) * COLOR_BINS + levels[2], COLOR_BINS ** 3)
+    joint = joint.reshape(n_images, COLOR_BINS, COLOR_BINS, COLOR_BINS)
+    color = np.hstack([joint.sum(axis=(2, 3)), joint.sum(axis=(1, 3)), joint.sum(axis=(1, 2))]) / n_pixels
+
+    # Histograma de tono, ponderado por la saturación para que los grises no
+    # cuenten. Solo se calcula el sector del canal máximo de cada píxel
+    max_c = np.maximum(np.maximum(r, g), b)
+    delta = max_c - np.minimum(np.minimum(r, g), b)
+    is_r, is_g = max_c == r, max_c == g
+    numerator = np.where(is_r, g - b, np.where(is_g, b - r, r - g))
+    sector = np.where(is_r, np.float32(0), np.where(is_g, np.float32(2), np.float32(4)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hue = (numerator / delta + sector) % 6
+        saturation = np.where(max_c > 0, delta / max_c, np.float32(0))
+    hue_bins = np.minimum((np.nan_to_num(hue) * (HUE_BINS / 6)).astype(np.intp), HUE_BINS - 1)
+    hue_hist = _batch_histogram(hue_bins, HUE_BINS, saturation) / n_pixels
+
+    # Histogramas de orientación del gradiente (sin signo) por celda, ponderados
+    # por su magnitud. Todo en float32 y en el sitio (arctan2 en float32 resulta
+    # más rápido que comparar con los límites de los intervalos)
+    gray = images @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, :, 1:-1] = gray[:, :, 2:] - gray[:, :, :-2]
+    gy[:, 1:-1, :] = gray[:, 2:, :] - gray[:, :-2, :]
+    gx, gy = gx.reshape(n_images, -1), gy.reshape(n_images, -1)
+    magnitude = np.sqrt(gx * gx + gy * gy)
+    orientation = np.arctan2(gy, gx)
+    orientation %= np.float32(np.pi)
+    orientation *= np.float32(ORIENTATION_BINS / np.pi)
+    orientation_bins = np.minimum(orientation.astype(np.intp), ORIENTATION_BINS - 1)
+    n_cells = GRADIENT_GRID[0] * GRADIENT_GRID[1]
+    gradients = _batch_histogram(_GRADIENT_CELLS * ORIENTATION_BINS + orientation_bins,
+                                 n_cells * ORIENTATION_BINS, magnitude).reshape(n_images, n_cells, ORIENTATION_BINS)
+    gradients /= np.linalg.norm(gradients, axis=2, keepdims=True) + 1e-6
+
+    # Momentos de color por celda: media y desviación típica de cada canal, a
+    # partir de las sumas de los píxeles y de sus cuadrados (productos de matrices)
+    cell_pixels = (height // MOMENT_GRID[0]) * (width // MOMENT_GRID[1])
+    rows = images.reshape(n_images, height, width * 3)
+
+    def cell_sums(values):
+        columns = (values @ _MOMENT_POOLING).astype(np.float64)
+        return columns.reshape(n_images, MOMENT_GRID[0], -1, MOMENT_GRID[1] * 3).sum(axis=2).reshape(n_images, -1)
+
+    mean = cell_sums(rows) / cell_pixels
+    std = np.sqrt(np.maximum(cell_sums(rows * rows) / cell_pixels - mean * mean, 0))
+
+    return np.hstack([color, hue_hist, gradients.reshape(n_images, -1), mean, std]).astype(np.float32)
+
+
+def descriptor_transformer():
+    """Primer paso de los pipelines de estrellas entrenados con descriptores.
+
+    Recibe las mismas filas de píxeles que el modelo con píxeles, así que la
+    página y el registro de modelos usan ambos modelos igual.
+    """
+    return FunctionTransformer(image_descriptors).fit(np.zeros((1, IMAGE_FEATURES), dtype=np.float32))
@@ -0,0 +1,208 @@
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from joblib import Parallel, delayed
+from PIL import Image, ImageOps
+
+# Ruta del modelo de estrellas y tamaño (ancho, alto) de las imágenes con las que se entrenó
+IMAGE_MODEL_PATH = 'src/models/hoteles_foto.joblib'
+IMAGE_SIZE = (90, 30)
+
+# Longitud del vector de características de una imagen RGB
+IMAGE_FEATURES = IMAGE_SIZE[0] * IMAGE_SIZE[1] * 3
+
+# Extensiones de imagen que se aceptan (sueltas o dentro de un .zip)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Límite de imágenes de un archivo .zip, para no agotar la memoria
+MAX_ARCHIVE_IMAGES = 5000
+
+# Carpeta con las fotos de entrenamiento (una subcarpeta por número de estrellas)
+IMAGE_DATA_DIR = 'src/data/fotos'
+
+# Imágenes que procesa cada tarea al extraer las características a disco
+EXTRACT_CHUNKSIZE = 256
+
+# Lado mínimo al que se decodifican los JPEG antes de redimensionar: el
+# decodificador reduce la imagen (1/2, 1/4 o 1/8) sin llegar a este tamaño,
+# con margen suficiente para que el resultado final apenas cambie
+DRAFT_SIZE = max(IMAGE_SIZE) * 4
+
+# Lado mínimo con el que se decodifican las imágenes que se muestran en la
+# página (las características se calculan siempre a partir de DRAFT_SIZE)
+DISPLAY_SIZE = 800
+
+
+def to_rgb(image):
+    """Convierte cualquier modo de color a RGB de forma predecible.
+
+    Las imágenes con transparencia (RGBA, LA, paletas con transparencia) se
+    componen sobre fondo blanco en lugar de descartar el canal alfa; el
+    resto (escala de grises, CMYK, paletas, 16 bits) se convierte a RGB.
+    """
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+        return background
+    if image.mode in ('I', 'I;16', 'I;16B', 'I;16L', 'F'):
+        # Imágenes de 16 bits o en coma flotante: se escalan a 8 bits
+        array = np.asarray(image, dtype=np.float32)
+        scale = 255.0 / 65535.0 if image.mode.startswith('I') and array.max() > 255 else 1.0
+        image = Image.fromarray(np.clip(array * scale, 0, 255).astype(np.uint8))
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def open_image(data, min_size=DRAFT_SIZE):
+    """Decodifica una imagen (bytes, ruta o fichero) una sola vez y la devuelve en RGB.
+
+    En los JPEG se usa el modo borrador del decodificador, que reduce la
+    resolución al decodificar siempre que ambos lados sigan siendo al menos
+    `min_size` (None: resolución completa); así una foto de 12 MP no llega a
+    ocupar memoria a tamaño completo. Se aplica la orientación EXIF.
+    """
+    image = Image.open(io.BytesIO(data) if isinstance(data, bytes) else data)
+    if min_size is not None and image.format == 'JPEG':
+        image.draft('RGB', (min_size, min_size))
+    image = ImageOps.exif_transpose(image)
+    return to_rgb(image)
+
+
+def preprocess_image(image, out=None):
+    """Convierte una imagen de PIL en la fila de características del modelo de estrellas.
+
+    Convierte la imagen a RGB, la redimensiona al tamaño que espera el modelo
+    (30x90), normaliza los píxeles a [0, 1] y la aplana en una matriz float32
+    de una fila. Con `out` se escribe en ese vector en lugar de crear uno.
+    """
+    pixels = np.asarray(to_rgb(image).resize(IMAGE_SIZE)).reshape(-1)
+    if out is None:
+        out = np.empty((1, IMAGE_FEATURES), dtype=np.float32)
+    np.divide(pixels, np.float32(255.0), out=out.reshape(-1), casting='unsafe')
+    return out
+
+
+def expand_uploads(files):
+    """Lista de (nombre, bytes) de las imágenes subidas.
+
+    `files` son objetos con `name` y `read()` (como los de `st.file_uploader`);
+    los `.zip` se abren y se toman las imágenes que contienen.
+    """
+    images = []
+    for file in files:
+        if not file.name.lower().endswith('.zip'):
+            images.append((file.name, file.read()))
+            continue
+        with zipfile.ZipFile(file) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                # Se omiten carpetas y los metadatos que añade macOS
+                if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+                    continue
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    if len(images) >= MAX_ARCHIVE_IMAGES:
+                        raise ValueError(f"El archivo tiene más de {MAX_ARCHIVE_IMAGES:,} imágenes")
+                    images.append((name, archive.read(info)))
+    return images
+
+
+def preprocess_images(images, workers=None):
+    """Matriz de características float32 de varias imágenes (bytes o rutas).
+
+    Las imágenes se decodifican (en modo borrador, ver `open_image`) y
+    redimensionan a la vez en un pool de hilos (PIL libera el GIL mientras
+    decodifica) y cada una escribe directamente en su fila de una matriz
+    preasignada. Devuelve la matriz y un dict índice -> mensaje con las
+    imágenes que no se han podido leer (sus filas quedan a cero).
+    """
+    X = np.zeros((len(images), IMAGE_FEATURES), dtype=np.float32)
+    errors = {}
+
+    def decode(i):
+        try:
+            with open_image(images[i]) as image:
+                preprocess_image(image, out=X[i])
+        except Exception as e:
+            errors[i] = str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(decode, range(len(images))))
+    return X, errors
+
+
+def iter_labelled_images(root=IMAGE_DATA_DIR):
+    """Genera (ruta, estrellas) de las imágenes de `root`.
+
+    Cada subcarpeta cuyo nombre empieza por un número (`3`, `4_estrellas`...)
+    contiene las fotos de hoteles con esas estrellas. Las rutas salen en
+    orden, así que el resultado es reproducible.
+    """
+    for folder in sorted(os.listdir(root)):
+        match = re.match(r'(\d+)', folder)
+        folder_path = os.path.join(root, folder)
+        if match is None or not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.'):
+                yield os.path.join(folder_path, name), int(match.group(1))
+
+
+def _extract_chunk(outputs, start, paths):
+    # Cada tarea decodifica sus imágenes y escribe solo sus filas en cada matriz en disco
+    pixels = np.zeros((len(paths), IMAGE_FEATURES), dtype=np.float32)
+    failed = []
+    for i, path in enumerate(paths):
+        try:
+            with open_image(path) as image:
+                preprocess_image(image, out=pixels[i])
+        except Exception:
+            failed.append(start + i)
+    for matrix_path, transform in outputs.items():
+        X = np.load(matrix_path, mmap_mode='r+')
+        X[start:start + len(paths)] = pixels if transform is None else transform(pixels)
+        X[failed] = 0
+        X.flush()
+    return failed
+
+
+def extract_features_to_disk(paths, outputs, n_jobs=None, chunksize=EXTRACT_CHUNKSIZE):
+    """Escribe las características de las imágenes de `paths` en matrices
+    float32 en disco (`.npy`) y las devuelve proyectadas en memoria.
+
+    `outputs` es un dict ruta -> transformación: cada matriz recibe los
+    píxeles de `preprocess_image` (transformación None) o el resultado de
+    aplicarles la transformación por lotes (p. ej. `image_descriptors`), así
+    que cada imagen se decodifica una sola vez aunque se pidan varias.
+
+    Las tareas se generan bajo demanda y, con `n_jobs` > 1 (por defecto, uno
+    por núcleo), se reparten entre procesos; cada una decodifica `chunksize`
+    imágenes y escribe sus filas directamente en los ficheros, así que la
+    memoria no depende del número de imágenes. Devuelve un dict ruta ->
+    matriz y los índices de las imágenes que no se han podido leer.
+    """
+    for matrix_path, transform in outputs.items():
+        os.makedirs(os.path.dirname(matrix_path) or '.', exist_ok=True)
+        sample = np.zeros((1, IMAGE_FEATURES), dtype=np.float32)
+        width = IMAGE_FEATURES if transform is None else transform(sample).shape[1]
+        X = np.lib.format.open_memmap(matrix_path, mode='w+', dtype=np.float32, shape=(len(paths), width))
+        del X
+    tasks = (delayed(_extract_chunk)(outputs, start, paths[start:start + chunksize])
+             for start in range(0, len(paths), chunksize))
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1:
+        failed = [i for task in tasks for i in task[0](*task[1], **task[2])]
+    else:
+        failed = [i for chunk in Parallel(n_jobs=n_jobs)(tasks) for i in chunk]
+    return {matrix_path: np.load(matrix_path, mmap_mode='r') for matrix_path in outputs}, failed
+
+
+def classify_images(model, X):
+    """Clase y confianza (0-1) de cada fila con una sola llamada a `predict_proba`."""
+    proba = model.predict_proba(X)
+    best = proba.argmax(axis=1)
+    return model.classes_[best], proba[np.arange(len(proba)), best]
@@ -0,0 +1,178 @@
+import threading
+import time
+
+from PIL import Image
+
+from src.utils.artifacts import load_serving_model, memory_footprint
+from src.utils.fast_inference import LazyEstimator
+from src.utils.features import (
+    CANCELACION_FEATURES, CANCELACION_INPUTS, PRECIO_FEATURES, PRECIO_INPUTS, build_features
+)
+from src.utils.images import IMAGE_MODEL_PATH, IMAGE_SIZE, preprocess_image
+from src.utils.prediction_cache import artifact_signature
+
+# Modelos de la aplicación: ruta, características y método que usan las páginas
+MODELS = {
+    'cancelacion': {
+        'path': 'src/models/cancelacion_model.joblib',
+        'features': CANCELACION_FEATURES,
+        'inputs': CANCELACION_INPUTS,
+        'method': 'predict_proba',
+    },
+    'precio': {
+        'path': 'src/models/adr_gbr.joblib',
+        'features': PRECIO_FEATURES,
+        'inputs': PRECIO_INPUTS,
+        'method': 'predict',
+    },
+    'estrellas': {
+        'path': IMAGE_MODEL_PATH,
+        'method': 'predict_proba',
+    },
+}
+
+# Reserva típica para la primera predicción de calentamiento
+WARMUP_BOOKING = {
+    'lead_time': 30, 'arrival_date_year': 2017, 'arrival_date_month': 'July',
+    'arrival_date_day_of_month': 15, 'stays_in_weekend_nights': 1, 'stays_in_week_nights': 2,
+    'adults': 2, 'children': 0, 'babies': 0, 'meal': 'BB', 'market_segment': 'Online TA',
+    'deposit_type': 'No Deposit', 'customer_type': 'Transient', 'reserved_room_type': 'A',
+    'adr': 100.0, 'required_car_parking_spaces': 0, 'total_of_special_requests': 1,
+    'previous_cancellations': 0, 'previous_bookings_not_canceled': 0, 'booking_changes': 0,
+    'days_in_waiting_list': 0, 'is_repeated_guest': 0,
+}
+
+# Estados de carga de cada modelo
+PENDING, LOADING, READY, FAILED = 'pendiente', 'cargando', 'listo', 'error'
+
+
+class _Entry:
+    # Estado de un modelo del registro
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.state = PENDING
+        self.model = None
+        self.error = None
+        self.signature = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.memory = None
+        # Se activa cuando termina una carga (con éxito o con error)
+        self.done = threading.Event()
+        # Solo un hilo carga el modelo a la vez
+        self.lock = threading.Lock()
+
+
+def warm_up(model, config):
+    """Primera predicción con datos de ejemplo, para que no la pague el primer usuario."""
+    if 'features' in config:
+        record = {name: WARMUP_BOOKING[name] for name in config['inputs']}
+        getattr(model, config['method'])(build_features(record))
+    else:
+        getattr(model, config['method'])(preprocess_image(Image.new('RGB', IMAGE_SIZE)))
+    # Los lotes grandes usan el estimador de scikit-learn, que el artefacto
+    # rápido carga bajo demanda: se carga ya para que no lo pague el primer lote
+    estimator = getattr(model, 'estimator', None)
+    if isinstance(estimator, LazyEstimator):
+        estimator.load()
+
+
+class ModelRegistry:
+    """Modelos de la aplicación compartidos por todas las sesiones del proceso.
+
+    `start()` carga y calienta todos los modelos en un hilo en segundo plano.
+    `get(name)` devuelve el modelo en cuanto está listo: solo espera si aún
+    se está cargando, lo carga en el hilo actual si todavía no se ha empezado
+    y lo vuelve a cargar si el `.joblib` ha cambiado.
+    """
+
+    def __init__(self, models=MODELS):
+        self.entries = {name: _Entry(name, config) for name, config in models.items()}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Empieza a cargar los modelos en segundo plano (solo la primera vez)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load_all, name='model-registry', daemon=True)
+                self._thread.start()
+
+    def _load_all(self):
+        for entry in self.entries.values():
+            self._load(entry)
+
+    def _load(self, entry):
+        with entry.lock:
+            signature = artifact_signature(entry.config['path'])
+            if entry.state in (READY, FAILED) and entry.signature == signature:
+                return
+            entry.state = LOADING
+            entry.done.clear()
+            entry.signature = signature
+            try:
+                start = time.perf_counter()
+                model = load_serving_model(entry.config['path'], entry.config.get('features'))
+                entry.load_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                warm_up(model, entry.config)
+                entry.warmup_seconds = time.perf_counter() - start
+                entry.memory = memory_footprint(model)
+                entry.model, entry.error, entry.state = model, None, READY
+            except Exception as e:
+                entry.model, entry.error, entry.state = None, e, FAILED
+            finally:
+                entry.done.set()
+
+    def is_ready(self, name):
+        """True si el modelo se puede usar sin esperar."""
+        entry = self.entries[name]
+        return entry.state == READY and entry.signature == artifact_signature(entry.config['path'])
+
+    def get(self, name, timeout=None):
+        """Devuelve el modelo `name`, esperando a que termine de cargarse si hace falta.
+
+        Lanza el error de la carga si ha fallado y TimeoutError si no está
+        listo en `timeout` segundos.
+        """
+        entry = self.entries[name]
+        if entry.state == LOADING and not entry.done.wait(timeout):
+            raise TimeoutError(f"El modelo {name} no se ha cargado en {timeout} s")
+        # Carga pendiente o .joblib modificado: se carga aquí (si otro hilo ya
+        # lo está cargando, se espera a que termine)
+        self._load(entry)
+        if entry.state == FAILED:
+            raise entry.error
+        return entry.model
+
+    def status(self):
+        """Estado, tiempos de carga y memoria de cada modelo."""
+        rows = []
+        for name, entry in self.entries.items():
+            memory = entry.memory or {}
+            rows.append({
+                'model': name,
+                'state': entry.state,
+                'load_seconds': entry.load_seconds,
+                'warmup_seconds': entry.warmup_seconds,
+                'mapped_mb': memory.get('mapped_mb'),
+                'private_mb': memory.get('private_mb'),
+                'error': str(entry.error) if entry.error is not None else None,
+            })
+        return rows
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Registro único del proceso, con la carga en segundo plano ya iniciada."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+            _registry.start()
+        return _registry
@@ -0,0 +1,87 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.utils.artifacts import load_serving_model
+from src.utils.features import PRECIO_FEATURES
+from src.utils.scoring import DEFAULT_CHUNKSIZE, score_prices
+
+MODEL_PATH = 'src/models/adr_gbr.joblib'
+
+# Modelo cargado una sola vez en cada proceso de trabajo
+_worker_model = None
+
+
+def load_price_model(model_path=MODEL_PATH):
+    return load_serving_model(model_path, PRECIO_FEATURES)
+
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = load_price_model(model_path)
+
+
+def _score_chunk(chunk):
+    return score_prices(_worker_model, chunk)
+
+
+def predict_file(input_path, output_path, model_path=MODEL_PATH, chunksize=DEFAULT_CHUNKSIZE, workers=None):
+    """Calcula el precio estimado de todas las reservas de un CSV.
+
+    El archivo se lee por bloques, cada bloque se puntúa en un proceso del
+    pool y los resultados se escriben en orden a medida que terminan. El
+    número de bloques en vuelo está limitado para acotar la memoria.
+    Devuelve el número de reservas procesadas.
+    """
+    workers = workers or os.cpu_count() or 1
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+    total_rows = 0
+    header = True
+
+    def write(scored):
+        nonlocal total_rows, header
+        scored.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        total_rows += len(scored)
+        print(f"{total_rows:,} reservas procesadas...")
+
+    if workers == 1:
+        model = load_price_model(model_path)
+        for chunk in reader:
+            write(score_prices(model, chunk))
+        return total_rows
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        pending = deque()
+        for chunk in reader:
+            pending.append(pool.submit(_score_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predicción masiva del precio medio por noche (ADR)")
+    parser.add_argument('input', help="CSV de reservas con el formato de hotel_bookings.csv")
+    parser.add_argument('output', help="CSV de salida con predicted_adr y predicted_total_price")
+    parser.add_argument('--model', default=MODEL_PATH, help="Ruta del modelo de precios")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Reservas por bloque")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, todos los núcleos)")
+    args = parser.parse_args()
+
+    print("Calculando precios...")
+    start = time.perf_counter()
+    total_rows = predict_file(args.input, args.output, model_path=args.model,
+                              chunksize=args.chunksize, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"¡{total_rows:,} reservas procesadas en {elapsed:.1f} s ({total_rows / max(elapsed, 1e-9):,.0f} reservas/s)!")
+
+
+if __name__ == '__main__':
+    main()
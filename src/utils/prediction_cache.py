@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.data import file_hash
+
+# Valores por defecto (se pueden cambiar con variables de entorno)
+DEFAULT_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))
+DEFAULT_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+
+
+def _canonical(value):
+    # Secuencias de un elemento (salida de build_features) -> escalar
+    if isinstance(value, (list, tuple, np.ndarray)) and np.size(value) == 1:
+        value = np.ravel(value)[0]
+    if isinstance(value, np.generic):
+        value = value.item()
+    # 2, 2.0 y True deben dar la misma clave que el modelo recibe igual
+    if isinstance(value, (bool, int, float)):
+        value = float(value)
+        return None if value != value else value
+    return str(value)
+
+
+def row_key(row):
+    """Hash canónico de una fila de entrada (independiente del orden y del tipo numérico)."""
+    canonical = {name: _canonical(value) for name, value in row.items()}
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def artifact_signature(path):
+    """Identifica la versión de un fichero de modelo (None si no existe)."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def artifact_matches(path, signature, sha256=None):
+    """True si `path` sigue siendo la versión registrada con `signature`.
+
+    Al clonar, copiar o desplegar el repositorio cambia la fecha del fichero
+    aunque el contenido sea el mismo: si la fecha no coincide pero el tamaño
+    sí, se compara el hash `sha256` del contenido (si se conoce).
+    """
+    current = artifact_signature(path)
+    if current is None or signature is None:
+        return False
+    if list(current) == list(signature):
+        return True
+    return sha256 is not None and current[1] == signature[1] and file_hash(path) == sha256
+
+
+class PredictionCache:
+    """Caché LRU de predicciones con caducidad, compartida entre sesiones.
+
+    Es segura entre hilos. `bind` asocia la caché a la versión del modelo y
+    la vacía cuando el artefacto cambia.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bind(self, signature):
+        """Devuelve True (y vacía la caché) si la versión del modelo ha cambiado."""
+        with self._lock:
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            self._entries.clear()
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, row, compute):
+        """Devuelve la predicción guardada para `row` o la calcula con `compute()`."""
+        if self.maxsize <= 0:
+            return compute()
+        key = row_key(row)
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,182 @@
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+
+from threadpoolctl import threadpool_limits
+
+from src.utils.fast_inference import LazyEstimator
+from src.utils.scoring_server import DEFAULT_HOST, DEFAULT_PORT, ScoringService, add_limit_arguments, make_server
+
+# Si un proceso de trabajo muere antes de este tiempo se espera antes de
+# relanzarlo, para no entrar en un bucle de arranques fallidos
+MIN_WORKER_SECONDS = 1.0
+
+
+def process_memory(pid):
+    """Memoria de un proceso en MB según /proc/<pid>/smaps_rollup (solo Linux).
+
+    `rss_mb` cuenta todas las páginas residentes, también las compartidas;
+    `pss_mb` reparte cada página compartida entre los procesos que la usan
+    (la suma de los PSS es la memoria real de un grupo de procesos) y
+    `private_mb` son las páginas que solo usa este proceso.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            next(f)  # cabecera con el rango de direcciones
+            kb = {name: int(value.split()[0]) for name, value in (line.split(':', 1) for line in f)}
+    except (OSError, StopIteration):
+        return None
+    return {
+        'rss_mb': kb['Rss'] / 1024,
+        'pss_mb': kb['Pss'] / 1024,
+        'private_mb': (kb['Private_Clean'] + kb['Private_Dirty']) / 1024,
+    }
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def tree_memory(pid):
+    """Memoria del proceso `pid` y de sus hijos directos, y los totales."""
+    processes = {p: process_memory(p) for p in [pid] + child_pids(pid)}
+    processes = {p: memory for p, memory in processes.items() if memory is not None}
+    total = {name: sum(memory[name] for memory in processes.values())
+             for name in ('rss_mb', 'pss_mb', 'private_mb')}
+    return {'processes': processes, 'total': total}
+
+
+def preload(service):
+    """Carga en el proceso padre todo lo que usarán los procesos de trabajo.
+
+    Además de los modelos compilados (cuyos arrays están proyectados desde
+    los artefactos rápidos), carga los estimadores de scikit-learn que solo
+    se usan con los lotes grandes, para que no los cargue cada proceso por
+    su cuenta. Cada proceso de trabajo usa un solo núcleo.
+    """
+    service.load()
+    for name in service.names:
+        estimator = getattr(service.registry.get(name), 'estimator', None)
+        if isinstance(estimator, LazyEstimator):
+            estimator = estimator.load()
+        if hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = 1
+
+
+class PreforkServer:
+    """Servicio de predicción repartido entre varios procesos.
+
+    El padre carga los modelos una sola vez, abre el socket y crea
+    `workers` procesos con `fork`. Los hijos heredan los modelos sin
+    copiarlos: los arrays de los artefactos rápidos están proyectados desde
+    disco y el resto de la memoria del padre se comparte mientras nadie la
+    modifique (copy-on-write). Todos los hijos aceptan conexiones del mismo
+    socket, así que el sistema reparte las conexiones entre ellos. Cada hijo
+    tiene sus propios micro-lotes y el padre relanza los que terminan.
+    """
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, quiet=True):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.quiet = quiet
+        self.server = None
+        self.pids = {}
+        self.stopping = False
+
+    def start(self):
+        preload(self.service)
+        # Los objetos que ya existen pasan a la generación permanente: el
+        # recolector de basura de los hijos no los recorre ni ensucia sus páginas
+        gc.collect()
+        gc.freeze()
+        self.server = make_server(self.service, self.host, self.port, quiet=self.quiet)
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.pids[pid] = time.monotonic()
+
+    def _run_worker(self):
+        # Proceso hijo: no vuelve nunca al código del padre
+        status = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            with threadpool_limits(1):
+                self.service.start()
+                self.server.serve_forever()
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+
+    def supervise(self):
+        """Espera a los procesos de trabajo y relanza los que terminan."""
+        while not self.stopping:
+            pid, status = os.wait()
+            started = self.pids.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            print(f"El proceso {pid} ha terminado (estado {status}); se relanza")
+            if time.monotonic() - started < MIN_WORKER_SECONDS:
+                time.sleep(MIN_WORKER_SECONDS)
+            self._spawn()
+
+    def stop(self):
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.pids):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.pids.clear()
+        if self.server is not None:
+            self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de predicción con varios procesos que comparten los modelos")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Dirección en la que escuchar")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Puerto en el que escuchar")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser.add_argument('--verbose', action='store_true', help="Registrar cada petición")
+    add_limit_arguments(parser)
+    args = parser.parse_args()
+    if not hasattr(os, 'fork'):
+        parser.error("Este modo necesita os.fork (Linux o macOS); usa src.utils.scoring_server")
+
+    service = ScoringService(args.models, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                             max_queue=args.max_queue, timeout=args.timeout)
+    server = PreforkServer(service, args.host, args.port, args.workers, quiet=not args.verbose)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print("Cargando modelos...")
+    try:
+        server.start()
+        print(f"Servicio de predicción en http://{args.host}:{args.port} con {server.workers} procesos "
+              f"(modelos: {', '.join(args.models)})")
+        server.supervise()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
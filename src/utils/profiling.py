@@ -0,0 +1,86 @@
+import json
+import os
+import resource
+import sys
+import time
+
+
+def current_rss_mb():
+    """Memoria residente actual del proceso en MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Pico de memoria residente en MB desde el último `reset_peak_rss`."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss():
+    """Reinicia el pico de RSS (solo en Linux; en otros sistemas el pico es acumulado)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class StageProfiler:
+    """Mide el tiempo y el pico de memoria de cada etapa de un script.
+
+    Pensado para scripts lineales: `stage(nombre)` cierra la etapa anterior y
+    abre la siguiente, y `finish()` cierra la última e imprime el resumen.
+    """
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.stages = []
+        self._current = None
+
+    def stage(self, name):
+        self._close()
+        reset_peak_rss()
+        self._current = (name, time.perf_counter(), current_rss_mb())
+
+    def _close(self):
+        if self._current is None:
+            return
+        name, start, rss_start = self._current
+        record = {
+            'stage': name,
+            'seconds': time.perf_counter() - start,
+            'rss_start_mb': rss_start,
+            'rss_end_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        self.stages.append(record)
+        self._current = None
+        if self.verbose:
+            print(f"  [{name}] {record['seconds']:.2f} s, pico RSS {record['peak_rss_mb']:.0f} MB")
+
+    def finish(self):
+        self._close()
+        if self.verbose and self.stages:
+            print("\nResumen por etapas:")
+            for record in self.stages:
+                print(f"  {record['stage']:<28} {record['seconds']:>8.2f} s {record['peak_rss_mb']:>8.0f} MB")
+        return self.stages
+
+    def save(self, path):
+        """Guarda las etapas registradas en un fichero JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.stages, f, indent=2)
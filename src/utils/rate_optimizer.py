@@ -0,0 +1,234 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.utils.artifacts import load_serving_model
+from src.utils.features import CANCELACION_FEATURES, CANCELACION_INPUTS, PRECIO_FEATURES, PRECIO_INPUTS, build_features
+from src.utils.scoring import check_columns
+
+CANCELACION_MODEL_PATH = 'src/models/cancelacion_model.joblib'
+PRICE_MODEL_PATH = 'src/models/adr_gbr.joblib'
+
+# Tipos de depósito que se pueden ofrecer y parte del importe de la estancia
+# que el hotel conserva si la reserva se cancela con cada uno. Por defecto
+# solo cuentan las estancias realizadas; con `--retention` se puede contar
+# el depósito que se queda el hotel
+DEPOSIT_TYPES = ['No Deposit', 'Refundable', 'Non Refund']
+DEPOSIT_RETENTION = {'No Deposit': 0.0, 'Refundable': 0.0, 'Non Refund': 0.0}
+
+# Tarifas candidatas: múltiplos del precio medio por noche que estima el
+# modelo de precios para la reserva con cada tipo de depósito. No hay un
+# modelo de demanda, así que esta banda es la que acota la tarifa
+RATE_FACTORS = np.linspace(0.7, 1.3, 61)
+
+# Columnas que necesita el optimizador (la tarifa y el depósito son lo que se busca)
+RATE_INPUTS = [f for f in dict.fromkeys(CANCELACION_INPUTS + PRECIO_INPUTS) if f not in ('adr', 'deposit_type')]
+
+# Reservas por bloque: cada una genera len(DEPOSIT_TYPES) * len(RATE_FACTORS) filas
+DEFAULT_CHUNKSIZE = 500
+
+# Modelos cargados una sola vez en cada proceso de trabajo
+_worker_models = None
+
+
+def optimize_rates(cancel_model, price_model, bookings, factors=RATE_FACTORS, deposit_types=DEPOSIT_TYPES,
+                   retention=DEPOSIT_RETENTION, curves=False):
+    """Tarifa y tipo de depósito que maximizan el ingreso esperado de cada reserva.
+
+    Para cada reserva de `bookings` (un DataFrame) el modelo de precios da el
+    precio de referencia con cada tipo de depósito y las tarifas candidatas
+    son esos precios multiplicados por `factors`. Todas las combinaciones
+    (reservas x depósitos x tarifas) se puntúan con una sola llamada a
+    `predict_proba` del modelo de cancelaciones, y el ingreso esperado es
+
+        tarifa * noches * (P(no cancela) + P(cancela) * retention[depósito])
+
+    Devuelve las reservas con la tarifa y el depósito óptimos, su
+    probabilidad de cancelación y su ingreso esperado (y el de la tarifa y
+    el depósito actuales si el archivo trae `adr` y `deposit_type`), y con
+    `curves=True` también un DataFrame con todas las combinaciones evaluadas.
+    `bound_hit` marca las reservas cuya tarifa óptima está en un extremo de
+    la banda: su óptimo real puede estar fuera y solo lo limita la banda.
+    """
+    check_columns(bookings.columns, RATE_INPUTS)
+    n_bookings, n_deposits, n_rates = len(bookings), len(deposit_types), len(factors)
+    columns = {name: bookings[name].to_numpy() for name in RATE_INPUTS}
+    deposits = np.asarray(deposit_types, dtype=object)
+
+    # Precio de referencia de cada reserva con cada tipo de depósito
+    price_rows = {name: np.repeat(columns[name], n_deposits) for name in PRECIO_INPUTS if name != 'deposit_type'}
+    price_rows['deposit_type'] = np.tile(deposits, n_bookings)
+    reference = np.maximum(price_model.predict(build_features(price_rows)), 0).reshape(n_bookings, n_deposits)
+    rates = reference[:, :, None] * np.asarray(factors)
+
+    # Todas las tarifas candidatas (y, si se conocen, las actuales) en un solo lote
+    has_current = 'adr' in bookings.columns and 'deposit_type' in bookings.columns
+    n_rows = n_deposits * n_rates
+    cancel_rows = {name: np.repeat(columns[name], n_rows)
+                   for name in CANCELACION_INPUTS if name not in ('adr', 'deposit_type')}
+    cancel_rows['deposit_type'] = np.tile(np.repeat(deposits, n_rates), n_bookings)
+    cancel_rows['adr'] = rates.ravel()
+    if has_current:
+        for name in cancel_rows:
+            current = bookings[name].to_numpy() if name in ('adr', 'deposit_type') else columns[name]
+            cancel_rows[name] = np.concatenate([cancel_rows[name], current])
+    proba = cancel_model.predict_proba(build_features(cancel_rows))[:, 1]
+
+    nights = (columns['stays_in_weekend_nights'].astype(np.int64)
+              + columns['stays_in_week_nights'].astype(np.int64))
+    kept = np.array([retention.get(deposit, 0.0) for deposit in deposit_types])
+    grid_proba = proba[:n_bookings * n_rows].reshape(n_bookings, n_deposits, n_rates)
+    revenue = rates * nights[:, None, None] * (1 - grid_proba + grid_proba * kept[:, None])
+
+    best = revenue.reshape(n_bookings, -1).argmax(axis=1)
+    rows = np.arange(n_bookings)
+    best_deposit, best_rate = np.divmod(best, n_rates)
+    result = bookings.assign(
+        reference_adr=reference[rows, best_deposit],
+        optimal_adr=rates[rows, best_deposit, best_rate],
+        optimal_deposit_type=deposits[best_deposit],
+        optimal_cancellation_probability=grid_proba[rows, best_deposit, best_rate],
+        expected_revenue=revenue[rows, best_deposit, best_rate],
+        bound_hit=(best_rate == 0) | (best_rate == n_rates - 1),
+    )
+    if has_current:
+        current_proba = proba[n_bookings * n_rows:]
+        current_kept = np.array([retention.get(deposit, 0.0) for deposit in bookings['deposit_type']])
+        result['current_expected_revenue'] = (bookings['adr'].to_numpy() * nights
+                                              * (1 - current_proba + current_proba * current_kept))
+    if not curves:
+        return result, None
+    curve = pd.DataFrame({
+        'booking': np.repeat(bookings.index.to_numpy(), n_rows),
+        'deposit_type': cancel_rows['deposit_type'][:n_bookings * n_rows],
+        'rate_factor': np.tile(np.asarray(factors), n_bookings * n_deposits),
+        'adr': rates.ravel(),
+        'cancellation_probability': grid_proba.ravel(),
+        'expected_revenue': revenue.ravel(),
+    })
+    return result, curve
+
+
+def optimal_rate(cancel_model, price_model, booking, **kwargs):
+    """Mejor tarifa de una sola reserva (dict de entradas) y su curva de ingresos."""
+    result, curve = optimize_rates(cancel_model, price_model, pd.DataFrame([booking]), curves=True, **kwargs)
+    return result.iloc[0].to_dict(), curve.drop(columns='booking')
+
+
+def load_models(cancel_path=CANCELACION_MODEL_PATH, price_path=PRICE_MODEL_PATH):
+    return (load_serving_model(cancel_path, CANCELACION_FEATURES),
+            load_serving_model(price_path, PRECIO_FEATURES))
+
+
+def _init_worker(cancel_path, price_path):
+    global _worker_models
+    _worker_models = load_models(cancel_path, price_path)
+
+
+def _optimize_chunk(chunk, kwargs):
+    return optimize_rates(*_worker_models, chunk, **kwargs)
+
+
+def optimize_file(input_path, output_path, curves_path=None, cancel_path=CANCELACION_MODEL_PATH,
+                  price_path=PRICE_MODEL_PATH, chunksize=DEFAULT_CHUNKSIZE, workers=None, **kwargs):
+    """Calcula la tarifa óptima de todas las reservas de un CSV.
+
+    Igual que `predict_price_batch`: el archivo se lee por bloques, cada
+    bloque se optimiza en un proceso del pool (con los dos modelos cargados
+    una vez por proceso) y los resultados se escriben en orden. Con
+    `curves_path` se guardan también las curvas de ingresos de cada reserva.
+    Devuelve el número de reservas procesadas y cuántas tienen la tarifa
+    óptima en un extremo de la banda.
+    """
+    workers = workers or os.cpu_count() or 1
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+    kwargs['curves'] = curves_path is not None
+    total_rows = 0
+    bound_hits = 0
+    header = True
+
+    def write(scored):
+        nonlocal total_rows, bound_hits, header
+        result, curve = scored
+        result.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        if curve is not None:
+            curve.to_csv(curves_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        total_rows += len(result)
+        bound_hits += int(result['bound_hit'].sum())
+        print(f"{total_rows:,} reservas procesadas...")
+
+    if workers == 1:
+        models = load_models(cancel_path, price_path)
+        for chunk in reader:
+            write(optimize_rates(*models, chunk, **kwargs))
+        return total_rows, bound_hits
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cancel_path, price_path)) as pool:
+        pending = deque()
+        for chunk in reader:
+            pending.append(pool.submit(_optimize_chunk, chunk, kwargs))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return total_rows, bound_hits
+
+
+def parse_retention(values):
+    """Convierte argumentos 'Tipo de depósito=fracción' en un dict de retención."""
+    retention = dict(DEPOSIT_RETENTION)
+    for value in values:
+        deposit, _, fraction = value.rpartition('=')
+        if deposit not in DEPOSIT_TYPES:
+            raise ValueError(f"Tipo de depósito desconocido: {deposit} (disponibles: {', '.join(DEPOSIT_TYPES)})")
+        retention[deposit] = float(fraction)
+    return retention
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tarifa y depósito que maximizan el ingreso esperado de cada reserva")
+    parser.add_argument('input', help="CSV de reservas con el formato de hotel_bookings.csv")
+    parser.add_argument('output', help="CSV de salida con la tarifa y el depósito óptimos")
+    parser.add_argument('--curves', default=None, help="CSV donde guardar las curvas de ingresos de cada reserva")
+    parser.add_argument('--cancel-model', default=CANCELACION_MODEL_PATH, help="Ruta del modelo de cancelaciones")
+    parser.add_argument('--price-model', default=PRICE_MODEL_PATH, help="Ruta del modelo de precios")
+    parser.add_argument('--min-factor', type=float, default=RATE_FACTORS[0],
+                        help="Tarifa mínima, como múltiplo del precio estimado")
+    parser.add_argument('--max-factor', type=float, default=RATE_FACTORS[-1],
+                        help="Tarifa máxima, como múltiplo del precio estimado")
+    parser.add_argument('--steps', type=int, default=len(RATE_FACTORS), help="Tarifas candidatas por tipo de depósito")
+    parser.add_argument('--deposit-types', nargs='+', choices=DEPOSIT_TYPES, default=DEPOSIT_TYPES,
+                        help="Tipos de depósito que se pueden ofrecer")
+    parser.add_argument('--retention', nargs='+', default=[],
+                        help="Parte de la estancia que se conserva al cancelar, p. ej. 'Refundable=0.2'")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Reservas por bloque")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, todos los núcleos)")
+    args = parser.parse_args()
+    try:
+        retention = parse_retention(args.retention)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("Buscando tarifas óptimas...")
+    start = time.perf_counter()
+    total_rows, bound_hits = optimize_file(
+        args.input, args.output, curves_path=args.curves, cancel_path=args.cancel_model,
+        price_path=args.price_model, chunksize=args.chunksize, workers=args.workers,
+        factors=np.linspace(args.min_factor, args.max_factor, args.steps), deposit_types=args.deposit_types,
+        retention=retention)
+    elapsed = time.perf_counter() - start
+    print(f"¡{total_rows:,} reservas procesadas en {elapsed:.1f} s ({total_rows / max(elapsed, 1e-9):,.0f} reservas/s)!")
+    if total_rows:
+        print(f"Tarifa óptima en un extremo de la banda: {bound_hits:,} reservas ({bound_hits / total_rows:.0%}); "
+              f"para ellas el óptimo lo fija la banda (ver --min-factor y --max-factor)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import (
+    GradientBoostingClassifier, GradientBoostingRegressor, HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+)
+from sklearn.metrics import f1_score, r2_score
+from sklearn.preprocessing import OrdinalEncoder
+
+from src.utils.artifacts import build_fast_artifact
+from src.utils.data import file_hash
+from src.utils.features import (
+    CANCELACION_FEATURES, CANCELACION_INPUTS, PRECIO_FEATURES, PRECIO_INPUTS, build_features
+)
+from src.utils.scoring import check_columns
+from src.utils.training import clean_price_target, transform_float32
+
+# Modelos que se pueden actualizar: ruta, características y objetivo
+MODELS = {
+    'cancelacion': {
+        'path': 'src/models/cancelacion_model.joblib',
+        'features': CANCELACION_FEATURES,
+        'inputs': CANCELACION_INPUTS,
+        'target': 'is_canceled',
+    },
+    'precio': {
+        'path': 'src/models/adr_gbr.joblib',
+        'features': PRECIO_FEATURES,
+        'inputs': PRECIO_INPUTS,
+        'target': 'adr',
+    },
+}
+
+# Árboles (o etapas de boosting) que se añaden en cada actualización
+DEFAULT_NEW_ESTIMATORS = 25
+
+
+def unknown_categories(preprocessor, X):
+    """Categorías de `X` que no estaban en el vocabulario del preprocesador.
+
+    El preprocesador no se vuelve a ajustar con los datos nuevos, así que
+    estas categorías se codifican como desconocidas (sin columna one-hot o
+    como NaN en el motor de histogramas). Devuelve un dict columna -> valores.
+    """
+    transformer = preprocessor.named_transformers_['cat']
+    encoder = transformer if isinstance(transformer, OrdinalEncoder) else transformer.named_steps['onehot']
+    columns = {name: columns for name, _, columns in preprocessor.transformers_}['cat']
+    columns = dict(zip(columns, encoder.categories_))
+    unknown = {}
+    for name, categories in columns.items():
+        values = pd.Series(X[name], dtype=object).dropna().unique()
+        new = sorted(set(values) - set(categories), key=str)
+        if new:
+            unknown[name] = new
+    return unknown
+
+
+def pad_known_categories(estimator, X, y):
+    """Completa (X, y) para que un HistGradientBoosting conserve sus categorías.
+
+    Cada `fit` del motor de histogramas, también con `warm_start`, vuelve a
+    calcular las categorías conocidas a partir de los datos que recibe, y las
+    que faltan pasan a ser desconocidas también para los árboles ya
+    entrenados. Se añade una fila con peso cero por cada categoría conocida
+    que no aparece en X (copia de la primera fila con esa categoría), de modo
+    que el vocabulario no cambia y las filas añadidas no influyen en el ajuste.
+    Devuelve X, y y los pesos de las filas.
+    """
+    X, y = np.asarray(X), np.asarray(y)
+    sample_weight = np.ones(len(X))
+    if estimator.is_categorical_ is None:
+        return X, y, sample_weight
+    padding = []
+    for i in np.flatnonzero(estimator.is_categorical_):
+        known = estimator._bin_mapper.bin_thresholds_[i]
+        for category in np.setdiff1d(known, X[:, i]):
+            row = X[0].copy()
+            row[i] = category
+            padding.append(row)
+    if not padding:
+        return X, y, sample_weight
+    return (np.vstack([X, padding]), np.concatenate([y, np.repeat(y[:1], len(padding))]),
+            np.concatenate([sample_weight, np.zeros(len(padding))]))
+
+
+def extend_estimator(estimator, X, y, n_new=DEFAULT_NEW_ESTIMATORS, replace=False):
+    """Amplía un estimador ya entrenado con `n_new` árboles ajustados sobre (X, y).
+
+    - Gradient Boosting (clásico o por histogramas): continúa el boosting con
+      `warm_start`, añadiendo etapas que corrigen el error del modelo actual
+      sobre las reservas nuevas.
+    - Random Forest: añade `n_new` árboles entrenados con las reservas nuevas
+      y, con `replace`, descarta los `n_new` árboles más antiguos para que el
+      bosque mantenga su tamaño. En boosting las etapas dependen unas de
+      otras, así que `replace` no tiene efecto.
+
+    Modifica el estimador y devuelve un dict con lo que ha cambiado.
+    """
+    classes = getattr(estimator, 'classes_', None)
+    if classes is not None and not np.isin(classes, np.unique(y)).all():
+        raise ValueError("Las reservas nuevas deben incluir todas las clases del modelo "
+                         f"({', '.join(map(str, classes))})")
+
+    if isinstance(estimator, (RandomForestClassifier, RandomForestRegressor)):
+        before = len(estimator.estimators_)
+        estimator.set_params(warm_start=True, n_estimators=before + n_new)
+        estimator.fit(X, y)
+        removed = 0
+        if replace:
+            estimator.estimators_ = estimator.estimators_[n_new:]
+            estimator.n_estimators = len(estimator.estimators_)
+            removed = n_new
+        return {'added': n_new, 'removed': removed, 'n_estimators': len(estimator.estimators_)}
+
+    if isinstance(estimator, (GradientBoostingClassifier, GradientBoostingRegressor)):
+        before = estimator.n_estimators_
+        estimator.set_params(warm_start=True, n_estimators=before + n_new)
+        estimator.fit(X, y)
+        return {'added': estimator.n_estimators_ - before, 'removed': 0, 'n_estimators': estimator.n_estimators_}
+
+    if isinstance(estimator, (HistGradientBoostingClassifier, HistGradientBoostingRegressor)):
+        before = estimator.n_iter_
+        # Sin parada temprana: se añaden exactamente n_new iteraciones
+        estimator.set_params(warm_start=True, early_stopping=False, max_iter=before + n_new)
+        X, y, sample_weight = pad_known_categories(estimator, X, y)
+        estimator.fit(X, y, sample_weight=sample_weight)
+        return {'added': estimator.n_iter_ - before, 'removed': 0, 'n_estimators': estimator.n_iter_}
+
+    raise ValueError(f"Modelo no soportado para actualización incremental: {type(estimator).__name__}")
+
+
+def next_version(model_path):
+    """Siguiente número de versión de un artefacto (`modelo.vN.joblib`)."""
+    stem, ext = os.path.splitext(model_path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r'\.v(\d+)' + re.escape(ext) + '$')
+    versions = [int(match.group(1)) for match in
+                (pattern.match(os.path.basename(path)) for path in glob.glob(f"{stem}.v*{ext}")) if match]
+    return max(versions, default=0) + 1
+
+
+def save_version(pipeline, model_path, manifest, promote=True, features=None):
+    """Guarda el modelo como `modelo.vN.joblib` (con su `.json` de metadatos)
+    y, con `promote`, lo copia a `model_path` para que lo use la aplicación.
+
+    La sustitución es atómica, así que la aplicación nunca lee un fichero a
+    medio escribir. Al promocionar se regenera también su artefacto de carga
+    rápida (ver `src.utils.artifacts`). Añade la versión y su ruta a `manifest`.
+    """
+    stem, ext = os.path.splitext(model_path)
+    version = next_version(model_path)
+    version_path = f"{stem}.v{version}{ext}"
+    manifest.update(version=version, path=version_path)
+    joblib.dump(pipeline, version_path)
+    with open(f"{stem}.v{version}.json", 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    if promote:
+        tmp_path = f"{model_path}.tmp-{os.getpid()}"
+        shutil.copyfile(version_path, tmp_path)
+        os.replace(tmp_path, model_path)
+        build_fast_artifact(model_path, features)
+
+
+def refresh_model(name, delta, delta_path, n_new=DEFAULT_NEW_ESTIMATORS, replace=False, promote=True):
+    """Actualiza el modelo `name` (ver MODELS) con las reservas de `delta`.
+
+    El preprocesador guardado se reutiliza tal cual, de modo que el
+    vocabulario de categorías y las escalas no cambian; solo crece el
+    estimador. Devuelve los metadatos de la nueva versión.
+    """
+    config = MODELS[name]
+    start = time.perf_counter()
+    pipeline = joblib.load(config['path'])
+    preprocessor, estimator = pipeline.steps[0][1], pipeline.steps[-1][1]
+
+    X = delta[config['features']]
+    y = delta[config['target']]
+    if name == 'precio':
+        y = clean_price_target(y)
+    unknown = unknown_categories(preprocessor, X)
+    for column, values in unknown.items():
+        print(f"  Aviso: categorías nuevas en {column} (se tratan como desconocidas): {', '.join(map(str, values))}")
+
+    Xt = transform_float32(preprocessor, X)
+    # Rendimiento del modelo actual en las reservas nuevas (antes de verlas)
+    if name == 'cancelacion':
+        metric, before = 'f1', f1_score(y, estimator.predict(Xt))
+    else:
+        metric, before = 'r2', r2_score(y, estimator.predict(Xt))
+    print(f"  {metric.upper()} del modelo actual en las reservas nuevas: {before:.4f}")
+
+    changes = extend_estimator(estimator, Xt, y, n_new=n_new, replace=replace)
+    manifest = {
+        'model': name,
+        'estimator': type(estimator).__name__,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'delta_file': os.path.abspath(delta_path),
+        'delta_hash': file_hash(delta_path),
+        'delta_rows': len(delta),
+        f'{metric}_before': before,
+        'unknown_categories': {column: list(map(str, values)) for column, values in unknown.items()},
+        **changes,
+    }
+    save_version(pipeline, config['path'], manifest, promote=promote, features=config['features'])
+    manifest['seconds'] = time.perf_counter() - start
+    print(f"  +{changes['added']} árboles, -{changes['removed']} árboles "
+          f"({changes['n_estimators']} en total) en {manifest['seconds']:.1f} s -> {manifest['path']}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualización incremental de los modelos con reservas nuevas")
+    parser.add_argument('delta', help="CSV con las reservas nuevas (formato de hotel_bookings.csv)")
+    parser.add_argument('--model', choices=[*MODELS, 'ambos'], default='ambos', help="Modelo a actualizar")
+    parser.add_argument('--estimators', type=int, default=DEFAULT_NEW_ESTIMATORS,
+                        help="Árboles o etapas de boosting que se añaden")
+    parser.add_argument('--replace', action='store_true',
+                        help="Random Forest: descartar tantos árboles antiguos como se añaden")
+    parser.add_argument('--no-promote', action='store_true',
+                        help="Guardar solo la versión nueva, sin sustituir el modelo que usa la aplicación")
+    args = parser.parse_args()
+
+    print("Cargando reservas nuevas...")
+    delta = pd.read_csv(args.delta)
+    names = list(MODELS) if args.model == 'ambos' else [args.model]
+    for name in names:
+        check_columns(delta.columns, MODELS[name]['inputs'] + [MODELS[name]['target']])
+    delta = build_features(delta)
+    print(f"{len(delta):,} reservas nuevas")
+
+    for name in names:
+        print(f"\nActualizando modelo de {name}...")
+        refresh_model(name, delta, args.delta, n_new=args.estimators, replace=args.replace,
+                      promote=not args.no_promote)
+    print("\n¡Modelos actualizados!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.features import (
+    CANCELACION_FEATURES, CANCELACION_INPUTS, PRECIO_FEATURES, PRECIO_INPUTS, build_features
+)
+
+# Filas por bloque al puntuar archivos de reservas
+DEFAULT_CHUNKSIZE = 5000
+
+# Umbrales de riesgo de cancelación (los mismos que la predicción individual)
+HIGH_RISK_THRESHOLD = 0.7
+MEDIUM_RISK_THRESHOLD = 0.3
+RISK_LEVELS = ['ALTO', 'MEDIO', 'BAJO']
+
+
+def risk_levels(proba):
+    """Nivel de riesgo (ALTO/MEDIO/BAJO) para un array de probabilidades."""
+    proba = np.asarray(proba)
+    return np.select(
+        [proba > HIGH_RISK_THRESHOLD, proba > MEDIUM_RISK_THRESHOLD],
+        RISK_LEVELS[:2],
+        default=RISK_LEVELS[2]
+    ).astype(object)
+
+
+def check_columns(columns, required):
+    missing = [c for c in required if c not in columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en el archivo de reservas: {', '.join(missing)}")
+
+
+def score_cancellations(model, bookings):
+    """Añade la probabilidad y el nivel de riesgo de cancelación a un bloque de reservas."""
+    check_columns(bookings.columns, CANCELACION_INPUTS)
+    features = build_features(bookings[CANCELACION_INPUTS])
+    proba = model.predict_proba(features[CANCELACION_FEATURES])[:, 1]
+    return bookings.assign(cancellation_probability=proba, risk_level=risk_levels(proba))
+
+
+def iter_cancellation_scores(model, source, chunksize=DEFAULT_CHUNKSIZE):
+    """Puntúa un CSV de reservas por bloques, sin cargarlo entero en memoria.
+
+    `source` es una ruta o un objeto tipo fichero con el esquema de
+    `hotel_bookings.csv`. Devuelve un generador de DataFrames puntuados.
+    """
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        yield score_cancellations(model, chunk)
+
+
+def score_prices(model, bookings):
+    """Añade el precio medio por noche estimado y el precio total a un bloque de reservas."""
+    check_columns(bookings.columns, PRECIO_INPUTS)
+    features = build_features(bookings[PRECIO_INPUTS])
+    # Igual que en la página, los precios negativos se ajustan a cero
+    predicted_adr = np.maximum(model.predict(features[PRECIO_FEATURES]), 0)
+    return bookings.assign(
+        predicted_adr=predicted_adr,
+        predicted_total_price=predicted_adr * features['total_nights'].to_numpy()
+    )
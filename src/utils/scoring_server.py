@@ -0,0 +1,366 @@
+import argparse
+import base64
+import binascii
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.utils.features import CANCELACION_CATEGORICAL, PRECIO_CATEGORICAL, build_features
+from src.utils.images import IMAGE_FEATURES, classify_images, open_image, preprocess_image
+from src.utils.model_registry import MODELS, ModelRegistry
+from src.utils.scoring import risk_levels
+
+# Límites por defecto de los micro-lotes: filas por llamada al modelo, espera
+# máxima para llenar un lote, peticiones en cola por modelo y tiempo máximo
+# de respuesta
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_TIMEOUT = 10.0
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Tamaño máximo del cuerpo de una petición (las imágenes van en base64)
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Conexiones pendientes de aceptar (el valor por defecto, 5, hace que se
+# pierdan conexiones cuando llegan muchos clientes a la vez)
+LISTEN_BACKLOG = 128
+
+
+class Overloaded(Exception):
+    """La cola del modelo está llena: el cliente debe reintentar más tarde."""
+
+
+class MicroBatcher:
+    """Agrupa las peticiones concurrentes de un modelo en micro-lotes.
+
+    Un hilo toma la primera petición de la cola y espera como mucho
+    `max_wait_ms` a que lleguen más, hasta sumar `max_batch_size` filas; todo
+    el lote se puntúa con una sola llamada a `predict_batch` (lista de
+    peticiones -> lista de resultados). Si la cola tiene ya `max_queue`
+    peticiones, `submit` lanza `Overloaded` en lugar de encolar más.
+    """
+
+    def __init__(self, name, predict_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_queue=DEFAULT_MAX_QUEUE):
+        self.name = name
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Petición que no cabía en el lote anterior
+        self._carry = None
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.rejected = 0
+        self.predict_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name=f'batcher-{name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, rows, n_rows):
+        """Encola una petición de `n_rows` filas y devuelve un Future con su resultado."""
+        future = Future()
+        try:
+            self._queue.put_nowait((rows, n_rows, future))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise Overloaded(f"Cola del modelo {self.name} llena ({self._queue.maxsize} peticiones)")
+        return future
+
+    def _next_batch(self):
+        item = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        batch = [item]
+        size = item[1]
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Sin tiempo de espera se toman igualmente las peticiones ya encoladas
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if size + item[1] > self.max_batch_size:
+                self._carry = item
+                break
+            batch.append(item)
+            size += item[1]
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._next_batch()
+            futures = [future for _, _, future in batch]
+            start = time.perf_counter()
+            try:
+                results = self.predict_batch([rows for rows, _, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    futures[0].set_exception(e)
+                else:
+                    # Una petición errónea no debe hacer fallar a las demás del lote
+                    for rows, _, future in batch:
+                        try:
+                            future.set_result(self.predict_batch([rows])[0])
+                        except Exception as e:
+                            future.set_exception(e)
+            else:
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.rows += size
+                self.batches += 1
+                self.predict_seconds += time.perf_counter() - start
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'rejected': self.rejected,
+                'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+                'predict_seconds': self.predict_seconds,
+            }
+
+
+# Columnas de texto de las reservas (el resto son numéricas)
+CATEGORICAL_INPUTS = set(CANCELACION_CATEGORICAL + PRECIO_CATEGORICAL)
+
+
+def _column(name, values):
+    if name in CATEGORICAL_INPUTS:
+        # Texto como objetos, igual que en los DataFrames de pandas
+        return np.array([None if value is None else str(value) for value in values], dtype=object)
+    try:
+        # Los valores nulos quedan como NaN, como en el CSV
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"El campo '{name}' debe ser numérico")
+
+
+def prepare_bookings(payload, inputs):
+    """Convierte `{"bookings": [...]}` (o una sola reserva) en un dict de columnas."""
+    records = payload.get('bookings', [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+        raise ValueError("Se esperaba una reserva o una lista de reservas en 'bookings'")
+    for i, record in enumerate(records):
+        missing = [name for name in inputs if name not in record]
+        if missing:
+            raise ValueError(f"Faltan campos en la reserva {i}: {', '.join(missing)}")
+    return {name: _column(name, [record[name] for record in records]) for name in inputs}, len(records)
+
+
+def prepare_images(payload):
+    """Decodifica `{"images": [base64, ...]}` en la matriz de características del modelo."""
+    images = payload.get('images') if isinstance(payload, dict) else None
+    if not isinstance(images, list) or not images:
+        raise ValueError("Se esperaba una lista de imágenes en base64 en 'images'")
+    X = np.empty((len(images), IMAGE_FEATURES), dtype=np.float32)
+    for i, data in enumerate(images):
+        try:
+            with open_image(base64.b64decode(data, validate=True)) as image:
+                preprocess_image(image, out=X[i])
+        except (binascii.Error, TypeError, OSError, ValueError) as e:
+            raise ValueError(f"No se ha podido leer la imagen {i}: {e}")
+    return X, len(images)
+
+
+def _split(values, parts):
+    # Reparte los resultados del lote entre las peticiones, en orden
+    bounds = np.cumsum([len(next(iter(part.values()))) if isinstance(part, dict) else len(part)
+                        for part in parts])[:-1]
+    return np.split(np.asarray(values), bounds) if len(parts) > 1 else [np.asarray(values)]
+
+
+def _concat(parts):
+    if isinstance(parts[0], dict):
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    return np.concatenate(parts)
+
+
+def predict_cancellations(model, parts):
+    proba = model.predict_proba(build_features(_concat(parts)))[:, 1]
+    return [[{'cancellation_probability': float(p), 'risk_level': level}
+             for p, level in zip(chunk, risk_levels(chunk))] for chunk in _split(proba, parts)]
+
+
+def predict_prices(model, parts):
+    features = build_features(_concat(parts))
+    # Igual que en la página, los precios negativos se ajustan a cero
+    adr = np.maximum(model.predict(features), 0)
+    total = adr * features['total_nights']
+    return [[{'predicted_adr': float(a), 'predicted_total_price': float(t)} for a, t in zip(chunk_adr, chunk_total)]
+            for chunk_adr, chunk_total in zip(_split(adr, parts), _split(total, parts))]
+
+
+def predict_stars(model, parts):
+    stars, confidence = classify_images(model, _concat(parts))
+    return [[{'stars': int(s), 'confidence': float(c)} for s, c in zip(chunk_stars, chunk_confidence)]
+            for chunk_stars, chunk_confidence in zip(_split(stars, parts), _split(confidence, parts))]
+
+
+# Cómo se leen las peticiones y se puntúan los lotes de cada modelo
+PREDICTORS = {
+    'cancelacion': (lambda payload: prepare_bookings(payload, MODELS['cancelacion']['inputs']),
+                    predict_cancellations),
+    'precio': (lambda payload: prepare_bookings(payload, MODELS['precio']['inputs']), predict_prices),
+    'estrellas': (prepare_images, predict_stars),
+}
+
+
+class ScoringService:
+    """Modelos de la aplicación detrás de un micro-batcher por modelo.
+
+    Los modelos se cargan con el mismo registro que la aplicación (artefactos
+    rápidos, calentamiento y recarga si cambia el `.joblib`). `start()` crea
+    los hilos de los micro-lotes; se llama aparte para poder cargar los
+    modelos antes de crear procesos.
+    """
+
+    def __init__(self, names=tuple(PREDICTORS), max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_TIMEOUT):
+        self.names = list(names)
+        self.registry = ModelRegistry({name: MODELS[name] for name in self.names})
+        self.limits = {'max_batch_size': max_batch_size, 'max_wait_ms': max_wait_ms, 'max_queue': max_queue}
+        self.timeout = timeout
+        self.batchers = {}
+
+    def load(self):
+        """Carga y calienta todos los modelos (lanza el error si alguno falla)."""
+        for name in self.names:
+            self.registry.get(name)
+
+    def start(self):
+        for name in self.names:
+            predict = PREDICTORS[name][1]
+            self.batchers[name] = MicroBatcher(
+                name, lambda parts, name=name, predict=predict: predict(self.registry.get(name), parts), **self.limits)
+
+    def predict(self, name, payload):
+        """Resultados de una petición; lanza ValueError, Overloaded o TimeoutError."""
+        rows, n_rows = PREDICTORS[name][0](payload)
+        future = self.batchers[name].submit(rows, n_rows)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"El modelo {name} no ha respondido en {self.timeout} s")
+
+    def health(self):
+        models = {row['model']: row for row in self.registry.status()}
+        for name, batcher in self.batchers.items():
+            models[name]['batching'] = batcher.stats()
+        return {'pid': os.getpid(), 'limits': self.limits, 'models': list(models.values())}
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """API JSON: `POST /predict/<modelo>` y `GET /health`."""
+
+    protocol_version = 'HTTP/1.1'
+    service = None
+    quiet = True
+
+    def _send(self, status, body, headers=()):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, self.service.health())
+        else:
+            self._send(404, {'error': f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        prefix = '/predict/'
+        name = self.path[len(prefix):] if self.path.startswith(prefix) else None
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(413, {'error': f"La petición supera {MAX_BODY_BYTES:,} bytes"})
+            return
+        body = self.rfile.read(length)
+        if name not in self.service.batchers:
+            self._send(404, {'error': f"Modelo desconocido: {name} (disponibles: {', '.join(self.service.batchers)})"})
+            return
+        try:
+            predictions = self.service.predict(name, json.loads(body))
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send(400, {'error': str(e)})
+        except Overloaded as e:
+            self._send(503, {'error': str(e)}, [('Retry-After', '1')])
+        except TimeoutError as e:
+            self._send(504, {'error': str(e)})
+        except Exception as e:
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+        else:
+            self._send(200, {'model': name, 'predictions': predictions})
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=True, bind_and_activate=True):
+    """Servidor HTTP (un hilo por conexión) que atiende las peticiones con `service`."""
+    handler = type('BoundScoringHandler', (ScoringHandler,), {'service': service, 'quiet': quiet})
+    server_class = type('ScoringHTTPServer', (ThreadingHTTPServer,),
+                        {'daemon_threads': True, 'request_queue_size': LISTEN_BACKLOG})
+    return server_class((host, port), handler, bind_and_activate=bind_and_activate)
+
+
+def add_limit_arguments(parser):
+    parser.add_argument('--models', nargs='+', choices=list(PREDICTORS), default=list(PREDICTORS),
+                        help="Modelos que se sirven")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Filas máximas por llamada al modelo (1 = sin micro-lotes)")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Espera máxima para completar un micro-lote, en milisegundos")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Peticiones en cola por modelo; por encima se responde 503")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="Segundos máximos de espera de una petición (504 si se superan)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON de predicción con micro-lotes")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Dirección en la que escuchar")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Puerto en el que escuchar")
+    parser.add_argument('--verbose', action='store_true', help="Registrar cada petición")
+    add_limit_arguments(parser)
+    args = parser.parse_args()
+
+    service = ScoringService(args.models, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                             max_queue=args.max_queue, timeout=args.timeout)
+    print("Cargando modelos...")
+    service.load()
+    service.start()
+    server = make_server(service, args.host, args.port, quiet=not args.verbose)
+    print(f"Servicio de predicción en http://{args.host}:{args.port} (modelos: {', '.join(args.models)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.features import build_features
+
+# Meses de llegada (como en el dataset) y tipos de habitación del formulario de precios
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August',
+          'September', 'October', 'November', 'December']
+ROOM_TYPES = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+
+# Valores que recorre cada curva del panel de sensibilidad: antelación (días),
+# duración de la estancia (noches) y mes de llegada
+SENSITIVITY_AXES = {
+    'lead_time': np.arange(0, 366),
+    'total_nights': np.arange(1, 31),
+    'arrival_date_month': np.array(MONTHS, dtype=object),
+}
+
+
+def split_nights(total_nights, is_weekend):
+    """Noches de fin de semana y entre semana de una estancia (escalar o array),
+    con el mismo reparto que el formulario de precios."""
+    weekend_ratio = 0.4 if is_weekend else 0.3
+    total_nights = np.asarray(total_nights)
+    weekend_nights = (total_nights * weekend_ratio).astype(np.int64)
+    return weekend_nights, total_nights - weekend_nights
+
+
+def sensitivity_grid(base, is_weekend, axes=SENSITIVITY_AXES, room_types=ROOM_TYPES):
+    """Todas las variantes de la reserva `base` (dict de entradas del modelo de precios).
+
+    Para cada eje de `axes` y cada tipo de habitación se recorren los valores
+    del eje dejando el resto de entradas como en `base`. Devuelve un dict de
+    arrays con todas las filas (listo para `build_features`) y un DataFrame con
+    el eje, el valor y el tipo de habitación de cada fila.
+    """
+    blocks = []
+    for axis, values in axes.items():
+        n = len(values) * len(room_types)
+        block = {name: np.full(n, value, dtype=object if isinstance(value, str) else None)
+                 for name, value in base.items()}
+        block['reserved_room_type'] = np.tile(np.asarray(room_types, dtype=object), len(values))
+        varied = np.repeat(values, len(room_types))
+        if axis == 'total_nights':
+            block['stays_in_weekend_nights'], block['stays_in_week_nights'] = split_nights(varied, is_weekend)
+        else:
+            block[axis] = varied
+        blocks.append((axis, varied, block))
+
+    grid = {name: np.concatenate([block[name] for _, _, block in blocks]) for name in base}
+    index = pd.DataFrame({
+        'axis': np.concatenate([np.full(len(varied), axis, dtype=object) for axis, varied, _ in blocks]),
+        'value': np.concatenate([varied.astype(object) for _, varied, _ in blocks]),
+        'room_type': grid['reserved_room_type'],
+    })
+    return grid, index
+
+
+def sensitivity_curves(model, base, is_weekend, axes=SENSITIVITY_AXES, room_types=ROOM_TYPES):
+    """Curvas de precio de la reserva `base` al variar cada eje de `axes`.
+
+    Toda la rejilla se puntúa con una sola llamada a `model.predict`. Devuelve
+    un dict eje -> DataFrame (índice: valores del eje; columnas: tipos de
+    habitación) con el precio previsto, recortado a cero como en la página.
+    """
+    grid, index = sensitivity_grid(base, is_weekend, axes, room_types)
+    index['price'] = np.maximum(model.predict(build_features(grid)), 0)
+    curves = {}
+    for axis, values in axes.items():
+        rows = index[index['axis'] == axis]
+        curves[axis] = rows.pivot(index='value', columns='room_type', values='price').reindex(
+            index=list(values), columns=room_types)
+    return curves
@@ -1,141 +1,161 @@
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
-from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.impute import SimpleImputer
-from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 import joblib
+import argparse
 from datetime import datetime
 
+from src.utils.artifacts import build_fast_artifact
+from src.utils.data import BOOKINGS_CSV, load_bookings
+from src.utils.fast_inference import compile_pipeline
+from src.utils.features import (
+    CANCELACION_FEATURES, CANCELACION_NUMERIC, CANCELACION_CATEGORICAL, build_features
+)
+from src.utils.profiling import StageProfiler
+from src.utils.training import (
+    ENGINES, HYPERPARAMETERS_PATH, booking_estimator, fit_candidates, load_hyperparameters,
+    native_categorical_preprocessor, onehot_preprocessor, prediction_latency, print_engine_report,
+    transform_float32
+)
+
+parser = argparse.ArgumentParser(description="Entrenamiento del modelo de cancelaciones")
+parser.add_argument('--lean', action='store_true',
+                    help="Modo ligero: libera los datos originales y entrena los candidatos uno tras otro en este proceso")
+parser.add_argument('--jobs', type=int, default=None,
+                    help="Candidatos entrenados a la vez en procesos separados (por defecto, uno por núcleo)")
+parser.add_argument('--engine', choices=ENGINES, default='exacto',
+                    help="Motor de Gradient Boosting: exacto (clásico), histograma o ambos para compararlos")
+parser.add_argument('--data', default=BOOKINGS_CSV, help="CSV de reservas de entrenamiento")
+parser.add_argument('--output', default='src/models/cancelacion_model.joblib', help="Ruta donde se guarda el modelo")
+parser.add_argument('--hyperparameters', default=HYPERPARAMETERS_PATH,
+                    help="Fichero JSON con los hiperparámetros de los candidatos (ver tune_models)")
+parser.add_argument('--profile-json', default=None,
+                    help="Guardar el tiempo y la memoria de cada etapa en este fichero JSON")
+args = parser.parse_args()
+
+profiler = StageProfiler()
+
 print("Cargando datos...")
+profiler.stage("carga de datos")
 # Cargar datos
-df = pd.read_csv('src/data/hotel_bookings.csv')
+df = load_bookings(args.data)
 
 # Crear características adicionales
 print("Creando características avanzadas...")
-df['total_guests'] = df['adults'] + df['children'] + df['babies']
-df['is_weekend_arrival'] = df['arrival_date_day_of_month'].apply(lambda x: x % 7 in [0, 6])
-df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
-df['avg_guests_per_night'] = df['total_guests'] * df['total_nights']
-df['booking_flexibility'] = np.where(df['deposit_type'] == 'No Deposit', 1, 0)
-df['high_season'] = df['arrival_date_month'].isin(['July', 'August', 'December'])
-df['lead_time_category'] = pd.qcut(df['lead_time'], q=5, labels=['very_short', 'short', 'medium', 'long', 'very_long'])
-df['price_per_night'] = df['adr'] / (df['stays_in_weekend_nights'] + df['stays_in_week_nights'])
-df['total_cost'] = df['adr'] * (df['stays_in_weekend_nights'] + df['stays_in_week_nights'])
-df['repeated_guest_value'] = np.where(df['is_repeated_guest'] == 1, df['previous_cancellations'], 0)
-df['cancellation_risk'] = df['previous_cancellations'] / (df['previous_bookings_not_canceled'] + 1)
-
-# Seleccionar características
-features = [
-    'lead_time', 'arrival_date_year', 'arrival_date_month',
-    'arrival_date_day_of_month', 'stays_in_weekend_nights',
-    'stays_in_week_nights', 'adults', 'children', 'babies',
-    'meal', 'market_segment', 'deposit_type', 'customer_type',
-    'adr', 'required_car_parking_spaces', 'total_of_special_requests',
-    'previous_cancellations', 'previous_bookings_not_canceled',
-    'booking_changes', 'days_in_waiting_list', 'is_repeated_guest',
-    'total_guests', 'is_weekend_arrival', 'total_nights',
-    'avg_guests_per_night', 'booking_flexibility', 'high_season',
-    'lead_time_category', 'price_per_night', 'total_cost',
-    'repeated_guest_value', 'cancellation_risk'
-]
+profiler.stage("características")
+df = build_features(df)
 
 # Preparar datos
-X = df[features]
+X = df[CANCELACION_FEATURES]
 y = df['is_canceled']
+if args.lean:
+    del df
 
 # Separar características
-numeric_features = X.select_dtypes(include=['int64', 'float64']).columns
-categorical_features = X.select_dtypes(include=['object']).columns
-
-# Crear preprocesadores
-numeric_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='median')),
-    ('scaler', StandardScaler())
-])
+numeric_features = CANCELACION_NUMERIC
+categorical_features = CANCELACION_CATEGORICAL
 
-categorical_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='constant', fill_value='missing')),
-    ('onehot', OneHotEncoder(drop='first', sparse=False, handle_unknown='ignore'))
-])
+# Crear preprocesador
+preprocessor = onehot_preprocessor(numeric_features, categorical_features)
 
-# Crear preprocessor
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', numeric_transformer, numeric_features),
-        ('cat', categorical_transformer, categorical_features)
-    ])
+# Hiperparámetros de cada candidato
+hyperparameters = load_hyperparameters('cancelacion', args.hyperparameters)
 
 # Crear pipeline con Random Forest
 print("Creando pipeline...")
 rf_pipeline = Pipeline([
     ('preprocessor', preprocessor),
-    ('classifier', RandomForestClassifier(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        max_features='sqrt',
-        random_state=42,
-        n_jobs=-1
-    ))
+    ('classifier', booking_estimator('cancelacion', "Random Forest", hyperparameters["Random Forest"]))
 ])
 
 # Crear pipeline con Gradient Boosting
 gb_pipeline = Pipeline([
     ('preprocessor', preprocessor),
-    ('classifier', GradientBoostingClassifier(
-        n_estimators=200,
-        learning_rate=0.1,
-        max_depth=8,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        subsample=0.8,
-        max_features='sqrt',
-        random_state=42
-    ))
+    ('classifier', booking_estimator('cancelacion', "Gradient Boosting", hyperparameters["Gradient Boosting"]))
+])
+
+# Crear pipeline con Gradient Boosting por histogramas (multihilo, con las
+# categóricas nativas y parada temprana sobre un 10% de validación)
+hist_preprocessor, hist_categorical = native_categorical_preprocessor(numeric_features, categorical_features)
+hgb_pipeline = Pipeline([
+    ('preprocessor', hist_preprocessor),
+    ('classifier', booking_estimator('cancelacion', "Gradient Boosting (histogramas)",
+                                     hyperparameters["Gradient Boosting (histogramas)"], hist_categorical))
 ])
 
 # Dividir datos
 print("Dividiendo datos...")
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
-# Entrenar y evaluar Random Forest
-print("\nEntrenando Random Forest...")
-rf_pipeline.fit(X_train, y_train)
-rf_pred = rf_pipeline.predict(X_test)
-rf_pred_proba = rf_pipeline.predict_proba(X_test)[:, 1]
-
-print("\nMétricas Random Forest:")
-print(f"Accuracy: {accuracy_score(y_test, rf_pred):.4f}")
-print(f"Precision: {precision_score(y_test, rf_pred):.4f}")
-print(f"Recall: {recall_score(y_test, rf_pred):.4f}")
-print(f"F1-Score: {f1_score(y_test, rf_pred):.4f}")
-print(f"ROC AUC: {roc_auc_score(y_test, rf_pred_proba):.4f}")
-
-# Entrenar y evaluar Gradient Boosting
-print("\nEntrenando Gradient Boosting...")
-gb_pipeline.fit(X_train, y_train)
-gb_pred = gb_pipeline.predict(X_test)
-gb_pred_proba = gb_pipeline.predict_proba(X_test)[:, 1]
-
-print("\nMétricas Gradient Boosting:")
-print(f"Accuracy: {accuracy_score(y_test, gb_pred):.4f}")
-print(f"Precision: {precision_score(y_test, gb_pred):.4f}")
-print(f"Recall: {recall_score(y_test, gb_pred):.4f}")
-print(f"F1-Score: {f1_score(y_test, gb_pred):.4f}")
-print(f"ROC AUC: {roc_auc_score(y_test, gb_pred_proba):.4f}")
-
-# Seleccionar el mejor modelo
-rf_f1 = f1_score(y_test, rf_pred)
-gb_f1 = f1_score(y_test, gb_pred)
-
-best_model = rf_pipeline if rf_f1 > gb_f1 else gb_pipeline
-model_name = "Random Forest" if rf_f1 > gb_f1 else "Gradient Boosting"
+# Candidatos según el motor de Gradient Boosting elegido
+candidates = {"Random Forest": rf_pipeline}
+if args.engine in ('exacto', 'ambos'):
+    candidates["Gradient Boosting"] = gb_pipeline
+if args.engine in ('histograma', 'ambos'):
+    candidates["Gradient Boosting (histogramas)"] = hgb_pipeline
+
+# Ajustar el preprocesador una sola vez y compartir la matriz float32 entre los modelos
+print("Preprocesando datos...")
+profiler.stage("ajuste del preprocesador")
+preprocessor.fit(X_train)
+Xt_train = {}
+Xt_test = {}
+shared_train = transform_float32(preprocessor, X_train)
+shared_test = transform_float32(preprocessor, X_test)
+for name, pipeline in candidates.items():
+    if pipeline is hgb_pipeline:
+        hist_preprocessor.fit(X_train)
+        Xt_train[name] = transform_float32(hist_preprocessor, X_train)
+        Xt_test[name] = transform_float32(hist_preprocessor, X_test)
+    else:
+        Xt_train[name] = shared_train
+        Xt_test[name] = shared_test
+# Muestra para medir la latencia de predicción de cada candidato
+X_sample = X_test.head(1000)
+if args.lean:
+    del X, X_train, X_test
+
+# Entrenar todos los candidatos a la vez, cada uno en su proceso
+print(f"\nEntrenando {', '.join(candidates)}...")
+profiler.stage("entrenamiento de candidatos")
+results = fit_candidates(
+    {name: pipeline.named_steps['classifier'] for name, pipeline in candidates.items()},
+    Xt_train, y_train, Xt_test,
+    n_jobs=1 if args.lean else args.jobs
+)
+
+# Evaluar candidatos
+profiler.stage("evaluación")
+for result in results:
+    # Los candidatos se entrenan en otros procesos: recuperar el clasificador ajustado
+    candidates[result['name']].steps[-1] = ('classifier', result['estimator'])
+    print(f"\nMétricas {result['name']} (entrenado en {result['fit_seconds']:.1f} s):")
+    if hasattr(result['estimator'], 'n_iter_'):
+        print(f"Iteraciones (parada temprana): {result['estimator'].n_iter_}")
+    result['accuracy'] = accuracy_score(y_test, result['pred'])
+    result['f1'] = f1_score(y_test, result['pred'])
+    result['roc_auc'] = roc_auc_score(y_test, result['pred_proba'])
+    print(f"Accuracy: {result['accuracy']:.4f}")
+    print(f"Precision: {precision_score(y_test, result['pred']):.4f}")
+    print(f"Recall: {recall_score(y_test, result['pred']):.4f}")
+    print(f"F1-Score: {result['f1']:.4f}")
+    print(f"ROC AUC: {result['roc_auc']:.4f}")
+    result['row_ms'], result['batch_ms'] = prediction_latency(
+        compile_pipeline(candidates[result['name']], CANCELACION_FEATURES), X_sample, 'predict_proba')
+print_engine_report(results, {'Accuracy': 'accuracy', 'F1': 'f1', 'ROC AUC': 'roc_auc'})
+
+# Seleccionar el mejor modelo (en caso de empate, el último candidato: como
+# siempre, Gradient Boosting antes que Random Forest)
+best = max(reversed(results), key=lambda result: result['f1'])
+best_model = candidates[best['name']]
+model_name = best['name']
 
 print(f"\nGuardando el mejor modelo ({model_name})...")
-joblib.dump(best_model, 'src/models/cancelacion_model.joblib')
+profiler.stage("guardado")
+joblib.dump(best_model, args.output)
+# Artefacto de carga rápida que usan la aplicación y los scripts de predicción
+build_fast_artifact(args.output, CANCELACION_FEATURES)
+profiler.finish()
+if args.profile_json:
+    profiler.save(args.profile_json)
 print("¡Modelo guardado exitosamente!")
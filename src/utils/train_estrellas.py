@@ -0,0 +1,153 @@
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+import joblib
+import argparse
+import os
+import time
+
+from src.utils.artifacts import build_fast_artifact
+from src.utils.image_descriptors import descriptor_transformer, image_descriptors
+from src.utils.images import (
+    IMAGE_DATA_DIR, IMAGE_MODEL_PATH, extract_features_to_disk, iter_labelled_images, preprocess_images
+)
+from src.utils.profiling import StageProfiler
+from src.utils.training import print_engine_report
+
+# Características con las que se puede entrenar: píxeles (30x90 RGB aplanado),
+# descriptores compactos (ver image_descriptors) o ambas para compararlas. Por
+# defecto, píxeles: calcular los descriptores cuesta más que toda la predicción
+# con los píxeles, así que solo compensan si mejoran la precisión
+FEATURE_SETS = ('pixeles', 'descriptores', 'ambos')
+
+parser = argparse.ArgumentParser(description="Entrenamiento del modelo de estrellas por imagen")
+parser.add_argument('--data', default=IMAGE_DATA_DIR,
+                    help="Carpeta de fotos con una subcarpeta por número de estrellas (1, 2, ... 5)")
+parser.add_argument('--output', default=IMAGE_MODEL_PATH, help="Ruta donde se guarda el modelo")
+parser.add_argument('--workdir', default='src/data/.cache/estrellas',
+                    help="Carpeta donde se guardan las matrices de características en disco")
+parser.add_argument('--features', choices=FEATURE_SETS, default='pixeles',
+                    help="Características del modelo: píxeles, descriptores o ambos para compararlos")
+parser.add_argument('--jobs', type=int, default=None,
+                    help="Procesos que extraen las características a la vez (por defecto, uno por núcleo)")
+parser.add_argument('--epochs', type=int, default=10, help="Pasadas completas sobre las fotos de entrenamiento")
+parser.add_argument('--batch-size', type=int, default=1024,
+                    help="Fotos que se leen del disco en cada paso de entrenamiento")
+parser.add_argument('--profile-json', default=None,
+                    help="Guardar el tiempo y la memoria de cada etapa en este fichero JSON")
+args = parser.parse_args()
+
+profiler = StageProfiler()
+
+
+def iter_batches(indices, batch_size):
+    # Lotes de filas ordenadas, para leer la matriz en disco de forma secuencial
+    for start in range(0, len(indices), batch_size):
+        yield np.sort(indices[start:start + batch_size])
+
+
+def fit_out_of_core(X, y, indices, classes, epochs, batch_size):
+    """Escalado y clasificador lineal entrenados por lotes: nunca se carga la matriz entera."""
+    scaler = StandardScaler()
+    for batch in iter_batches(indices, batch_size):
+        scaler.partial_fit(X[batch])
+    # Regresión logística por descenso de gradiente estocástico, con los pesos
+    # promediados entre pasos (más estable que los del último lote)
+    classifier = SGDClassifier(loss='log_loss', alpha=1e-3, average=True, random_state=42)
+    rng = np.random.default_rng(42)
+    for epoch in range(epochs):
+        for batch in iter_batches(rng.permutation(indices), batch_size):
+            classifier.partial_fit(scaler.transform(X[batch]), y[batch], classes=classes)
+    return scaler, classifier
+
+
+print("Buscando fotos...")
+profiler.stage("búsqueda de fotos")
+# Solo se guardan en memoria las rutas y las etiquetas; las imágenes se leen bajo demanda
+paths = []
+labels = []
+for path, stars in iter_labelled_images(args.data):
+    paths.append(path)
+    labels.append(stars)
+y = np.array(labels)
+if len(paths) == 0:
+    raise SystemExit(f"No se han encontrado fotos en {args.data}")
+print(f"{len(paths):,} fotos: " + ", ".join(f"{stars} estrellas: {count:,}"
+                                           for stars, count in zip(*np.unique(y, return_counts=True))))
+
+# Matriz en disco y transformación de los píxeles de cada conjunto de características
+candidates = {}
+if args.features in ('pixeles', 'ambos'):
+    candidates["Píxeles"] = (os.path.join(args.workdir, 'pixeles.npy'), None)
+if args.features in ('descriptores', 'ambos'):
+    candidates["Descriptores"] = (os.path.join(args.workdir, 'descriptores.npy'), image_descriptors)
+
+print("Extrayendo características...")
+profiler.stage("extracción de características")
+# Cada foto se decodifica una sola vez aunque se generen las dos matrices
+matrices, failed = extract_features_to_disk(paths, dict(candidates.values()), n_jobs=args.jobs)
+if failed:
+    print(f"Se omiten {len(failed):,} fotos que no se han podido leer")
+valid = np.ones(len(paths), dtype=bool)
+valid[failed] = False
+
+# Dividir datos (índices de filas de las matrices en disco)
+train_idx, test_idx = train_test_split(np.flatnonzero(valid), test_size=0.2, random_state=42, stratify=y[valid])
+test_idx = np.sort(test_idx)
+classes = np.unique(y[valid])
+
+print(f"\nEntrenando {', '.join(candidates)}...")
+profiler.stage("entrenamiento")
+results = []
+for name, (matrix_path, transform) in candidates.items():
+    X = matrices[matrix_path]
+    start = time.perf_counter()
+    scaler, classifier = fit_out_of_core(X, y, train_idx, classes, args.epochs, args.batch_size)
+    fit_seconds = time.perf_counter() - start
+    # El modelo recibe siempre píxeles, como en la página; el de descriptores los calcula primero
+    steps = [('scaler', scaler), ('classifier', classifier)]
+    if transform is not None:
+        steps.insert(0, ('descriptores', descriptor_transformer()))
+    results.append({'name': name, 'model': Pipeline(steps), 'matrix': X, 'fit_seconds': fit_seconds})
+    print(f"{name}: {X.shape[1]:,} características, entrenado en {fit_seconds:.1f} s")
+
+profiler.stage("evaluación")
+y_test = y[test_idx]
+# Muestra de fotos de prueba (píxeles) para medir la latencia de predicción de extremo a extremo
+X_sample, _ = preprocess_images([paths[i] for i in test_idx[:200]])
+for result in results:
+    # La matriz en disco ya tiene las características: se evalúan el escalado y el clasificador
+    scaler, classifier = result['model'].named_steps['scaler'], result['model'].named_steps['classifier']
+    y_pred = np.concatenate([classifier.predict(scaler.transform(result['matrix'][batch]))
+                             for batch in iter_batches(test_idx, args.batch_size)])
+    result['accuracy'] = accuracy_score(y_test, y_pred)
+    result['f1'] = f1_score(y_test, y_pred, average='macro')
+    timings = []
+    for row in X_sample[:100]:
+        start = time.perf_counter()
+        result['model'].predict_proba(row.reshape(1, -1))
+        timings.append(time.perf_counter() - start)
+    result['row_ms'] = float(np.median(timings)) * 1000
+    start = time.perf_counter()
+    result['model'].predict_proba(X_sample)
+    result['batch_ms'] = (time.perf_counter() - start) / len(X_sample) * 1e6
+    print(f"\nMétricas {result['name']} ({len(test_idx):,} fotos de prueba):")
+    print(f"Accuracy: {result['accuracy']:.4f}")
+    print(f"F1 (macro): {result['f1']:.4f}")
+print_engine_report(results, {'Accuracy': 'accuracy', 'F1 (macro)': 'f1'})
+
+# Seleccionar el mejor modelo (en caso de empate, el primer candidato)
+best = max(results, key=lambda result: result['accuracy'])
+
+print(f"\nGuardando el mejor modelo ({best['name']})...")
+profiler.stage("guardado")
+joblib.dump(best['model'], args.output)
+# Artefacto de carga rápida que usa la aplicación
+build_fast_artifact(args.output)
+profiler.finish()
+if args.profile_json:
+    profiler.save(args.profile_json)
+print("¡Modelo guardado exitosamente!")
@@ -1,115 +1,166 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import StandardScaler
-from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
 import joblib
+import argparse
+import time
+
+from src.utils.artifacts import build_fast_artifact
+from src.utils.data import BOOKINGS_CSV, load_bookings
+from src.utils.fast_inference import compile_pipeline
+from src.utils.features import PRECIO_FEATURES, PRECIO_NUMERIC, PRECIO_CATEGORICAL, build_features
+from src.utils.profiling import StageProfiler
+from src.utils.training import (
+    ENGINES, HYPERPARAMETERS_PATH, PREPROCESSING_CACHE_DIR, booking_estimator, clean_price_target,
+    cross_validate_cached, fit_transform_cached, load_hyperparameters, native_categorical_preprocessor,
+    onehot_preprocessor, prediction_latency, preprocessing_cache, print_engine_report, transform_float32
+)
+
+parser = argparse.ArgumentParser(description="Entrenamiento del modelo de precios")
+parser.add_argument('--lean', action='store_true',
+                    help="Modo ligero: libera los datos originales y valida los pliegues uno tras otro en este proceso")
+parser.add_argument('--jobs', type=int, default=None,
+                    help="Pliegues de validación cruzada entrenados a la vez (por defecto, uno por núcleo)")
+parser.add_argument('--no-cache', action='store_true',
+                    help="No reutilizar los preprocesadores ajustados guardados en disco")
+parser.add_argument('--engine', choices=ENGINES, default='exacto',
+                    help="Motor de Gradient Boosting: exacto (clásico), histograma o ambos para compararlos")
+parser.add_argument('--data', default=BOOKINGS_CSV, help="CSV de reservas de entrenamiento")
+parser.add_argument('--output', default='src/models/adr_gbr.joblib', help="Ruta donde se guarda el modelo")
+parser.add_argument('--hyperparameters', default=HYPERPARAMETERS_PATH,
+                    help="Fichero JSON con los hiperparámetros de los candidatos (ver tune_models)")
+parser.add_argument('--profile-json', default=None,
+                    help="Guardar el tiempo y la memoria de cada etapa en este fichero JSON")
+args = parser.parse_args()
+
+profiler = StageProfiler()
 
 print("Cargando datos...")
+profiler.stage("carga de datos")
 # Cargar y preparar datos
-df = pd.read_csv('src/data/hotel_bookings.csv')
+df = load_bookings(args.data)
 
 # Añadir características derivadas
 print("Creando características adicionales...")
-df['total_guests'] = df['adults'] + df['children'] + df['babies']
-df['is_weekend_arrival'] = df['arrival_date_day_of_month'].apply(lambda x: x % 7 in [0, 6])
-df['total_nights'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
-df['avg_guests_per_night'] = df['total_guests'] * df['total_nights']
-df['booking_flexibility'] = np.where(df['deposit_type'] == 'No Deposit', 1, 0)
-
-# Seleccionar características relevantes
-features = [
-    'lead_time', 'arrival_date_year', 'arrival_date_month',
-    'arrival_date_day_of_month', 'stays_in_weekend_nights',
-    'stays_in_week_nights', 'adults', 'children', 'babies',
-    'meal', 'market_segment', 'deposit_type', 'reserved_room_type',
-    'total_of_special_requests', 'total_guests', 'is_weekend_arrival',
-    'total_nights', 'avg_guests_per_night', 'booking_flexibility'
-]
-
-X = df[features]
+profiler.stage("características")
+df = build_features(df)
+
+X = df[PRECIO_FEATURES]
 y = df['adr']
+if args.lean:
+    del df
 
 print("Limpiando datos...")
 # Limpiar datos y manejar valores atípicos
-y = y.replace([np.inf, -np.inf], np.nan)
-y_mean = y.mean()
-y_std = y.std()
-y = np.clip(y, y_mean - 3*y_std, y_mean + 3*y_std)  # Eliminar valores atípicos
-y = y.fillna(y_mean)
+y = clean_price_target(y)
 
 # Separar características numéricas y categóricas
-numeric_features = [
-    'lead_time', 'arrival_date_year', 'arrival_date_day_of_month',
-    'stays_in_weekend_nights', 'stays_in_week_nights', 'adults',
-    'children', 'babies', 'total_of_special_requests', 'total_guests',
-    'total_nights', 'avg_guests_per_night', 'booking_flexibility'
-]
-
-categorical_features = [
-    'meal', 'market_segment', 'deposit_type',
-    'reserved_room_type', 'arrival_date_month'
-]
-
-# Crear preprocesadores con manejo robusto de valores atípicos
-numeric_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='median')),  # Usar mediana en lugar de media
-    ('scaler', StandardScaler())
-])
+numeric_features = PRECIO_NUMERIC
+categorical_features = PRECIO_CATEGORICAL
 
-categorical_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='constant', fill_value='missing')),
-    ('onehot', OneHotEncoder(drop='first', sparse=False, handle_unknown='ignore'))
-])
+# Crear preprocesador (mediana para las numéricas, más robusta ante valores atípicos)
+preprocessor = onehot_preprocessor(numeric_features, categorical_features)
 
-# Crear preprocessor
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', numeric_transformer, numeric_features),
-        ('cat', categorical_transformer, categorical_features)
-    ])
+# Hiperparámetros de cada candidato
+hyperparameters = load_hyperparameters('precio', args.hyperparameters)
 
 # Crear pipeline completo con hiperparámetros optimizados
 print("Creando pipeline...")
 model = Pipeline([
     ('preprocessor', preprocessor),
-    ('regressor', GradientBoostingRegressor(
-        n_estimators=500,  # Más árboles
-        learning_rate=0.05,  # Tasa de aprendizaje más baja
-        max_depth=6,  # Profundidad mayor
-        min_samples_split=5,
-        min_samples_leaf=3,
-        subsample=0.8,  # Usar 80% de las muestras en cada árbol
-        max_features='sqrt',  # Usar sqrt(n_features) características en cada split
-        random_state=42
-    ))
+    ('regressor', booking_estimator('precio', "Gradient Boosting", hyperparameters["Gradient Boosting"]))
 ])
 
+# Alternativa con Gradient Boosting por histogramas (multihilo, con las
+# categóricas nativas y parada temprana sobre un 10% de validación)
+hist_preprocessor, hist_categorical = native_categorical_preprocessor(numeric_features, categorical_features)
+hist_model = Pipeline([
+    ('preprocessor', hist_preprocessor),
+    ('regressor', booking_estimator('precio', "Gradient Boosting (histogramas)",
+                                    hyperparameters["Gradient Boosting (histogramas)"], hist_categorical))
+])
+
+# Modelos a entrenar según el motor elegido
+candidates = {}
+if args.engine in ('exacto', 'ambos'):
+    candidates["Gradient Boosting"] = model
+if args.engine in ('histograma', 'ambos'):
+    candidates["Gradient Boosting (histogramas)"] = hist_model
+# Preprocesadores sin ajustar (los pliegues de la validación cruzada ajustan el suyo)
+preprocessors = {name: pipeline.named_steps['preprocessor'] for name, pipeline in candidates.items()}
+
 print("Dividiendo datos en entrenamiento y prueba...")
 # Dividir datos
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
+memory = preprocessing_cache(None if args.no_cache else PREPROCESSING_CACHE_DIR)
+
+# Ajustar cada preprocesador una sola vez (o recuperarlo de la caché); el
+# ajuste y la evaluación comparten la misma matriz float32
+print("Preprocesando datos...")
+profiler.stage("ajuste del preprocesador")
+Xt_train = {}
+Xt_test = {}
+for name, pipeline in candidates.items():
+    fitted_preprocessor, Xt_train[name], _ = fit_transform_cached(preprocessors[name], X_train, memory=memory)
+    Xt_test[name] = transform_float32(fitted_preprocessor, X_test)
+    pipeline.steps[0] = ('preprocessor', fitted_preprocessor)
+
 # Entrenar modelo
 print("Entrenando modelo...")
-model.fit(X_train, y_train)
+profiler.stage("entrenamiento")
+results = []
+for name, pipeline in candidates.items():
+    start = time.perf_counter()
+    pipeline.named_steps['regressor'].fit(Xt_train[name], y_train)
+    results.append({'name': name, 'fit_seconds': time.perf_counter() - start})
 
-# Evaluar modelo con validación cruzada
+# Evaluar en conjunto de prueba
+profiler.stage("evaluación")
+for result in results:
+    name = result['name']
+    estimator = candidates[name].named_steps['regressor']
+    print(f"\nMétricas {name} (entrenado en {result['fit_seconds']:.1f} s):")
+    if hasattr(estimator, 'n_iter_'):
+        print(f"Iteraciones (parada temprana): {estimator.n_iter_}")
+    result['train_r2'] = estimator.score(Xt_train[name], y_train)
+    result['test_r2'] = estimator.score(Xt_test[name], y_test)
+    print(f"R² en entrenamiento: {result['train_r2']:.4f}")
+    print(f"R² en prueba: {result['test_r2']:.4f}")
+    result['row_ms'], result['batch_ms'] = prediction_latency(
+        compile_pipeline(candidates[name], PRECIO_FEATURES), X_test.head(1000))
+print_engine_report(results, {'R² entrenamiento': 'train_r2', 'R² prueba': 'test_r2'})
+
+# Quedarse con el modelo con mejor R² en prueba (en caso de empate, el primero)
+best = max(results, key=lambda result: result['test_r2'])
+model = candidates[best['name']]
+estimator = model.named_steps['regressor']
+if len(results) > 1:
+    print(f"\nModelo elegido: {best['name']}")
+
+# Evaluar modelo con validación cruzada: cada pliegue ajusta su propio
+# preprocesador (en caché) y los pliegues se entrenan en paralelo
 print("Evaluando modelo con validación cruzada...")
-cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
+profiler.stage("validación cruzada")
+if args.lean:
+    del X, X_test
+folds = cross_validate_cached(preprocessors[best['name']], estimator, X_train, y_train, cv=5,
+                              n_jobs=1 if args.lean else args.jobs, memory=memory)
+for fold in folds:
+    print(f"  Pliegue {fold['fold'] + 1}: R² {fold['score']:.4f} "
+          f"(preprocesado {fold['preprocess_seconds']:.2f} s, entrenamiento {fold['fit_seconds']:.1f} s, "
+          f"evaluación {fold['score_seconds']:.2f} s)")
+cv_scores = np.array([fold['score'] for fold in folds])
 print(f"Puntuaciones de validación cruzada: {cv_scores}")
 print(f"Media de validación cruzada R²: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
 
-# Evaluar en conjunto de prueba
-train_score = model.score(X_train, y_train)
-test_score = model.score(X_test, y_test)
-print(f"R² en entrenamiento: {train_score:.4f}")
-print(f"R² en prueba: {test_score:.4f}")
-
 # Guardar modelo
 print("Guardando modelo...")
-joblib.dump(model, 'src/models/adr_gbr.joblib')
+profiler.stage("guardado")
+joblib.dump(model, args.output)
+# Artefacto de carga rápida que usan la aplicación y los scripts de predicción
+build_fast_artifact(args.output, PRECIO_FEATURES)
+profiler.finish()
+if args.profile_json:
+    profiler.save(args.profile_json)
 print("¡Modelo guardado exitosamente!")
\ No newline at end of file
@@ -0,0 +1,282 @@
+import json
+import os
+import time
+
+import numpy as np
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import (
+    GradientBoostingClassifier, GradientBoostingRegressor, HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor, RandomForestClassifier
+)
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+# Filas por bloque al transformar el conjunto de entrenamiento en modo ligero
+TRANSFORM_CHUNKSIZE = 20000
+
+# Carpeta donde se guardan los preprocesadores ajustados (por conjunto de filas)
+PREPROCESSING_CACHE_DIR = 'src/data/.cache/preprocesado'
+
+# Motores de gradient boosting: el clásico de scikit-learn (divisiones exactas,
+# un solo hilo) o el basado en histogramas (multihilo, categóricas nativas)
+ENGINES = ('exacto', 'histograma', 'ambos')
+
+# Hiperparámetros de cada candidato de los modelos de reservas; los leen los
+# scripts de entrenamiento y los actualiza `tune_models`
+HYPERPARAMETERS_PATH = 'src/utils/hiperparametros.json'
+
+# Clase y parámetros fijos (no se ajustan) de cada candidato
+ESTIMATORS = {
+    'cancelacion': {
+        "Random Forest": (RandomForestClassifier, {'random_state': 42, 'n_jobs': -1}),
+        "Gradient Boosting": (GradientBoostingClassifier, {'random_state': 42}),
+        "Gradient Boosting (histogramas)": (HistGradientBoostingClassifier, {
+            'early_stopping': True, 'validation_fraction': 0.1, 'n_iter_no_change': 20, 'random_state': 42}),
+    },
+    'precio': {
+        "Gradient Boosting": (GradientBoostingRegressor, {'random_state': 42}),
+        "Gradient Boosting (histogramas)": (HistGradientBoostingRegressor, {
+            'early_stopping': True, 'validation_fraction': 0.1, 'n_iter_no_change': 20, 'random_state': 42}),
+    },
+}
+
+
+def transform_float32(preprocessor, X, chunksize=TRANSFORM_CHUNKSIZE):
+    """Aplica un preprocesador ya ajustado por bloques y devuelve una matriz float32.
+
+    Los árboles de scikit-learn trabajan en float32, así que la matriz se
+    puede pasar a varios estimadores sin que ninguno haga su propia copia, y
+    nunca existe una copia completa en float64.
+    """
+    out = None
+    for start in range(0, len(X), chunksize):
+        block = preprocessor.transform(X.iloc[start:start + chunksize])
+        if hasattr(block, 'toarray'):
+            block = block.toarray()
+        if out is None:
+            out = np.empty((len(X), block.shape[1]), dtype=np.float32)
+        out[start:start + len(block)] = block
+    return out
+
+
+def clean_price_target(y):
+    """Limpia el ADR objetivo: infinitos a NaN, recorte a media ± 3 desviaciones
+    (valores atípicos) y NaN a la media."""
+    y = y.replace([np.inf, -np.inf], np.nan)
+    y_mean = y.mean()
+    y_std = y.std()
+    y = np.clip(y, y_mean - 3*y_std, y_mean + 3*y_std)
+    return y.fillna(y_mean)
+
+
+def load_hyperparameters(model, path=HYPERPARAMETERS_PATH):
+    """Dict candidato -> hiperparámetros del modelo `model` ('cancelacion' o 'precio')."""
+    with open(path) as f:
+        return json.load(f)[model]
+
+
+def save_hyperparameters(model, name, params, path=HYPERPARAMETERS_PATH):
+    """Sustituye los hiperparámetros del candidato `name` sin tocar el resto del fichero."""
+    with open(path) as f:
+        config = json.load(f)
+    config[model][name] = params
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def booking_estimator(model, name, params, categorical_features=None):
+    """Estimador sin entrenar del candidato `name` con los hiperparámetros `params`.
+
+    Los parámetros fijos (semilla, parada temprana...) salen de `ESTIMATORS`;
+    `categorical_features` son las columnas categóricas nativas del motor de
+    histogramas (ver `native_categorical_preprocessor`).
+    """
+    cls, fixed = ESTIMATORS[model][name]
+    if categorical_features is not None:
+        fixed = {**fixed, 'categorical_features': categorical_features}
+    return cls(**params, **fixed)
+
+
+def onehot_preprocessor(numeric_features, categorical_features):
+    """Preprocesador de los motores clásicos: numéricas imputadas con la mediana
+    y escaladas, categóricas en one-hot (las desconocidas, todo ceros)."""
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler())
+    ])
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='constant', fill_value='missing')),
+        ('onehot', OneHotEncoder(drop='first', sparse=False, handle_unknown='ignore'))
+    ])
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, numeric_features),
+            ('cat', categorical_transformer, categorical_features)
+        ])
+
+
+def native_categorical_preprocessor(numeric_features, categorical_features):
+    """Preprocesador para el motor de histogramas.
+
+    Las numéricas pasan sin cambios (el motor trata los NaN por sí mismo) y
+    cada categórica se convierte en un único código entero, en lugar de en
+    varias columnas one-hot; las categorías vacías o desconocidas quedan como
+    NaN. Devuelve el preprocesador y las posiciones de las columnas
+    categóricas en su salida (para `categorical_features`).
+    """
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', 'passthrough', numeric_features),
+            ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan), categorical_features)
+        ])
+    start = len(numeric_features)
+    return preprocessor, list(range(start, start + len(categorical_features)))
+
+
+def prediction_latency(model, rows, method='predict', repeat=200):
+    """Latencia de predicción de un modelo compilado (`compile_pipeline`).
+
+    Devuelve la mediana en milisegundos de una predicción de una sola fila
+    (dicts de escalares, como en la aplicación) y el tiempo por cada 1000
+    filas al predecir `rows` (un DataFrame) en un único lote.
+    """
+    predict = getattr(model, method)
+    records = rows.head(repeat).to_dict('records')
+    timings = []
+    for record in records:
+        start = time.perf_counter()
+        predict(record)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    predict(rows)
+    batch_seconds = time.perf_counter() - start
+    return float(np.median(timings)) * 1000, batch_seconds / len(rows) * 1e6
+
+
+def print_engine_report(results, metrics):
+    """Imprime la comparación entre candidatos o motores.
+
+    `results` es una lista de dicts con 'name', las claves de `metrics`
+    (nombre de columna -> clave), 'fit_seconds', 'row_ms' y 'batch_ms'.
+    """
+    columns = [(label, key, '.4f') for label, key in metrics.items()] + [
+        ('Ajuste (s)', 'fit_seconds', '.1f'),
+        ('1 fila (ms)', 'row_ms', '.2f'),
+        ('1000 filas (ms)', 'batch_ms', '.1f'),
+    ]
+    width = max(len(result['name']) for result in results) + 2
+    print("\nComparativa de motores:")
+    print(f"  {'Modelo':<{width}}" + ''.join(f"{label:>16}" for label, _, _ in columns))
+    for result in results:
+        print(f"  {result['name']:<{width}}" + ''.join(f"{result[key]:>16{fmt}}" for _, key, fmt in columns))
+
+
+def _fit_candidate(name, estimator, X_train, y_train, X_test):
+    start = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    return {
+        'name': name,
+        'estimator': estimator,
+        'fit_seconds': fit_seconds,
+        'pred': estimator.predict(X_test),
+        'pred_proba': estimator.predict_proba(X_test)[:, 1],
+    }
+
+
+def fit_candidates(estimators, X_train, y_train, X_test, n_jobs=None):
+    """Entrena varios clasificadores sobre la misma matriz ya preprocesada.
+
+    Con `n_jobs` > 1 cada candidato se entrena en un proceso distinto; joblib
+    comparte las matrices grandes con los procesos mediante memmap en lugar de
+    copiarlas. `X_train` y `X_test` pueden ser también dicts nombre -> matriz
+    cuando algún candidato usa un preprocesado propio. Devuelve una lista de
+    resultados en el mismo orden que `estimators` (un dict nombre ->
+    estimador sin entrenar).
+    """
+    def data_for(X, name):
+        return X[name] if isinstance(X, dict) else X
+
+    n_jobs = min(len(estimators), n_jobs or os.cpu_count() or 1)
+    tasks = [delayed(_fit_candidate)(name, estimator, data_for(X_train, name), y_train, data_for(X_test, name))
+             for name, estimator in estimators.items()]
+    if n_jobs == 1:
+        return [task[0](*task[1], **task[2]) for task in tasks]
+    return Parallel(n_jobs=n_jobs)(tasks)
+
+
+def _fit_transform(preprocessor, X, train_idx, test_idx):
+    preprocessor = clone(preprocessor)
+    X_train = X.iloc[train_idx] if train_idx is not None else X
+    preprocessor.fit(X_train)
+    Xt_train = transform_float32(preprocessor, X_train)
+    Xt_test = transform_float32(preprocessor, X.iloc[test_idx]) if test_idx is not None else None
+    return preprocessor, Xt_train, Xt_test
+
+
+def preprocessing_cache(location=PREPROCESSING_CACHE_DIR):
+    """Caché en disco de `fit_transform_cached` (None la desactiva)."""
+    return Memory(location, mmap_mode='r', verbose=0)
+
+
+def fit_transform_cached(preprocessor, X, train_idx=None, test_idx=None, memory=None):
+    """Ajusta un clon de `preprocessor` sobre las filas `train_idx` de `X`.
+
+    Devuelve el preprocesador ajustado y las matrices float32 de las filas de
+    entrenamiento y de `test_idx`. El resultado se guarda en `memory` (ver
+    `preprocessing_cache`) con clave en los datos, las filas y la configuración
+    del preprocesador, así que repetir un entrenamiento con los mismos datos no
+    vuelve a ajustar nada; las matrices se leen con memmap.
+    """
+    if memory is None:
+        return _fit_transform(preprocessor, X, train_idx, test_idx)
+    return memory.cache(_fit_transform)(preprocessor, X, train_idx, test_idx)
+
+
+def _fit_fold(fold, estimator, Xt_train, y_train, Xt_test, y_test):
+    start = time.perf_counter()
+    estimator.fit(Xt_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    score = r2_score(y_test, estimator.predict(Xt_test))
+    return {
+        'fold': fold,
+        'score': score,
+        'fit_seconds': fit_seconds,
+        'score_seconds': time.perf_counter() - start,
+    }
+
+
+def cross_validate_cached(preprocessor, estimator, X, y, cv=5, n_jobs=None, memory=None):
+    """Validación cruzada R² con los pliegues en paralelo y el preprocesado en caché.
+
+    Usa los mismos pliegues que `cross_val_score(..., cv=cv)` para un
+    regresor. En cada pliegue el preprocesador se ajusta solo con sus filas de
+    entrenamiento (con `fit_transform_cached`, sin fugas desde el pliegue de
+    validación) y el estimador se entrena sobre la matriz float32 resultante.
+    Con `n_jobs` > 1 los pliegues se entrenan en procesos distintos. Devuelve
+    una lista de dicts por pliegue con la puntuación y los tiempos.
+    """
+    y = np.asarray(y)
+    prepared = []
+    for fold, (train_idx, test_idx) in enumerate(KFold(n_splits=cv).split(X)):
+        start = time.perf_counter()
+        _, Xt_train, Xt_test = fit_transform_cached(preprocessor, X, train_idx, test_idx, memory)
+        prepared.append((fold, Xt_train, Xt_test, train_idx, test_idx, time.perf_counter() - start))
+
+    tasks = [delayed(_fit_fold)(fold, clone(estimator), Xt_train, y[train_idx], Xt_test, y[test_idx])
+             for fold, Xt_train, Xt_test, train_idx, test_idx, _ in prepared]
+    n_jobs = min(cv, n_jobs or os.cpu_count() or 1)
+    if n_jobs == 1:
+        results = [task[0](*task[1], **task[2]) for task in tasks]
+    else:
+        results = Parallel(n_jobs=n_jobs)(tasks)
+    for result, (*_, preprocess_seconds) in zip(results, prepared):
+        result['preprocess_seconds'] = preprocess_seconds
+    return results
@@ -0,0 +1,215 @@
+import argparse
+import time
+
+import joblib
+import numpy as np
+from sklearn.dummy import DummyClassifier, DummyRegressor
+from sklearn.ensemble import (
+    GradientBoostingClassifier, GradientBoostingRegressor,
+    RandomForestClassifier, RandomForestRegressor
+)
+
+# Filas x árboles que se recorren a la vez (acota la memoria de los índices)
+_BLOCK_SIZE = 1 << 18
+
+# Filas a partir de las que el recorrido en Cython de scikit-learn es más
+# rápido que el evaluador aplanado. El bosque paga mucho coste fijo por árbol
+# en scikit-learn; el boosting lo recorre todo en Cython y se alcanza antes.
+MAX_FLAT_ROWS = {'mean': 128, 'sum': 16}
+
+
+class FlatEnsemble:
+    """Conjunto de árboles empaquetado en arrays contiguos de NumPy.
+
+    Todos los nodos de todos los árboles se concatenan en los arrays
+    `feature`, `threshold`, `left`, `right` y `value`; las hojas apuntan a sí
+    mismas. La evaluación avanza cada fila por todos los árboles a la vez, un
+    nivel de profundidad en cada paso, en lugar de recorrer los árboles de
+    uno en uno.
+
+    - kind='mean' (random forest): media de las hojas (probabilidades por clase).
+    - kind='sum' (gradient boosting): offset + learning_rate * suma de las hojas.
+
+    Compensa para filas sueltas y lotes pequeños (`max_rows`); para lotes
+    grandes conviene seguir usando el estimador original.
+    """
+
+    def __init__(self, estimator):
+        self.n_features_in_ = estimator.n_features_in_
+        self.classes_ = getattr(estimator, 'classes_', None)
+
+        if isinstance(estimator, (RandomForestClassifier, RandomForestRegressor)):
+            if isinstance(estimator, RandomForestClassifier) and estimator.n_outputs_ != 1:
+                raise ValueError("Solo se admiten bosques de una salida")
+            self.kind = 'mean'
+            trees = [e.tree_ for e in estimator.estimators_]
+        elif isinstance(estimator, (GradientBoostingClassifier, GradientBoostingRegressor)):
+            if estimator.estimators_.shape[1] != 1:
+                raise ValueError("Solo se admite gradient boosting binario o de regresión")
+            if estimator.init_ != 'zero' and not isinstance(estimator.init_, (DummyClassifier, DummyRegressor)):
+                raise ValueError("Estimador inicial no soportado")
+            self.kind = 'sum'
+            trees = [e.tree_ for e in estimator.estimators_[:, 0]]
+            self.learning_rate = estimator.learning_rate
+            # Solo se guarda la función de pérdida (no el estimador), así que el
+            # conjunto aplanado se puede guardar y cargar sin los árboles originales
+            self.loss = estimator._loss if self.classes_ is not None else None
+            # El estimador inicial por defecto predice una constante
+            self.offset = float(estimator._raw_predict_init(
+                np.zeros((1, self.n_features_in_), dtype=np.float32))[0, 0])
+        else:
+            raise ValueError(f"Estimador no soportado: {type(estimator).__name__}")
+
+        self.max_rows = MAX_FLAT_ROWS[self.kind]
+        self._pack(trees)
+
+    def _pack(self, trees):
+        sizes = np.array([t.node_count for t in trees])
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        n_nodes = int(sizes.sum())
+
+        self.roots = starts.astype(np.int32)
+        self.feature = np.zeros(n_nodes, dtype=np.int32)
+        self.threshold = np.zeros(n_nodes, dtype=np.float32)
+        self.left = np.empty(n_nodes, dtype=np.int32)
+        self.right = np.empty(n_nodes, dtype=np.int32)
+        values = []
+        self.max_depth = 0
+
+        for tree, start in zip(trees, starts):
+            stop = start + tree.node_count
+            nodes = np.arange(start, stop)
+            leaf = tree.children_left == -1
+            self.feature[start:stop] = np.where(leaf, 0, tree.feature)
+            # Mayor float32 <= umbral: comparar en float32 da el mismo resultado
+            # que la comparación float32 <= float64 de scikit-learn
+            threshold = tree.threshold.astype(np.float32)
+            too_big = threshold.astype(np.float64) > tree.threshold
+            threshold[too_big] = np.nextafter(threshold[too_big], np.float32(-np.inf))
+            # Las hojas tienen umbral NaN: `x <= NaN` es siempre falso, así que
+            # una fila que ya ha llegado a una hoja va a `right`, que es la
+            # propia hoja (también cuando el hijo izquierdo se calcula como node + 1)
+            threshold[leaf] = np.nan
+            self.threshold[start:stop] = threshold
+            self.left[start:stop] = np.where(leaf, nodes, tree.children_left + start)
+            self.right[start:stop] = np.where(leaf, nodes, tree.children_right + start)
+            self.max_depth = max(self.max_depth, tree.max_depth)
+
+            value = tree.value[:, 0, :]
+            if self.kind == 'mean' and self.classes_ is not None:
+                # Igual que DecisionTreeClassifier.predict_proba
+                normalizer = value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+
+        internal = self.left != np.arange(n_nodes)
+        if np.array_equal(self.left[internal], np.nonzero(internal)[0] + 1):
+            self.left = None
+
+        self.value = np.ascontiguousarray(np.concatenate(values))
+        if self.kind == 'sum':
+            self.value = self.value[:, 0]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Índice de la hoja alcanzada en cada árbol, con forma (filas, árboles)."""
+        # Los árboles de scikit-learn comparan en float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        leaves = np.empty((n_rows, self.n_trees), dtype=np.int32)
+        step = max(1, _BLOCK_SIZE // self.n_trees)
+        for start in range(0, n_rows, step):
+            block = X[start:start + step]
+            flat = block.ravel()
+            row_offset = (np.arange(block.shape[0], dtype=np.int32) * block.shape[1])[:, None]
+            node = np.broadcast_to(self.roots, (block.shape[0], self.n_trees)).copy()
+            for _ in range(self.max_depth):
+                go_left = flat[row_offset + self.feature[node]] <= self.threshold[node]
+                # En los árboles construidos en profundidad el hijo izquierdo es el nodo siguiente
+                left = node + 1 if self.left is None else self.left[node]
+                node = np.where(go_left, left, self.right[node])
+            leaves[start:start + step] = node
+        return leaves
+
+    def raw_predict(self, X):
+        leaves = self.apply(X)
+        if self.kind == 'mean':
+            return self.value[leaves].mean(axis=1)
+        return self.offset + self.learning_rate * self.value[leaves].sum(axis=1)
+
+    def predict_proba(self, X):
+        if self.kind == 'mean':
+            return self.raw_predict(X)
+        raw = self.raw_predict(X)[:, np.newaxis]
+        return self.loss._raw_prediction_to_proba(raw)
+
+    def predict(self, X):
+        if self.classes_ is None:
+            raw = self.raw_predict(X)
+            return raw[:, 0] if raw.ndim == 2 else raw
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def flatten_estimator(estimator):
+    """Devuelve un `FlatEnsemble` si el estimador está soportado, o None."""
+    try:
+        return FlatEnsemble(estimator)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _time(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark(estimator, X, repeat=20):
+    """Compara el evaluador aplanado con scikit-learn sobre la matriz `X`."""
+    flat = FlatEnsemble(estimator)
+    method = 'predict_proba' if flat.classes_ is not None else 'predict'
+    expected = getattr(estimator, method)(X)
+    got = getattr(flat, method)(X)
+    row = X[:1]
+    small = X[:flat.max_rows]
+    return {
+        'trees': flat.n_trees,
+        'max_depth': flat.max_depth,
+        'max_abs_diff': float(np.abs(expected - got).max()),
+        'sklearn_single_ms': _time(lambda: getattr(estimator, method)(row), repeat) * 1000,
+        'flat_single_ms': _time(lambda: getattr(flat, method)(row), repeat) * 1000,
+        'small_batch_rows': small.shape[0],
+        'sklearn_small_batch_ms': _time(lambda: getattr(estimator, method)(small), repeat) * 1000,
+        'flat_small_batch_ms': _time(lambda: getattr(flat, method)(small), repeat) * 1000,
+        'sklearn_batch_ms': _time(lambda: getattr(estimator, method)(X), max(1, repeat // 10)) * 1000,
+        'flat_batch_ms': _time(lambda: getattr(flat, method)(X), max(1, repeat // 10)) * 1000,
+        'batch_rows': X.shape[0],
+    }
+
+
+def main():
+    from src.utils.data import load_bookings
+    from src.utils.features import CANCELACION_FEATURES, PRECIO_FEATURES, build_features
+
+    parser = argparse.ArgumentParser(description="Comparativa del evaluador de árboles aplanado con scikit-learn")
+    parser.add_argument('--rows', type=int, default=10000, help="Reservas del lote de prueba")
+    args = parser.parse_args()
+
+    df = build_features(load_bookings().head(args.rows))
+    for path, features in [('src/models/cancelacion_model.joblib', CANCELACION_FEATURES),
+                           ('src/models/adr_gbr.joblib', PRECIO_FEATURES)]:
+        pipeline = joblib.load(path)
+        X = pipeline[:-1].transform(df[features])
+        print(f"\n{path}")
+        for name, value in benchmark(pipeline.steps[-1][1], X).items():
+            print(f"  {name}: {value:.4g}" if isinstance(value, float) else f"  {name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
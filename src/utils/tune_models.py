@@ -0,0 +1,291 @@
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import f1_score, r2_score
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+
+from src.utils.data import BOOKINGS_CSV, load_bookings
+from src.utils.features import (
+    CANCELACION_CATEGORICAL, CANCELACION_FEATURES, CANCELACION_NUMERIC, PRECIO_CATEGORICAL, PRECIO_FEATURES,
+    PRECIO_NUMERIC, build_features
+)
+from src.utils.training import (
+    HYPERPARAMETERS_PATH, PREPROCESSING_CACHE_DIR, booking_estimator, clean_price_target, fit_transform_cached,
+    load_hyperparameters, native_categorical_preprocessor, onehot_preprocessor, preprocessing_cache,
+    save_hyperparameters
+)
+
+# Datos de cada modelo: características, objetivo y métrica con la que los
+# scripts de entrenamiento eligen el mejor candidato
+MODELS = {
+    'cancelacion': {
+        'features': CANCELACION_FEATURES,
+        'numeric': CANCELACION_NUMERIC,
+        'categorical': CANCELACION_CATEGORICAL,
+        'target': 'is_canceled',
+        'metric': 'F1',
+    },
+    'precio': {
+        'features': PRECIO_FEATURES,
+        'numeric': PRECIO_NUMERIC,
+        'categorical': PRECIO_CATEGORICAL,
+        'target': 'adr',
+        'metric': 'R²',
+    },
+}
+
+# Valores que se prueban de cada hiperparámetro
+_FOREST_SPACE = {
+    'n_estimators': [100, 200, 400],
+    'max_depth': [10, 15, 20, 30, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2', 0.3],
+}
+_BOOSTING_SPACE = {
+    'n_estimators': [100, 200, 500],
+    'learning_rate': [0.02, 0.05, 0.1, 0.2],
+    'max_depth': [3, 4, 6, 8],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 3, 5],
+    'subsample': [0.6, 0.8, 1.0],
+    'max_features': ['sqrt', 0.5, None],
+}
+_HIST_SPACE = {
+    'max_iter': [200, 500, 1000],
+    'learning_rate': [0.02, 0.05, 0.1, 0.2],
+    'max_leaf_nodes': [15, 31, 63, 127],
+    'min_samples_leaf': [5, 10, 20, 50],
+    'l2_regularization': [0.0, 0.1, 1.0],
+}
+SEARCH_SPACES = {
+    'cancelacion': {
+        "Random Forest": _FOREST_SPACE,
+        "Gradient Boosting": _BOOSTING_SPACE,
+        "Gradient Boosting (histogramas)": _HIST_SPACE,
+    },
+    'precio': {
+        "Gradient Boosting": _BOOSTING_SPACE,
+        "Gradient Boosting (histogramas)": _HIST_SPACE,
+    },
+}
+
+# Recursos que se reparten en las rondas: filas de entrenamiento o árboles
+# (etapas de boosting) de cada configuración
+RESOURCES = ('filas', 'arboles')
+TREE_PARAMS = ('n_estimators', 'max_iter')
+
+DEFAULT_CONFIGS = 27
+DEFAULT_ETA = 3
+DEFAULT_MIN_ROWS = 1000
+DEFAULT_MIN_TREES = 10
+DEFAULT_BUDGET_MINUTES = 30
+
+
+def _score(model, y_true, y_pred):
+    if model == 'cancelacion':
+        return f1_score(y_true, y_pred)
+    return r2_score(y_true, y_pred)
+
+
+def _evaluate(model, estimator, X, y, train_idx, test_idx):
+    # Un pliegue de una configuración; X puede ser un memmap de la caché
+    estimator.fit(X[train_idx], y[train_idx])
+    return _score(model, y[test_idx], estimator.predict(X[test_idx]))
+
+
+def schedule(n_configs, max_resource, min_resource, eta=DEFAULT_ETA):
+    """Rondas del successive halving: lista de (configuraciones, fracción del recurso).
+
+    En cada ronda sobrevive 1/`eta` de las configuraciones y cada una recibe
+    `eta` veces más recurso; la última usa el recurso completo. Hay tantas
+    rondas como permitan el número de configuraciones y el recurso mínimo.
+    """
+    n_rounds = 1 + min(int(math.log(max(n_configs, 1), eta)),
+                       int(math.log(max(max_resource / min_resource, 1), eta)))
+    rounds = []
+    for i in range(n_rounds):
+        rounds.append((n_configs, eta ** (i - n_rounds + 1)))
+        n_configs = max(1, math.ceil(n_configs / eta))
+    return rounds
+
+
+def successive_halving(model, name, configs, X, y, resource='filas', eta=DEFAULT_ETA,
+                       min_rows=DEFAULT_MIN_ROWS, min_trees=DEFAULT_MIN_TREES, cv=3,
+                       deadline=None, reference=None, categorical_features=None, n_jobs=None,
+                       random_state=42):
+    """Busca la mejor de `configs` (lista de dicts de hiperparámetros) para el candidato `name`.
+
+    Todas las configuraciones empiezan con poco recurso (una muestra de las
+    filas o pocos árboles) y en cada ronda solo sigue la mejor 1/`eta`, con
+    `eta` veces más recurso; la validación cruzada de la última ronda usa todas
+    las filas y árboles. Los pliegues de todas las configuraciones de una ronda
+    se entrenan a la vez en `n_jobs` procesos sobre la misma matriz.
+
+    La configuración `reference` (la actual) se evalúa siempre en la última
+    ronda aunque haya quedado eliminada antes, para comparar con ella. Antes
+    de cada ronda se estima su duración a partir de la anterior; si no cabe
+    antes de `deadline` (segundos de `time.time()`) la búsqueda se para.
+    Devuelve la lista de rondas ejecutadas, cada una con sus configuraciones
+    ordenadas de mejor a peor.
+    """
+    y = np.asarray(y)
+    n_rows = len(y)
+    # Orden fijo de las filas: las muestras de cada ronda contienen a las anteriores
+    order = np.random.RandomState(random_state).permutation(n_rows)
+    if resource == 'filas':
+        rounds = schedule(len(configs), n_rows, min_rows, eta)
+    else:
+        max_trees = min(params[key] for params in configs for key in TREE_PARAMS if key in params)
+        rounds = schedule(len(configs), max_trees, min_trees, eta)
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    splitter = StratifiedKFold if model == 'cancelacion' else KFold
+    history = []
+    survivors = list(configs)
+    for i, (n_configs, fraction) in enumerate(rounds):
+        survivors = survivors[:n_configs]
+        if i == len(rounds) - 1 and reference is not None and reference not in survivors:
+            survivors.append(reference)
+        if history and deadline is not None:
+            # Coste estimado: el de la ronda anterior escalado por configuraciones y recurso
+            previous = history[-1]
+            estimate = previous['seconds'] * len(survivors) / len(previous['results']) * eta
+            if time.time() + estimate > deadline:
+                print(f"  Presupuesto agotado: la ronda {i + 1} tardaría unos {estimate:.0f} s")
+                break
+
+        rows = order[:max(min_rows, int(n_rows * fraction))] if resource == 'filas' else order
+        folds = list(splitter(n_splits=cv, shuffle=True, random_state=random_state).split(rows, y[rows]))
+        estimators = []
+        for params in survivors:
+            estimator = booking_estimator(model, name, params, categorical_features)
+            if resource == 'arboles':
+                key = next(key for key in TREE_PARAMS if key in params)
+                estimator.set_params(**{key: max(min_trees, round(params[key] * fraction))})
+            if n_jobs > 1 and 'n_jobs' in estimator.get_params():
+                # Los procesos ya ocupan los núcleos: cada Random Forest usa uno
+                estimator.set_params(n_jobs=1)
+            estimators.append(estimator)
+
+        start = time.perf_counter()
+        tasks = [delayed(_evaluate)(model, clone(estimator), X, y, rows[train], rows[test])
+                 for estimator in estimators for train, test in folds]
+        if n_jobs == 1:
+            scores = [task[0](*task[1], **task[2]) for task in tasks]
+        else:
+            scores = Parallel(n_jobs=n_jobs)(tasks)
+        seconds = time.perf_counter() - start
+
+        scores = np.array(scores).reshape(len(survivors), cv).mean(axis=1)
+        ranking = np.argsort(-scores, kind='stable')
+        survivors = [survivors[j] for j in ranking]
+        history.append({
+            'round': i + 1,
+            'rows': len(rows),
+            'fraction': fraction,
+            'seconds': seconds,
+            'results': [{'params': survivors[k], 'score': float(scores[j])} for k, j in enumerate(ranking)],
+        })
+        best = history[-1]['results'][0]
+        resource_label = f"{len(rows):,} filas" if resource == 'filas' else f"{fraction:.0%} de los árboles"
+        print(f"  Ronda {i + 1}: {len(estimators)} configuraciones con {resource_label}, "
+              f"mejor {best['score']:.4f} ({seconds:.1f} s)")
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros de los modelos de reservas")
+    parser.add_argument('model', choices=MODELS, help="Modelo a ajustar")
+    parser.add_argument('--candidates', nargs='+', default=None,
+                        help="Candidatos a ajustar (por defecto, todos los del modelo)")
+    parser.add_argument('--configs', type=int, default=DEFAULT_CONFIGS,
+                        help="Configuraciones de la primera ronda (incluida la actual)")
+    parser.add_argument('--eta', type=int, default=DEFAULT_ETA,
+                        help="En cada ronda sigue 1/eta de las configuraciones con eta veces más recurso")
+    parser.add_argument('--resource', choices=RESOURCES, default='filas',
+                        help="Recurso que crece en cada ronda: filas de entrenamiento o árboles")
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS, help="Filas de la primera ronda (mínimo)")
+    parser.add_argument('--cv', type=int, default=3, help="Pliegues de validación cruzada de cada configuración")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MINUTES,
+                        help="Tiempo máximo en minutos para todos los candidatos")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Pliegues entrenados a la vez en procesos separados (por defecto, uno por núcleo)")
+    parser.add_argument('--data', default=BOOKINGS_CSV, help="CSV de reservas de entrenamiento")
+    parser.add_argument('--hyperparameters', default=HYPERPARAMETERS_PATH,
+                        help="Fichero JSON de hiperparámetros que leen los scripts de entrenamiento")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="No reutilizar los preprocesadores ajustados guardados en disco")
+    parser.add_argument('--dry-run', action='store_true', help="Mostrar la mejor configuración sin guardarla")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla del muestreo de configuraciones y filas")
+    args = parser.parse_args()
+
+    config = MODELS[args.model]
+    spaces = SEARCH_SPACES[args.model]
+    names = args.candidates or list(spaces)
+    unknown = [name for name in names if name not in spaces]
+    if unknown:
+        parser.error(f"Candidatos desconocidos: {', '.join(unknown)} (disponibles: {', '.join(spaces)})")
+    current = load_hyperparameters(args.model, args.hyperparameters)
+    deadline = time.time() + args.budget * 60
+
+    print("Cargando datos...")
+    df = build_features(load_bookings(args.data))
+    X = df[config['features']]
+    y = df[config['target']]
+    if args.model == 'precio':
+        y = clean_price_target(y)
+    # La misma división que el script de entrenamiento: el conjunto de prueba no se toca
+    X_train, _, y_train, _ = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y if args.model == 'cancelacion' else None)
+    del df, X
+
+    memory = preprocessing_cache(None if args.no_cache else PREPROCESSING_CACHE_DIR)
+    onehot = onehot_preprocessor(config['numeric'], config['categorical'])
+    native, native_categorical = native_categorical_preprocessor(config['numeric'], config['categorical'])
+
+    for position, name in enumerate(names):
+        print(f"\n{name}:")
+        histogram = 'max_iter' in spaces[name]
+        # El preprocesador se ajusta una vez con todas las filas de entrenamiento (o
+        # se recupera de la misma caché que usa train_price_model) y todas las rondas
+        # comparten la matriz float32; los árboles no dependen del escalado
+        _, Xt, _ = fit_transform_cached(native if histogram else onehot, X_train, memory=memory)
+
+        # La configuración actual compite como una más: solo se sustituye si otra la mejora
+        n_space = len(ParameterGrid(spaces[name]))
+        sampled = ParameterSampler(spaces[name], n_iter=min(args.configs - 1, n_space), random_state=args.seed)
+        configs = [current[name]] + [{key: params[key] for key in spaces[name]}
+                                     for params in sampled if params != current[name]]
+
+        # Cada candidato puede usar su parte del tiempo que queda
+        remaining = deadline - time.time()
+        history = successive_halving(
+            args.model, name, configs, Xt, y_train, resource=args.resource, eta=args.eta,
+            min_rows=args.min_rows, cv=args.cv, deadline=time.time() + remaining / (len(names) - position),
+            reference=current[name], categorical_features=native_categorical if histogram else None,
+            n_jobs=args.jobs, random_state=args.seed)
+
+        last = history[-1]
+        best = last['results'][0]
+        print(f"Mejor configuración ({config['metric']} {best['score']:.4f}): {best['params']}")
+        baseline = next((result for result in last['results'] if result['params'] == current[name]), None)
+        if baseline is not None:
+            print(f"Configuración actual: {config['metric']} {baseline['score']:.4f}")
+        if last['fraction'] < 1:
+            # Solo se guardan configuraciones validadas con el recurso completo
+            print("La búsqueda no ha llegado a la última ronda: no se guarda nada")
+        elif best['params'] == current[name] or best['score'] <= baseline['score']:
+            print("La configuración actual sigue siendo la mejor")
+        elif not args.dry_run:
+            save_hyperparameters(args.model, name, best['params'], args.hyperparameters)
+            print(f"Guardada en {args.hyperparameters}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 import streamlit as st
+import pandas as pd
+
+from src.utils.model_registry import get_registry
 
 st.set_page_config(
     page_title="Hotel analytics",
@@ -7,6 +10,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Empezar a cargar los modelos en segundo plano mientras se muestra la portada
+registry = get_registry()
+
 st.markdown("# 🏨 Hotel analytics")
 st.markdown("""
     Bienvenido a la plataforma de análisis hotelero. Esta herramienta te ayuda a:
@@ -27,6 +33,16 @@ st.markdown("""
 # Información adicional
 st.sidebar.success("Selecciona un modelo de los de arriba.")
 
+# Estado de carga y memoria de los modelos compartidos
+with st.expander("Estado de los modelos"):
+    status = pd.DataFrame(registry.status()).rename(columns={
+        'model': 'Modelo', 'state': 'Estado', 'load_seconds': 'Carga (s)',
+        'warmup_seconds': 'Calentamiento (s)', 'mapped_mb': 'Proyectada (MB)',
+        'private_mb': 'Privada (MB)', 'error': 'Error',
+    })
+    st.dataframe(status, hide_index=True, use_container_width=True)
+    st.caption("La memoria proyectada se lee bajo demanda del artefacto de carga rápida y se comparte entre procesos.")
+
 # Footer
 st.markdown("---")
 st.markdown("Desarrollado con ❤️ por Germán, Carlos y José Antonio")
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from src.utils.fast_inference import compile_pipeline
+from src.utils.features import (
+    CANCELACION_CATEGORICAL, CANCELACION_FEATURES, CANCELACION_INPUTS, CANCELACION_NUMERIC, build_features
+)
+from src.utils.model_registry import WARMUP_BOOKING
+from src.utils.scoring import score_cancellations
+from src.utils.training import onehot_preprocessor
+
+
+def _bookings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    bookings = pd.DataFrame([WARMUP_BOOKING] * n)[CANCELACION_INPUTS]
+    bookings['lead_time'] = rng.integers(0, 300, n)
+    bookings['adr'] = rng.uniform(40, 200, n)
+    bookings['stays_in_week_nights'] = rng.integers(1, 7, n)
+    bookings['deposit_type'] = rng.choice(['No Deposit', 'Non Refund', 'Refundable'], n)
+    return bookings
+
+
+def test_zero_night_booking_scores_in_both_paths():
+    train = _bookings(300)
+    y = (train['lead_time'] > 150).astype(int)
+    pipeline = Pipeline([
+        ('preprocessor', onehot_preprocessor(CANCELACION_NUMERIC, CANCELACION_CATEGORICAL)),
+        ('classifier', RandomForestClassifier(n_estimators=10, random_state=0)),
+    ]).fit(build_features(train)[CANCELACION_FEATURES], y)
+    model = compile_pipeline(pipeline, CANCELACION_FEATURES)
+
+    # Más filas de las que evalúa el camino compilado: se usa el estimador original
+    bookings = _bookings(1000, seed=1)
+    bookings.loc[3, ['stays_in_weekend_nights', 'stays_in_week_nights']] = 0
+    large = score_cancellations(model, bookings)['cancellation_probability'].to_numpy()
+    small = score_cancellations(model, bookings.iloc[:10])['cancellation_probability'].to_numpy()
+    assert np.isfinite(large).all()
+    np.testing.assert_allclose(small, large[:10])
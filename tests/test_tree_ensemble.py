@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor, RandomForestClassifier
+
+from src.utils.tree_ensemble import FlatEnsemble
+
+
+def _data(seed=0, n=400):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 5))
+    # La columna 0 por debajo de -2 (el umbral de relleno de las hojas en scikit-learn)
+    X[::4, 0] = rng.uniform(-6, -2, size=len(X[::4]))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize('estimator', [
+    RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0),
+    GradientBoostingClassifier(n_estimators=20, max_depth=4, random_state=0),
+])
+def test_classifier_parity(estimator):
+    X, y = _data()
+    estimator.fit(X, y)
+    flat = FlatEnsemble(estimator)
+    X_test, _ = _data(seed=1)
+    X_test[:, 0] = np.where(np.arange(len(X_test)) % 2, -3.0, X_test[:, 0])
+    np.testing.assert_allclose(flat.predict_proba(X_test), estimator.predict_proba(X_test), atol=1e-12)
+    np.testing.assert_array_equal(flat.predict(X_test), estimator.predict(X_test))
+
+
+def test_regressor_parity():
+    X, y = _data()
+    estimator = GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=0).fit(X, X[:, 1] * 10 + y)
+    flat = FlatEnsemble(estimator)
+    X_test, _ = _data(seed=2)
+    X_test[:, 0] = -3.0
+    np.testing.assert_allclose(flat.predict(X_test), estimator.predict(X_test), atol=1e-9)